@@ -0,0 +1,330 @@
+"""
+本地 HTTP 接口
+把现金流模型包成异步 HTTP 服务，供小程序等前端调用：
+    POST /cashflow         单个场景，返回现金流表与 NPV
+    POST /cashflow/batch   N 个场景，一次 calc_cashflow_batch 批量计算
+    GET  /brands           品牌库中的车型与动力
+    GET  /metrics          各接口的请求数、耗时分位数与计算耗时
+计算与响应编码都在进程池中完成，事件循环只负责收发；响应默认为 JSON，?format=arrow（或
+Accept: application/vnd.apache.arrow.stream）返回 Arrow IPC 流（长表，需 pyarrow）。
+
+    python api.py --port 8000 --workers 4
+    python api_loadtest.py --batch-size 100     # 本机压测
+
+请求体示例（单个场景；批量为 {"items": [...], "years": ..., "steps_per_year": ...}）：
+    {"vehicle": {"brand": "特斯拉 Model 3", "new_price": 250000, "start_year": 1, "end_year": 5},
+     "scenario": {"油价": 8.0, "家充比例": 0.9}}
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+
+import cost_model as cm
+import batch_model as bm
+
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+MAX_BATCH = 100_000
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+# ===================== 请求格式 =====================
+class Vehicle(BaseModel):
+    brand: str
+    new_price: float
+    start_year: int = 1
+    end_year: int = cm.YEARS
+    is_ev: Optional[bool] = None
+    oil_purchase_mileage: Optional[float] = None
+
+
+class Item(BaseModel):
+    vehicle: Vehicle
+    scenario: Dict[str, float] = Field(default_factory=dict)
+    override_annual_mileage: Optional[float] = None
+
+
+class SingleRequest(Item):
+    years: Optional[int] = None
+    steps_per_year: int = 1
+
+
+class BatchRequest(BaseModel):
+    items: List[Item]
+    years: Optional[int] = None
+    steps_per_year: int = 1
+    include_cashflow: bool = False
+
+
+# ===================== 计算（在工作进程中运行）=====================
+class RequestError(Exception):
+    """请求参数不合法（在工作进程中发现），由 _run 转成 HTTPException。"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _check_size(items):
+    """事件循环上只做 O(1) 的检查，逐项校验在工作进程中完成。"""
+    if not items:
+        raise HTTPException(400, '场景列表为空')
+    if len(items) > MAX_BATCH:
+        raise HTTPException(413, f'单次最多 {MAX_BATCH:,} 个场景')
+
+
+def _job(items, years, steps_per_year):
+    """把请求整理成 calc_cashflow_batch 的列数组；参数不合法时抛出 RequestError。"""
+    if steps_per_year < 1:
+        raise RequestError(400, 'steps_per_year 必须为正整数')
+    horizon = cm.YEARS if years is None else years
+    lib = cm.brand_library()
+    n = len(items)
+    params = {k: np.full(n, float(cm.inputs[k])) for k in cm.SCENARIO_FIELDS}
+    is_ev = np.empty(n, dtype=bool)
+    for i, item in enumerate(items):
+        v = item.vehicle
+        if v.brand not in lib:
+            raise RequestError(400, f'未知车型: {v.brand}')
+        if not 1 <= v.start_year <= v.end_year <= horizon:
+            raise RequestError(400, f'第 {i} 个场景的起止年不合法: {v.start_year}-{v.end_year}')
+        is_ev[i] = lib.is_ev[lib.row(v.brand)] if v.is_ev is None else v.is_ev
+        for key, value in item.scenario.items():
+            if key not in params:
+                raise RequestError(400, f'未知参数: {key}')
+            params[key][i] = value
+    return {
+        'brand': [item.vehicle.brand for item in items],
+        'new_price': np.array([item.vehicle.new_price for item in items], dtype=float),
+        'start_year': np.array([item.vehicle.start_year for item in items], dtype=np.int64),
+        'end_year': np.array([item.vehicle.end_year for item in items], dtype=np.int64),
+        'is_ev': is_ev,
+        'override_annual_mileage': np.array(
+            [np.nan if item.override_annual_mileage is None else item.override_annual_mileage
+             for item in items], dtype=float),
+        'oil_purchase_mileage': np.array(
+            [np.nan if item.vehicle.oil_purchase_mileage is None else item.vehicle.oil_purchase_mileage
+             for item in items], dtype=float),
+        'params': params,
+        'years': years,
+        'steps_per_year': steps_per_year,
+    }
+
+
+def _evaluate(items, years, steps_per_year, encode, *args):
+    """
+    工作进程：校验并整理请求、一次批量计算，再用 encode(cf, steps_per_year, *args) 编码成响应体，
+    返回 (响应体 bytes, 场景数, 计算耗时秒)。编码也在这里完成，大批量的序列化不占用事件循环。
+    """
+    t = time.perf_counter()
+    cf = bm.calc_cashflow_batch(**_job(items, years, steps_per_year))
+    seconds = time.perf_counter() - t
+    return encode(cf, steps_per_year, *args), len(cf), seconds
+
+
+# ===================== 耗时统计 =====================
+class Metrics:
+    """按接口记录最近 window 次请求的总耗时与计算耗时。"""
+
+    def __init__(self, window=10_000):
+        self.window = window
+        self.endpoints = {}
+
+    def _entry(self, path):
+        if path not in self.endpoints:
+            self.endpoints[path] = {
+                'count': 0, 'errors': 0, 'scenarios': 0,
+                'latency': deque(maxlen=self.window), 'compute': deque(maxlen=self.window),
+            }
+        return self.endpoints[path]
+
+    def record(self, path, seconds, status):
+        e = self._entry(path)
+        e['count'] += 1
+        e['errors'] += status >= 400
+        e['latency'].append(seconds)
+
+    def record_compute(self, path, seconds, scenarios):
+        e = self._entry(path)
+        e['scenarios'] += scenarios
+        e['compute'].append(seconds)
+
+    def summary(self):
+        def ms(values):
+            if not values:
+                return {}
+            a = np.fromiter(values, dtype=float) * 1000
+            return {'mean_ms': float(a.mean()), 'p50_ms': float(np.percentile(a, 50)),
+                    'p95_ms': float(np.percentile(a, 95)), 'p99_ms': float(np.percentile(a, 99))}
+
+        return {
+            path: {'count': e['count'], 'errors': e['errors'], 'scenarios': e['scenarios'],
+                   'latency': ms(e['latency']), 'compute': ms(e['compute'])}
+            for path, e in self.endpoints.items()
+        }
+
+
+# ===================== 响应格式 =====================
+def _wants_arrow(request, fmt):
+    """是否返回 Arrow；在计算之前调用，服务器没有 pyarrow 时直接返回 406。"""
+    if fmt is not None:
+        if fmt not in ('json', 'arrow'):
+            raise HTTPException(400, f'不支持的格式: {fmt}，可选 json / arrow')
+        arrow = fmt == 'arrow'
+    else:
+        arrow = ARROW_TYPE in request.headers.get('accept', '')
+    if arrow and not HAS_PYARROW:
+        raise HTTPException(406, 'Arrow 格式需要服务器安装 pyarrow')
+    return arrow
+
+
+def _arrow_body(cf, steps_per_year):
+    """长表 Arrow IPC 流：场景、年（按期时加 月/期）与各分项，直接由数组构造，不经过 DataFrame。"""
+    import pyarrow as pa
+
+    n, steps, _ = cf.shape
+    step = np.arange(steps)
+    columns = {
+        '场景': np.repeat(np.arange(n), steps),
+        '年': np.tile(step // steps_per_year + 1, n),
+    }
+    if steps_per_year != 1:
+        columns['月' if steps_per_year == 12 else '期'] = np.tile(step % steps_per_year + 1, n)
+    flat = cf.reshape(n * steps, -1)
+    for j, name in enumerate(bm.COMPONENTS):
+        columns[name] = flat[:, j]
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _json_body(content):
+    """与 JSONResponse 相同的编码（紧凑、不转义中文、不允许 NaN）。"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def _rows(cf, steps_per_year):
+    """单个场景的现金流表：列名与逐行数值（NaN 转为 null），列同 batch_to_frame，不经过 DataFrame。"""
+    step = np.arange(len(cf))
+    columns = ['年']
+    index = [step // steps_per_year + 1]
+    if steps_per_year != 1:
+        columns.append('月' if steps_per_year == 12 else '期')
+        index.append(step % steps_per_year + 1)
+    values = np.where(np.isnan(cf), None, cf).tolist()
+    rows = [[*head, *row] for head, row in zip(zip(*(i.tolist() for i in index)), values)]
+    return columns + list(bm.COMPONENTS), rows
+
+
+def _single_body(cf, steps_per_year):
+    columns, rows = _rows(cf[0], steps_per_year)
+    return _json_body({'npv': float(bm.batch_npv(cf)[0]), 'columns': columns, 'rows': rows})
+
+
+def _batch_body(cf, steps_per_year, include_cashflow):
+    out = {'npv': bm.batch_npv(cf).tolist()}
+    if include_cashflow:
+        out['columns'] = list(bm.COMPONENTS)
+        out['cashflow'] = np.where(np.isnan(cf), None, cf).tolist()
+    return _json_body(out)
+
+
+# ===================== 服务 =====================
+@asynccontextmanager
+async def lifespan(app):
+    workers = int(os.environ.get('CAR_COST_API_WORKERS', 0)) or None
+    app.state.pool = ProcessPoolExecutor(max_workers=workers)
+    app.state.metrics = Metrics()
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title='车辆成本模型 API', lifespan=lifespan)
+
+
+@app.middleware('http')
+async def timing(request: Request, call_next):
+    t = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - t
+    request.app.state.metrics.record(request.url.path, elapsed, response.status_code)
+    response.headers['X-Process-Time-Ms'] = f'{elapsed * 1000:.2f}'
+    return response
+
+
+async def _run(request, items, years, steps_per_year, encode, *args):
+    """在进程池中校验、计算并编码，返回可直接发送的响应体，并记录计算耗时。"""
+    _check_size(items)
+    loop = asyncio.get_running_loop()
+    try:
+        body, n, seconds = await loop.run_in_executor(
+            request.app.state.pool, _evaluate, items, years, steps_per_year, encode, *args
+        )
+    except RequestError as e:
+        raise HTTPException(e.status_code, e.detail) from None
+    request.app.state.metrics.record_compute(request.url.path, seconds, n)
+    return body
+
+
+@app.post('/cashflow')
+async def cashflow(body: SingleRequest, request: Request, format: Optional[str] = None):
+    if _wants_arrow(request, format):
+        content = await _run(request, [body], body.years, body.steps_per_year, _arrow_body)
+        return Response(content, media_type=ARROW_TYPE)
+    content = await _run(request, [body], body.years, body.steps_per_year, _single_body)
+    return Response(content, media_type='application/json')
+
+
+@app.post('/cashflow/batch')
+async def cashflow_batch(body: BatchRequest, request: Request, format: Optional[str] = None):
+    if _wants_arrow(request, format):
+        content = await _run(request, body.items, body.years, body.steps_per_year, _arrow_body)
+        return Response(content, media_type=ARROW_TYPE)
+    content = await _run(request, body.items, body.years, body.steps_per_year,
+                         _batch_body, body.include_cashflow)
+    return Response(content, media_type='application/json')
+
+
+@app.get('/brands')
+async def brands():
+    lib = cm.brand_library()
+    return {'brands': [{'brand': name, 'power': power} for name, power in zip(lib.names, lib.power)]}
+
+
+@app.get('/metrics')
+async def metrics(request: Request):
+    return request.app.state.metrics.summary()
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='车辆成本模型本地 HTTP 接口')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help='计算进程数，默认 CPU 核数')
+    args = parser.parse_args(argv)
+    if args.workers:
+        os.environ['CAR_COST_API_WORKERS'] = str(args.workers)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+本地压测 api.py（只用标准库）
+用多个线程、每线程一个长连接并发发送请求，统计吞吐量与延迟分位数：
+
+    python api.py --workers 4 &
+    python api_loadtest.py --requests 2000 --concurrency 16                # 单场景接口
+    python api_loadtest.py --batch-size 1000 --requests 200 --format arrow  # 批量接口
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import cost_model as cm
+
+
+def _item(rng):
+    """一个随机场景：默认油车或电车，随机价格、持有区间、油价与里程。"""
+    brand = rng.choice([cm.inputs['油车品牌'], cm.inputs['电车品牌']])
+    start = rng.randint(1, cm.YEARS)
+    return {
+        'vehicle': {
+            'brand': brand,
+            'new_price': rng.uniform(150_000, 350_000),
+            'start_year': start,
+            'end_year': rng.randint(start, cm.YEARS),
+        },
+        'scenario': {'油价': rng.uniform(6, 10), '工作日单日里程': rng.uniform(20, 120)},
+    }
+
+
+def run(url, requests, concurrency, batch_size, fmt, seed=0):
+    """发送 requests 个请求，返回 (每个请求的延迟秒数数组, 总耗时, 失败数)。"""
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    if batch_size:
+        path = '/cashflow/batch'
+        bodies = [{'items': [_item(rng) for _ in range(batch_size)]} for _ in range(min(requests, 32))]
+    else:
+        path = '/cashflow'
+        bodies = [_item(rng) for _ in range(min(requests, 256))]
+    payloads = [json.dumps(b, ensure_ascii=False).encode('utf-8') for b in bodies]
+    path += f'?format={fmt}'
+
+    latencies = np.empty(requests)
+    failures = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(i):
+        nonlocal failures
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        t = time.perf_counter()
+        conn.request('POST', path, body=payloads[i % len(payloads)],
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        latencies[i] = time.perf_counter() - t
+        if response.status != 200:
+            with lock:
+                failures += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(requests)))
+    return latencies, time.perf_counter() - t0, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地压测车辆成本模型 HTTP 接口')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=1000, help='请求总数')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发连接数')
+    parser.add_argument('--batch-size', type=int, default=0, help='每个请求的场景数，0 表示用单场景接口')
+    parser.add_argument('--format', choices=('json', 'arrow'), default='json')
+    args = parser.parse_args(argv)
+
+    latencies, elapsed, failures = run(args.url, args.requests, args.concurrency, args.batch_size, args.format)
+    ms = latencies * 1000
+    scenarios = args.requests * max(args.batch_size, 1)
+    print(f"{args.requests:,} 个请求（{scenarios:,} 个场景），并发 {args.concurrency}，耗时 {elapsed:,.2f} s，失败 {failures}")
+    print(f"吞吐量: {args.requests / elapsed:,.0f} 请求/秒，{scenarios / elapsed:,.0f} 场景/秒")
+    print(f"延迟 (ms): 平均 {ms.mean():,.1f}  P50 {np.percentile(ms, 50):,.1f}  "
+          f"P95 {np.percentile(ms, 95):,.1f}  P99 {np.percentile(ms, 99):,.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,23 +1,97 @@
+import importlib.util
+import json
+import time
+from contextlib import nullcontext
+
+import numpy as np
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+import plotly.graph_objects as go
 
 import cost_model as cm
+import instrument
+from result_cache import LRUCache, cached_cashflow
+from incremental import IncrementalCashflow
+from surrogate import load_surrogate
+from result_set import CashflowSet
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+def session_cashflow(slot, vehicle, scenario):
+    """
+    先查进程内缓存（所有会话共用），再查持久化结果库（跨重启共享）；都未命中时，
+    本会话中同一辆车只改了通用参数则用保存的增量模型只重算受影响的分项，
+    车辆本身变化时重建模型，算完写回两层缓存。
+    返回形状为 (年数, len(COMPONENTS)) 的只读现金流数组。
+    """
+    def compute():
+        model = st.session_state.get(slot)
+        if model is not None and model.vehicle == vehicle:
+            model.update(scenario)
+        else:
+            model = st.session_state[slot] = IncrementalCashflow(vehicle, scenario)
+        return model.result
+
+    return cached_cashflow(vehicle, scenario, compute)
+
+
+@st.cache_resource
+def surrogate_table():
+    """离线构建的 NPV 查表（python surrogate.py），文件不存在或模型已变化时为 None。"""
+    return load_surrogate()
+
+
+@st.cache_resource
+def chart_cache():
+    """进程内共享的图表缓存（plotly 图对象），所有会话共用，容量有界。"""
+    return LRUCache(maxsize=64, name='chart')
+
+
+def build_chart(builder, *args):
+    """构建 plotly 图并记录耗时；图在浏览器端渲染，悬停与缩放不会触发重新运行。"""
+    prof = instrument.active()
+    if prof is not None:
+        t = time.perf_counter()
+    fig = builder(*args)
+    if prof is not None:
+        prof.lap('图表构建', t)
+    return fig
+
+
+def cumulative_chart(vehicle1_cf, vehicle2_cf):
+    fig = go.Figure()
+    for name, cf in (('车辆1', vehicle1_cf), ('车辆2', vehicle2_cf)):
+        fig.add_trace(go.Scatter(
+            x=cf['年'].to_numpy(), y=cf['累计现金流'].fillna(0).to_numpy(),
+            mode='lines+markers', name=name,
+            hovertemplate='第 %{x} 年<br>累计现金流 %{y:,.0f} 元<extra>' + name + '</extra>'
+        ))
+    fig.update_layout(xaxis_title='年', yaxis_title='累计现金流 (元)', hovermode='x unified',
+                      margin=dict(l=10, r=10, t=30, b=10))
+    fig.update_xaxes(dtick=1)
+    fig.update_yaxes(tickformat=',.0f')
+    return fig
+
+
+def mileage_chart(annual_mileage, ev_annual_mileage):
+    fig = go.Figure(go.Bar(
+        x=['常规年里程', '电车年里程'], y=[annual_mileage, ev_annual_mileage],
+        marker_color=['#1f77b4', '#ff7f0e'], hovertemplate='%{x}: %{y:,.0f} km<extra></extra>'
+    ))
+    fig.update_layout(yaxis_title='年里程 (km)', margin=dict(l=10, r=10, t=30, b=10))
+    fig.update_yaxes(rangemode='tozero', tickformat=',.0f')
+    return fig
 
-try:
-    st.set_option('deprecation.showPyplotGlobalUse', False)
-except Exception:
-    # 兼容不同版本的 Streamlit：如果配置项不存在则忽略
-    pass
 
 st.title("车辆成本比较模型")
 
 st.sidebar.header("参数设置")
 
 vehicle_types = ['油', '电']
+library = cm.brand_library()
 
 vehicle1_type = st.sidebar.selectbox("车辆1类型", vehicle_types, index=0)
-vehicle1_brands = cm.brands[cm.brands['动力'] == vehicle1_type].index.tolist()
+vehicle1_brands = [name for name, power in zip(library.names, library.power) if power == vehicle1_type]
 vehicle1_brand_default = cm.inputs['油车品牌'] if vehicle1_type == '油' else cm.inputs['电车品牌']
 vehicle1_brand = st.sidebar.selectbox(
     "车辆1品牌",
@@ -26,7 +100,7 @@ vehicle1_brand = st.sidebar.selectbox(
 )
 
 vehicle2_type = st.sidebar.selectbox("车辆2类型", vehicle_types, index=1)
-vehicle2_brands = cm.brands[cm.brands['动力'] == vehicle2_type].index.tolist()
+vehicle2_brands = [name for name, power in zip(library.names, library.power) if power == vehicle2_type]
 vehicle2_brand_default = cm.inputs['电车品牌'] if vehicle2_type == '电' else cm.inputs['油车品牌']
 vehicle2_brand = st.sidebar.selectbox(
     "车辆2品牌",
@@ -110,98 +184,129 @@ if vehicle2_type == '油':
 
 折现率 = st.sidebar.number_input("折现率", value=cm.inputs['折现率'])
 
+显示诊断 = st.sidebar.checkbox("显示诊断信息", value=False, help="记录本次运行各计算阶段的耗时、场景数与缓存命中率")
+快速估算 = st.sidebar.checkbox(
+    "快速估算（查表）", value=False, disabled=surrogate_table() is None,
+    help="用预计算的 NPV 表插值，只给出 NPV；参数超出表的范围时自动改为完整计算。需先运行 python surrogate.py 构建"
+)
+
 if st.sidebar.button("运行模型"):
-    # 更新 cost_model 中的通用参数
-    new_inputs = {
-        '油价': float(油价),
-        '家充电价': float(家充价),
-        '公共充电价': float(公共充电价),
-        '家充比例': float(家充比例),
-        '工作日通勤天数': int(工作日通勤天数),
-        '工作日单日里程': int(工作日单日里程),
-        '周末单日里程': int(周末单日里程),
-        '工作日高速比例': float(工作日高速比例),
-        '周末高速比例': float(周末高速比例),
-        '电车膨胀系数': float(电车膨胀系数),
-        '电车膨胀开关': int(电车膨胀开关),
-        '过路费单价': float(过路费单价),
-        '停车费': float(停车费),
-        '上海油牌通胀': float(上海油牌通胀),
-        '罚款': float(罚款),
-        '折现率': float(折现率)
-    }
-    cm.inputs.update(new_inputs)
-
-    vehicle1_cf = cm.calc_cashflow(
-        vehicle1_brand,
-        float(vehicle1_price),
-        int(vehicle1_start_year),
-        int(vehicle1_end_year),
-        vehicle1_type == '电',
-        oil_purchase_mileage=vehicle1_purchase_mileage
-    )
+    with (instrument.profile() if 显示诊断 else nullcontext()) as prof:
+        # 本次会话的通用参数（不修改 cost_model.inputs，避免不同会话互相影响）
+        scenario = cm.Scenario(**{
+            '油价': float(油价),
+            '家充电价': float(家充价),
+            '公共充电价': float(公共充电价),
+            '家充比例': float(家充比例),
+            '工作日通勤天数': int(工作日通勤天数),
+            '工作日单日里程': int(工作日单日里程),
+            '周末单日里程': int(周末单日里程),
+            '工作日高速比例': float(工作日高速比例),
+            '周末高速比例': float(周末高速比例),
+            '电车膨胀系数': float(电车膨胀系数),
+            '电车膨胀开关': int(电车膨胀开关),
+            '过路费单价': float(过路费单价),
+            '停车费': float(停车费),
+            '上海油牌通胀': float(上海油牌通胀),
+            '罚款': float(罚款),
+            '折现率': float(折现率)
+        })
 
-    vehicle2_cf = cm.calc_cashflow(
-        vehicle2_brand,
-        float(vehicle2_price),
-        int(vehicle2_start_year),
-        int(vehicle2_end_year),
-        vehicle2_type == '电',
-        oil_purchase_mileage=vehicle2_purchase_mileage
-    )
+        vehicle1 = cm.VehicleSpec(
+            vehicle1_brand,
+            float(vehicle1_price),
+            int(vehicle1_start_year),
+            int(vehicle1_end_year),
+            vehicle1_type == '电',
+            oil_purchase_mileage=vehicle1_purchase_mileage
+        )
+        vehicle2 = cm.VehicleSpec(
+            vehicle2_brand,
+            float(vehicle2_price),
+            int(vehicle2_start_year),
+            int(vehicle2_end_year),
+            vehicle2_type == '电',
+            oil_purchase_mileage=vehicle2_purchase_mileage
+        )
+
+        table = surrogate_table() if 快速估算 else None
+        quick = [table.npv(v, scenario) for v in (vehicle1, vehicle2)] if table is not None else None
+        if quick is not None and None not in quick:
+            npv1, npv2 = quick
+            st.subheader('NPV 汇总（查表估算）')
+            st.write(f"车辆1 NPV: {npv1:,.0f} 元")
+            st.write(f"车辆2 NPV: {npv2:,.0f} 元")
+            st.write(f"NPV 差值 (车辆1 - 车辆2): {npv1 - npv2:,.0f} 元")
+            st.caption(
+                f"查表误差（构建时抽样的最大值）：车辆1 ±{table.error_bound(vehicle1.brand):,.0f} 元，"
+                f"车辆2 ±{table.error_bound(vehicle2.brand):,.0f} 元。取消“快速估算”可查看完整现金流。"
+            )
+        else:
+            if table is not None:
+                st.info('参数超出查表范围（或为带购入里程的油车，查表不含该维度），已改为完整计算。')
+            # 拖动参数时只重算受影响的分项
+            results = CashflowSet(
+                np.stack([session_cashflow('车辆1模型', vehicle1, scenario),
+                          session_cashflow('车辆2模型', vehicle2, scenario)]),
+                labels={'车辆': np.array(['车辆1', '车辆2']), '品牌': np.array([vehicle1_brand, vehicle2_brand])}
+            )
+            vehicle1_cf, vehicle2_cf = results.frame(0), results.frame(1)
+
+            st.subheader('车辆1 现金流')
+            st.write(f"类型: {vehicle1_type}，品牌: {vehicle1_brand}，起始年: {vehicle1_start_year}，结束年: {vehicle1_end_year}")
+            st.dataframe(vehicle1_cf)
+            # 下载内容在点击时才生成
+            st.download_button('下载车辆1 CSV', lambda: vehicle1_cf.to_csv(index=False).encode('utf-8'), file_name='vehicle1_cashflow.csv')
+
+            st.subheader('车辆2 现金流')
+            st.write(f"类型: {vehicle2_type}，品牌: {vehicle2_brand}，起始年: {vehicle2_start_year}，结束年: {vehicle2_end_year}")
+            st.dataframe(vehicle2_cf)
+            st.download_button('下载车辆2 CSV', lambda: vehicle2_cf.to_csv(index=False).encode('utf-8'), file_name='vehicle2_cashflow.csv')
+            if HAS_PYARROW:
+                st.download_button('下载两车 Parquet', lambda: results.to_bytes('parquet'), file_name='cashflow.parquet')
+
+            # 比较累计现金流
+            st.subheader('累计现金流比较')
+            st.plotly_chart(chart_cache().get_or_compute(
+                ('cumulative', vehicle1, vehicle2, scenario),
+                lambda: build_chart(cumulative_chart, vehicle1_cf, vehicle2_cf)
+            ), use_container_width=True)
+
+            st.subheader('NPV 汇总')
+            npv1 = vehicle1_cf['折现现金流'].sum()
+            npv2 = vehicle2_cf['折现现金流'].sum()
+            st.write(f"车辆1 NPV: {npv1:,.0f} 元")
+            st.write(f"车辆2 NPV: {npv2:,.0f} 元")
+            st.write(f"NPV 差值 (车辆1 - 车辆2): {npv1 - npv2:,.0f} 元")
+
+        # 年里程对比
+        weekday_km = scenario['工作日通勤天数'] * scenario['工作日单日里程'] * 52
+        weekend_km = 2 * scenario['周末单日里程'] * 52
+        annual_mileage = weekday_km + weekend_km
+        if scenario['电车膨胀开关'] == 1:
+            ev_annual_mileage = annual_mileage * scenario['电车膨胀系数']
+        else:
+            ev_annual_mileage = annual_mileage
+
+        st.subheader('年总里程（按输入计算）')
+        st.write(f"常规年总里程: {annual_mileage:,.0f} km")
+        st.write(f"电车年总里程: {ev_annual_mileage:,.0f} km")
+
+        st.plotly_chart(chart_cache().get_or_compute(
+            ('mileage', annual_mileage, ev_annual_mileage),
+            lambda: build_chart(mileage_chart, annual_mileage, ev_annual_mileage)
+        ), use_container_width=True)
+
+        st.caption('注：电车年里程已考虑电车膨胀系数（如果已打开）。')
 
-    st.subheader('车辆1 现金流')
-    st.write(f"类型: {vehicle1_type}，品牌: {vehicle1_brand}，起始年: {vehicle1_start_year}，结束年: {vehicle1_end_year}")
-    st.dataframe(vehicle1_cf)
-    st.download_button('下载车辆1 CSV', vehicle1_cf.to_csv(index=False).encode('utf-8'), file_name='vehicle1_cashflow.csv')
-
-    st.subheader('车辆2 现金流')
-    st.write(f"类型: {vehicle2_type}，品牌: {vehicle2_brand}，起始年: {vehicle2_start_year}，结束年: {vehicle2_end_year}")
-    st.dataframe(vehicle2_cf)
-    st.download_button('下载车辆2 CSV', vehicle2_cf.to_csv(index=False).encode('utf-8'), file_name='vehicle2_cashflow.csv')
-
-    # 比较累计现金流
-    fig2, ax2 = plt.subplots()
-    ax2.plot(vehicle1_cf['年'], vehicle1_cf['累计现金流'].fillna(0), marker='o', label='车辆1')
-    ax2.plot(vehicle2_cf['年'], vehicle2_cf['累计现金流'].fillna(0), marker='o', label='车辆2')
-    ax2.set_xlabel('年')
-    ax2.set_ylabel('累计现金流 (元)')
-    ax2.legend()
-    ax2.grid(True)
-    ymin = min(vehicle1_cf['累计现金流'].min(), vehicle2_cf['累计现金流'].min())
-    ymax = max(vehicle1_cf['累计现金流'].max(), vehicle2_cf['累计现金流'].max())
-    if pd.notna(ymin) and pd.notna(ymax) and ymax > ymin:
-        margin = (ymax - ymin) * 0.1
-        ax2.set_ylim(ymin - margin, ymax + margin)
-    fig2.tight_layout()
-    st.subheader('累计现金流比较')
-    st.pyplot(fig2)
-
-    st.subheader('NPV 汇总')
-    npv1 = vehicle1_cf['折现现金流'].sum()
-    npv2 = vehicle2_cf['折现现金流'].sum()
-    st.write(f"车辆1 NPV: {npv1:,.0f} 元")
-    st.write(f"车辆2 NPV: {npv2:,.0f} 元")
-    st.write(f"NPV 差值 (车辆1 - 车辆2): {npv1 - npv2:,.0f} 元")
-
-    # 年里程对比
-    weekday_km = cm.inputs['工作日通勤天数'] * cm.inputs['工作日单日里程'] * 52
-    weekend_km = 2 * cm.inputs['周末单日里程'] * 52
-    annual_mileage = weekday_km + weekend_km
-    if cm.inputs.get('电车膨胀开关', 1) == 1:
-        ev_annual_mileage = annual_mileage * cm.inputs.get('电车膨胀系数', 1.0)
-    else:
-        ev_annual_mileage = annual_mileage
-
-    st.subheader('年总里程（按输入计算）')
-    st.write(f"常规年总里程: {annual_mileage:,.0f} km")
-    st.write(f"电车年总里程: {ev_annual_mileage:,.0f} km")
-
-    fig_miles, axm = plt.subplots()
-    axm.bar(['常规年里程', '电车年里程'], [annual_mileage, ev_annual_mileage], color=['#1f77b4', '#ff7f0e'])
-    axm.set_ylabel('年里程 (km)')
-    axm.set_ylim(0, max(annual_mileage, ev_annual_mileage) * 1.2 if max(annual_mileage, ev_annual_mileage) > 0 else 1)
-    fig_miles.tight_layout()
-    st.pyplot(fig_miles)
-
-    st.caption('注：电车年里程已考虑电车膨胀系数（如果已打开）。')
+    if prof is not None:
+        with st.expander('诊断信息', expanded=True):
+            st.write(f"总耗时: {prof.wall_time * 1000:,.1f} ms")
+            if prof.stage_time:
+                st.dataframe(prof.to_frame())
+            st.write({**prof.counters, **{f'缓存 {k} 命中率': f"{v['hit_rate']:.0%}" for k, v in prof.cache_stats.items()}})
+            st.download_button(
+                '下载诊断 JSON',
+                json.dumps(prof.to_dict(), ensure_ascii=False, indent=2).encode('utf-8'),
+                file_name='profile.json'
+            )
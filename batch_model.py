@@ -0,0 +1,324 @@
+"""
+批量现金流计算模块
+一次性对成千上万个场景计算 calc_cashflow 的全部现金流分项，
+结果为 NumPy 数组，形状为 (场景 × 年 × 分项)，数值与 cost_model.calc_cashflow 逐项一致。
+"""
+
+import time
+
+import numpy as np
+
+import cost_model as cm
+import instrument
+
+# 输出数组最后一维的分项顺序（与 calc_cashflow 返回的列一致，去掉 '年'）
+COMPONENTS = (
+    '购车', '能源', '保险', '保养',
+    '过路费', '停车费', '油牌通胀', '罚款',
+    '卖车', '净现金流', '累计现金流', '折现现金流'
+)
+COMPONENT_INDEX = {name: i for i, name in enumerate(COMPONENTS)}
+
+# calc_cashflow 用到的数值型 inputs 字段，批量计算时均可按场景传入数组
+PARAM_KEYS = cm.SCENARIO_FIELDS
+
+# ===================== 品牌表 =====================
+def brand_table(brands=None):
+    """
+    批量计算使用的列式品牌库（brand_library.BrandLibrary）：
+    残值率二维数组、各项能耗/费用列、品牌→行号索引。
+    brands 为 None 时使用 cm.brand_library()，也可传入旧版格式的 DataFrame。
+    """
+    if brands is None:
+        return cm.brand_library()
+    from brand_library import BrandLibrary
+    return BrandLibrary.from_frame(brands)
+
+
+def market_curve_rows(table):
+    """品牌库行号→二手成交价曲线（仅包含有曲线的车型）。"""
+    curves = cm.market_curves()
+    return {table.index[brand]: curve for brand, curve in curves.items() if brand in table.index}
+
+
+def market_price_by_row(curve_rows, rows, mileage):
+    """按行号分组查成交价曲线：rows 形状 (n,)，mileage 形状 (n,) 或 (n, 年数)；无曲线的行为 NaN。"""
+    out = np.full(np.shape(mileage), np.nan)
+    for row, curve in curve_rows.items():
+        mask = rows == row
+        if mask.any():
+            out[mask] = curve.price(mileage[mask])
+    return out
+
+
+def _residual_lookup(table, rows, units, scale=None):
+    """
+    按整数档位取残值率：档位超出曲线长度时取最后一档。rows 需能与 units 广播。
+    scale 为按场景的残值率系数（蒙特卡洛中扰动残值曲线用），None 表示不缩放。
+    """
+    last = table.residual_len[rows] - 1
+    idx = np.minimum(np.clip(units, 0, None), last)
+    rates = table.residual[rows, idx]
+    return rates if scale is None else rates * scale
+
+
+def _scaled(values, scale):
+    """乘上按场景的残值率系数；有成交价曲线的车型把系数乘在成交价上。"""
+    return values if scale is None else values * scale
+
+
+def _to_units(km):
+    """int(km / 10000) 的向量化写法（NaN 视为 0，仅在被屏蔽的分支里出现）。"""
+    return np.trunc(np.nan_to_num(km / 10000)).astype(np.int64)
+
+
+def vehicle_args(vehicle):
+    """
+    补全车辆字典的缺省项。车辆字典（或 cm.VehicleSpec）的键与 calc_cashflow 的参数同名：
+    brand / new_price / start_year / end_year，可选 is_ev / oil_purchase_mileage。
+    """
+    brand = vehicle['brand']
+    is_ev = vehicle.get('is_ev')
+    if is_ev is None:
+        lib = cm.brand_library()
+        is_ev = lib.is_ev[lib.row(brand)]
+    pm = vehicle.get('oil_purchase_mileage')
+    return {
+        'brand': brand,
+        'new_price': float(vehicle['new_price']),
+        'start_year': int(vehicle['start_year']),
+        'end_year': int(vehicle['end_year']),
+        'is_ev': bool(is_ev),
+        'oil_purchase_mileage': np.nan if pm is None else float(pm),
+    }
+
+
+# ===================== 计算阶段 =====================
+# 各阶段按场景向量化，calc_cashflow_batch 与 incremental 模块共用
+
+def split_mileage(p, override):
+    """年里程与城市/高速拆分，返回 (年里程, 城区里程, 高速里程, 电车计费里程)；override 为 NaN 表示未覆盖。"""
+    weekday_km = p['工作日通勤天数'] * p['工作日单日里程'] * 52
+    weekend_km = 2 * p['周末单日里程'] * 52
+    base_mileage = weekday_km + weekend_km
+    highway_km = weekday_km * p['工作日高速比例'] + weekend_km * p['周末高速比例']
+    city_km = base_mileage - highway_km
+
+    has_override = ~np.isnan(override)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(base_mileage > 0, override / base_mileage, 1.0)
+    annual = np.where(has_override, override, base_mileage)
+    city = np.where(has_override, (base_mileage - highway_km) * scale, city_km)
+    highway = np.where(has_override, highway_km * scale, highway_km)
+    inflate = p['电车膨胀开关'] == 1
+    ev_annual = np.where(inflate, annual * p['电车膨胀系数'], annual)
+    return annual, city, highway, ev_annual
+
+
+def vehicle_values(table, b, ev, new_price, start, purchase_km, annual, years, rs=None):
+    """购入价 (n,) 与第 1..years 年的车辆价值 (n, years)。"""
+    has_pm = ~ev & ~np.isnan(purchase_km)
+    curve_rows = market_curve_rows(table)
+    has_curve = has_pm & np.isin(b, list(curve_rows))
+    pm = np.where(has_pm, purchase_km, 0.0)
+    rs_c = None if rs is None else rs[:, None]
+
+    age0 = start - 1
+    by_age0 = np.where(
+        ev,
+        _residual_lookup(table, b, age0, rs),
+        _residual_lookup(table, b, _to_units(age0 * annual), rs)
+    )
+    purchase = np.where(
+        start == 1,
+        new_price,
+        np.where(
+            has_curve,
+            _scaled(market_price_by_row(curve_rows, b, pm), rs),
+            np.where(
+                has_pm,
+                new_price * _residual_lookup(table, b, _to_units(pm), rs),
+                new_price * np.where(age0 <= 0, 1.0, by_age0)
+            )
+        )
+    )
+
+    year = np.arange(1, years + 1)[None, :]
+    cumulative = pm[:, None] + (year - start[:, None]) * annual[:, None]
+    age = year - 1
+    by_age = np.where(
+        ev[:, None],
+        _residual_lookup(table, b[:, None], age, rs_c),
+        _residual_lookup(table, b[:, None], _to_units(age * annual[:, None]), rs_c)
+    )
+    car_value = np.where(
+        has_curve[:, None],
+        _scaled(market_price_by_row(curve_rows, b, cumulative), rs_c),
+        np.where(
+            has_pm[:, None],
+            new_price[:, None] * _residual_lookup(table, b[:, None], _to_units(cumulative), rs_c),
+            new_price[:, None] * np.where(age <= 0, 1.0, by_age)
+        )
+    )
+    return purchase, car_value
+
+
+def energy_per_year(table, b, ev, p, annual, city, highway, ev_annual):
+    """每年能源费用（负数）。"""
+    unit_price = p['家充电价'] * p['家充比例'] + p['公共充电价'] * (1 - p['家充比例'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ev_energy = np.where(
+            annual > 0,
+            -(city / 100 * table.city_power[b] + highway / 100 * table.highway_power[b])
+            * unit_price * (ev_annual / annual),
+            0.0
+        )
+    oil_energy = -(city / 100 * table.city_fuel[b] + highway / 100 * table.highway_fuel[b]) * p['油价']
+    return np.where(ev, ev_energy, oil_energy)
+
+
+# ===================== 批量现金流 =====================
+def calc_cashflow_batch(brand, new_price, start_year, end_year, is_ev=None,
+                        override_annual_mileage=None, oil_purchase_mileage=None,
+                        params=None, years=None, residual_scale=None, steps_per_year=1):
+    """
+    批量计算现金流，返回形状为 (场景数, 年数, len(COMPONENTS)) 的数组。
+
+    brand: 品牌名数组（或单个品牌名，会广播到所有场景）
+    new_price / start_year / end_year: 每个场景的新车价与持有区间
+    is_ev: 是否电车；为 None 时按品牌库的 '动力' 列判断
+    override_annual_mileage / oil_purchase_mileage: 与 calc_cashflow 含义相同，NaN 表示未提供
+    params: 覆盖 cm.inputs 中的数值参数（字典或 cm.Scenario），值可以是标量或按场景的数组
+    years: 计算年数，默认 cm.YEARS
+    residual_scale: 按场景的残值率系数（乘在 '残值率' 曲线上；有成交价曲线的车型乘在成交价上），默认不缩放
+    steps_per_year: 每年的期数（12 为按月），结果第二维为 年数 × steps_per_year：
+                    购车与保险计在每年第一期，卖车计在卖车年最后一期，其余费用按期均摊，
+                    折现按 (1 + 折现率) ** (期序号 / steps_per_year)
+    """
+    if isinstance(steps_per_year, (bool, np.bool_)) or not isinstance(steps_per_year, (int, np.integer)) \
+            or steps_per_year < 1:
+        raise ValueError(f"steps_per_year 必须为正整数，实际为 {steps_per_year!r}")
+
+    prof = instrument.active()
+    if prof is not None:
+        t = time.perf_counter()
+
+    table = brand_table()
+    Y = cm.YEARS if years is None else int(years)
+
+    brand = np.atleast_1d(np.asarray(brand, dtype=object))
+    arrays = [new_price, start_year, end_year]
+    if is_ev is not None:
+        arrays.append(is_ev)
+    if override_annual_mileage is not None:
+        arrays.append(override_annual_mileage)
+    if oil_purchase_mileage is not None:
+        arrays.append(oil_purchase_mileage)
+    if residual_scale is not None:
+        arrays.append(residual_scale)
+    arrays.extend((params or {}).values())
+    n = np.broadcast_shapes(brand.shape, *(np.shape(a) for a in arrays))
+    n = n[0] if n else 1
+
+    names, inverse = np.unique(np.broadcast_to(brand, (n,)).astype(str), return_inverse=True)
+    b = table.rows(names)[inverse]
+    new_price = np.broadcast_to(np.asarray(new_price, dtype=float), (n,))
+    start = np.broadcast_to(np.asarray(start_year, dtype=np.int64), (n,))
+    end = np.broadcast_to(np.asarray(end_year, dtype=np.int64), (n,))
+    if is_ev is None:
+        ev = table.is_ev[b]
+    else:
+        ev = np.broadcast_to(np.asarray(is_ev, dtype=bool), (n,))
+    override = np.full(n, np.nan) if override_annual_mileage is None else \
+        np.broadcast_to(np.asarray(override_annual_mileage, dtype=float), (n,))
+    purchase_km = np.full(n, np.nan) if oil_purchase_mileage is None else \
+        np.broadcast_to(np.asarray(oil_purchase_mileage, dtype=float), (n,))
+
+    rs = None if residual_scale is None else \
+        np.broadcast_to(np.asarray(residual_scale, dtype=float), (n,))
+
+    p = {k: np.broadcast_to(np.asarray(cm.inputs[k], dtype=float), (n,)) for k in PARAM_KEYS}
+    for k, v in (params or {}).items():
+        p[k] = np.broadcast_to(np.asarray(v, dtype=float), (n,))
+
+    if prof is not None:
+        prof.count('批量调用')
+        prof.count('场景数', n)
+        t = prof.lap('批量参数准备', t)
+
+    # ===== 年里程与城市/高速拆分 =====
+    annual, city, highway, ev_annual = split_mileage(p, override)
+
+    # ===== 购入价与各年车辆价值 =====
+    purchase, car_value = vehicle_values(table, b, ev, new_price, start, purchase_km, annual, Y, rs)
+
+    # ===== 逐年（按数组展开）=====
+    year = np.arange(1, Y + 1)[None, :]
+    start_c, end_c = start[:, None], end[:, None]
+    in_use = (start_c <= year) & (year <= end_c)
+
+    buy = np.where(year == start_c, -purchase[:, None], 0.0)
+    energy = np.where(in_use, energy_per_year(table, b, ev, p, annual, city, highway, ev_annual)[:, None], 0.0)
+
+    factor = np.where(year == 1, 1.0, np.where(year == 2, 0.90, 0.85))
+    insurance = np.where(in_use, -car_value * table.insurance_rate[b][:, None] * factor, 0.0)
+
+    maintenance = np.where(in_use, -table.maintenance[b][:, None], 0.0)
+    toll = np.where(in_use, (-highway * p['过路费单价'])[:, None], 0.0)
+    parking = np.where(in_use, -p['停车费'][:, None], 0.0)
+    plate = np.where(in_use & ~ev[:, None], -p['上海油牌通胀'][:, None], 0.0)
+    fine = np.where(in_use, -p['罚款'][:, None], 0.0)
+    sell = np.where(in_use & (year == end_c), car_value, 0.0)
+
+    if steps_per_year == 1:
+        exponent = year - 1
+    else:
+        buy, energy, insurance, maintenance, toll, parking, plate, fine, sell = _to_steps(
+            steps_per_year, buy, energy, insurance, maintenance, toll, parking, plate, fine, sell
+        )
+        exponent = np.arange(Y * steps_per_year)[None, :] / steps_per_year
+
+    net = buy + energy + insurance + maintenance + toll + parking + plate + fine + sell
+    discounted = net / ((1 + p['折现率'][:, None]) ** exponent)
+
+    result = np.stack([
+        buy, energy, insurance, maintenance,
+        toll, parking, plate, fine,
+        sell, net, np.cumsum(net, axis=1), discounted
+    ], axis=-1)
+    if prof is not None:
+        prof.lap('批量计算', t)
+    return result
+
+
+def _to_steps(steps, buy, energy, insurance, maintenance, toll, parking, plate, fine, sell):
+    """把按年的分项 (n, 年数) 展开到按期 (n, 年数 × steps)。"""
+    period = np.arange(buy.shape[1] * steps)[None, :] % steps
+    first, last = period == 0, period == steps - 1
+
+    def lump(x, at):
+        return np.where(at, np.repeat(x, steps, axis=1), 0.0)
+
+    def spread(x):
+        return np.repeat(x / steps, steps, axis=1)
+
+    return (
+        lump(buy, first), spread(energy), lump(insurance, first), spread(maintenance),
+        spread(toll), spread(parking), spread(plate), spread(fine), lump(sell, last)
+    )
+
+
+def batch_npv(result):
+    """每个场景的 NPV（折现现金流之和），形状 (场景数,)。"""
+    return result[..., COMPONENT_INDEX['折现现金流']].sum(axis=-1)
+
+
+def batch_to_frame(result, i, steps_per_year=1):
+    """把第 i 个场景还原成与 calc_cashflow 相同列的 DataFrame；按期计算时在 '年' 后加一列 '月'（或 '期'）。"""
+    import pandas as pd
+    df = pd.DataFrame(result[i], columns=list(COMPONENTS))
+    step = np.arange(result.shape[1])
+    df.insert(0, '年', step // steps_per_year + 1)
+    if steps_per_year != 1:
+        df.insert(1, '月' if steps_per_year == 12 else '期', step % steps_per_year + 1)
+    return df
@@ -0,0 +1,276 @@
+"""
+性能基准测试
+覆盖模型的热点路径，报告吞吐量（场景/秒）、延迟分位数与峰值内存，
+结果可保存为 JSON，并与之前提交的结果比较，超过阈值的变慢记为回退。
+
+用法：
+    python benchmark.py                                  # 运行全部基准并打印
+    python benchmark.py --output bench/head.json         # 保存结果
+    python benchmark.py --baseline bench/main.json       # 与基准结果比较，回退时以非零状态退出
+    python benchmark.py --only calc_cashflow_oil --repeat 200
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+from breakeven import breakeven_mileages, mileage_breakpoints
+
+# 名称 -> (函数, 每次调用计算的场景数)
+BENCHMARKS = {}
+
+
+def benchmark(name, scenarios):
+    """注册一个基准；scenarios 为每次调用计算的场景（单车现金流）数。"""
+    def decorator(func):
+        BENCHMARKS[name] = (func, scenarios)
+        return func
+    return decorator
+
+
+def single_call(name):
+    """
+    注册单次调用基准的冷、热两个版本：name 每次调用前清空残值与保险表缓存（与加缓存之前可比），
+    name + '_warm' 重复同一输入、缓存命中。
+    """
+    def decorator(func):
+        def cold():
+            cm.schedule_cache().clear()
+            func()
+        BENCHMARKS[name] = (cold, 1)
+        BENCHMARKS[f'{name}_warm'] = (func, 1)
+        return func
+    return decorator
+
+
+# ===================== 单次 calc_cashflow =====================
+@single_call('calc_cashflow_oil')
+def bench_calc_cashflow_oil():
+    cm.calc_cashflow(cm.inputs['油车品牌'], cm.inputs['油车新车价'], 4, 8, False)
+
+
+@single_call('calc_cashflow_ev')
+def bench_calc_cashflow_ev():
+    cm.calc_cashflow(cm.inputs['电车品牌'], cm.inputs['电车新车价'], 4, 8, True)
+
+
+@single_call('calc_cashflow_a4avant_used')
+def bench_calc_cashflow_a4avant_used():
+    cm.calc_cashflow('奥迪 A4 Avant', 300000, 4, 8, False, oil_purchase_mileage=50000)
+
+
+@single_call('calc_summary_oil')
+def bench_calc_summary_oil():
+    cm.calc_summary(cm.inputs['油车品牌'], cm.inputs['油车新车价'], 4, 8, False)
+
+
+# ===================== mileage_sensitivity.py 的扫描 =====================
+SWEEP_MILEAGES = np.arange(5000, 40001, 2500)
+SWEEP_OIL = cm.VehicleSpec(cm.inputs['油车品牌'], cm.inputs['油车新车价'], 1, 5, False)
+SWEEP_EV = cm.VehicleSpec(cm.inputs['电车品牌'], cm.inputs['电车新车价'], 1, 5, True)
+BREAKEVEN_RANGE = (0, 100000)
+
+
+def _breakeven_scenarios(a, b, lo, hi):
+    """breakeven_mileages 计算的场景数：每个线性分段 2 个点 × 2 辆车。"""
+    breaks = np.union1d(mileage_breakpoints(a, lo, hi), mileage_breakpoints(b, lo, hi))
+    return 4 * (len(breaks) + 1)
+
+
+@benchmark('mileage_sweep',
+           2 * len(SWEEP_MILEAGES) + _breakeven_scenarios(SWEEP_OIL, SWEEP_EV, *BREAKEVEN_RANGE))
+def bench_mileage_sweep():
+    n = len(SWEEP_MILEAGES)
+    cf = bm.calc_cashflow_batch(
+        [SWEEP_OIL.brand] * n + [SWEEP_EV.brand] * n,
+        [SWEEP_OIL.new_price] * n + [SWEEP_EV.new_price] * n,
+        1, 5,
+        [False] * n + [True] * n,
+        override_annual_mileage=np.concatenate([SWEEP_MILEAGES, SWEEP_MILEAGES])
+    )
+    bm.batch_npv(cf)
+    breakeven_mileages(SWEEP_OIL, SWEEP_EV, *BREAKEVEN_RANGE)
+
+
+# ===================== compare_ev_new_vs_oil_used.py 的网格 =====================
+COMPARE_HOLDS = [2, 3, 4, 5, 6]
+COMPARE_STARTS = range(1, 9)
+
+
+@benchmark('compare_ev_oil_grid', len(COMPARE_HOLDS) * (1 + len(COMPARE_STARTS)))
+def bench_compare_ev_oil_grid():
+    diffs = []
+    for h in COMPARE_HOLDS:
+        ev_cf = cm.calc_cashflow(cm.inputs['电车品牌'], cm.inputs['电车新车价'], 1, h, True)
+        ev_cost = -ev_cf['折现现金流'].sum()
+        for sy in COMPARE_STARTS:
+            oil_cf = cm.calc_cashflow(cm.inputs['油车品牌'], cm.inputs['油车新车价'], sy, sy + h - 1, False)
+            oil_cost = -oil_cf['折现现金流'].sum()
+            diffs.append(oil_cost - ev_cost)
+    return diffs
+
+
+@benchmark('compare_ev_oil_grid_summary', len(COMPARE_HOLDS) * (1 + len(COMPARE_STARTS)))
+def bench_compare_ev_oil_grid_summary():
+    # 同一网格，逐个场景只取 NPV：走 calc_summary，不构建 DataFrame
+    diffs = []
+    for h in COMPARE_HOLDS:
+        ev_cost = -cm.calc_summary(cm.inputs['电车品牌'], cm.inputs['电车新车价'], 1, h, True).npv
+        for sy in COMPARE_STARTS:
+            oil_cost = -cm.calc_summary(cm.inputs['油车品牌'], cm.inputs['油车新车价'], sy, sy + h - 1, False).npv
+            diffs.append(oil_cost - ev_cost)
+    return diffs
+
+
+# ===================== 全品牌对 × 起始年 × 持有年 =====================
+GRID_STARTS = np.arange(1, 11)
+GRID_HOLDS = np.arange(1, 11)
+
+
+def _brand_pair_grid():
+    lib = cm.brand_library()
+    oil = [n for n, ev in zip(lib.names, lib.is_ev) if not ev]
+    ev = [n for n, is_ev in zip(lib.names, lib.is_ev) if is_ev]
+    return oil, ev
+
+
+_OIL_BRANDS, _EV_BRANDS = _brand_pair_grid()
+
+
+@benchmark('brand_pair_grid', (len(_OIL_BRANDS) + len(_EV_BRANDS)) * len(GRID_STARTS) * len(GRID_HOLDS))
+def bench_brand_pair_grid():
+    S, H = np.meshgrid(GRID_STARTS, GRID_HOLDS, indexing='ij')
+    starts, ends = S.ravel(), (S + H - 1).ravel()
+    k = starts.size
+    brands = _OIL_BRANDS + _EV_BRANDS
+    cf = bm.calc_cashflow_batch(
+        np.repeat(brands, k),
+        200000,
+        np.tile(starts, len(brands)),
+        np.tile(ends, len(brands)),
+        years=int(ends.max())
+    )
+    npv = bm.batch_npv(cf).reshape(len(brands), k)
+    oil_npv, ev_npv = npv[:len(_OIL_BRANDS)], npv[len(_OIL_BRANDS):]
+    return ev_npv[None, :, :] - oil_npv[:, None, :]
+
+
+# ===================== 长周期按月计算 =====================
+LONG_HORIZON = 30
+MONTHLY_BRANDS = np.repeat([cm.inputs['油车品牌'], cm.inputs['电车品牌']], 100)
+
+
+@benchmark('monthly_30y', len(MONTHLY_BRANDS))
+def bench_monthly_30y():
+    cf = bm.calc_cashflow_batch(
+        MONTHLY_BRANDS, 200000, 1, LONG_HORIZON,
+        years=LONG_HORIZON, steps_per_year=12
+    )
+    return bm.batch_npv(cf)
+
+
+# ===================== 运行与比较 =====================
+def run(name, repeat, warmup=3):
+    """运行一个基准，返回延迟分位数、吞吐量与峰值内存。"""
+    func, scenarios = BENCHMARKS[name]
+    for _ in range(warmup):
+        func()
+
+    latencies = np.empty(repeat)
+    for i in range(repeat):
+        t = time.perf_counter()
+        func()
+        latencies[i] = time.perf_counter() - t
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'scenarios_per_call': scenarios,
+        'repeat': repeat,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p90_ms': float(np.percentile(latencies, 90) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'mean_ms': float(latencies.mean() * 1000),
+        'throughput': float(scenarios * repeat / latencies.sum()),
+        'peak_mem_kb': peak / 1024,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """以 p50 延迟比较，变慢超过 threshold（比例）的基准记为回退，返回回退列表。"""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            continue
+        change = r['p50_ms'] / base['p50_ms'] - 1
+        r['p50_change'] = change
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='成本模型性能基准')
+    parser.add_argument('--only', nargs='*', choices=sorted(BENCHMARKS), help='只运行指定基准')
+    parser.add_argument('--repeat', type=int, default=50, help='每个基准的计时次数')
+    parser.add_argument('--output', help='结果保存为 JSON 的路径')
+    parser.add_argument('--baseline', help='用于比较的历史结果 JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 变慢超过该比例记为回退')
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    results = {name: run(name, args.repeat) for name in names}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    print(f"{'基准':<32}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'场景/秒':>12}{'峰值内存(KB)':>14}{'p50变化':>10}")
+    for name, r in results.items():
+        change = f"{r['p50_change']:+.1%}" if 'p50_change' in r else ''
+        print(f"{name:<32}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['throughput']:>12,.0f}{r['peak_mem_kb']:>14,.0f}{change:>10}")
+
+    if args.output:
+        report = {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'benchmarks': results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, change in regressions:
+        print(f"回退: {name} p50 变慢 {change:.1%}（阈值 {args.threshold:.0%}）")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+品牌库加载模块
+从列式文件（CSV，或安装了 pyarrow 时的 Parquet）读取品牌库，整理成连续的 float 数组：
+残值率为 (品牌数 × 年数) 的二维数组，油耗/电耗/保险率/保养费为独立的类型化列，
+另有品牌→行号的整数索引，查找与向量化计算都是 O(1) 且不复制数据。
+
+文件格式（每行一个车型，残值率按列展开，长度可不同，缺失的尾部留空）：
+    品牌,动力,城区油耗,高速油耗,城区电耗,高速电耗,首年保险率,年保养费,残值率1,残值率2,...
+
+加载结果按 (路径, 修改时间, 文件大小) 缓存在进程内，数组设为只读，
+fork 出的工作进程可直接共享同一份内存。
+
+默认品牌库 brands.csv 中奥迪、宝马、奔驰、极氪等车型数据来源于懂车帝及行业公开参数。
+"""
+
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'brands.csv')
+
+NUMERIC_COLUMNS = ('城区油耗', '高速油耗', '城区电耗', '高速电耗', '首年保险率', '年保养费')
+RESIDUAL_PREFIX = '残值率'
+
+
+class BrandLibrary:
+    """列式品牌库。各数组按行号对齐，index 为品牌名→行号。"""
+    __slots__ = (
+        'names', 'index', 'power', 'is_ev',
+        'city_fuel', 'highway_fuel', 'city_power', 'highway_power',
+        'insurance_rate', 'maintenance', 'residual', 'residual_len'
+    )
+
+    def __init__(self, names, power, numeric, residual, residual_len):
+        """numeric 为 (品牌数 × len(NUMERIC_COLUMNS)) 数组，residual 缺失处为 NaN。"""
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        if len(self.index) != len(self.names):
+            raise ValueError("品牌库中存在重复的品牌名")
+        self.power = tuple(power)
+        self.is_ev = np.array([p == '电' for p in self.power])
+        numeric = np.ascontiguousarray(numeric, dtype=float)
+        (self.city_fuel, self.highway_fuel, self.city_power,
+         self.highway_power, self.insurance_rate, self.maintenance) = (
+            np.ascontiguousarray(numeric[:, j]) for j in range(len(NUMERIC_COLUMNS))
+        )
+        self.residual = np.ascontiguousarray(residual, dtype=float)
+        self.residual_len = np.asarray(residual_len, dtype=np.int64)
+        for name in self.__slots__[3:]:
+            getattr(self, name).setflags(write=False)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, brand):
+        return brand in self.index
+
+    def row(self, brand):
+        """品牌名→行号。"""
+        try:
+            return self.index[brand]
+        except KeyError:
+            raise KeyError(f"品牌库中没有该车型: {brand}") from None
+
+    def rows(self, brands):
+        """一组品牌名→行号数组。"""
+        return np.array([self.row(b) for b in brands], dtype=np.int64)
+
+    def info(self, brand):
+        """
+        单个车型的参数字典，键与旧版 brands DataFrame 的列名一致，
+        '残值率' 为二维数组中该行的只读视图（不复制）。
+        """
+        i = self.row(brand)
+        return {
+            '动力': self.power[i],
+            '城区油耗': self.city_fuel[i],
+            '高速油耗': self.highway_fuel[i],
+            '城区电耗': self.city_power[i],
+            '高速电耗': self.highway_power[i],
+            '首年保险率': self.insurance_rate[i],
+            '年保养费': self.maintenance[i],
+            '残值率': self.residual[i, :self.residual_len[i]],
+        }
+
+    def fingerprint(self):
+        """内容摘要（品牌、动力与全部数值列），用于判断持久化结果是否仍然有效。"""
+        h = hashlib.sha1(repr((self.names, self.power)).encode('utf-8'))
+        for name in self.__slots__[4:]:
+            h.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return h.hexdigest()
+
+    def to_frame(self):
+        """转成旧版格式的 DataFrame（以 '品牌' 为索引，'残值率' 列为列表）。"""
+        import pandas as pd
+        df = pd.DataFrame({
+            '品牌': self.names,
+            '动力': self.power,
+            '城区油耗': self.city_fuel,
+            '高速油耗': self.highway_fuel,
+            '城区电耗': self.city_power,
+            '高速电耗': self.highway_power,
+            '首年保险率': self.insurance_rate,
+            '年保养费': self.maintenance,
+            '残值率': [list(self.residual[i, :n]) for i, n in enumerate(self.residual_len)],
+        })
+        df.set_index('品牌', inplace=True)
+        return df
+
+    @classmethod
+    def from_frame(cls, df):
+        """从旧版格式的 DataFrame（以 '品牌' 为索引）构建。"""
+        curves = [list(c) for c in df['残值率']]
+        width = max(len(c) for c in curves)
+        residual = np.full((len(curves), width), np.nan)
+        for i, c in enumerate(curves):
+            residual[i, :len(c)] = c
+        numeric = np.column_stack([df[c].to_numpy(dtype=float) for c in NUMERIC_COLUMNS])
+        return cls(df.index, df['动力'], numeric, residual, [len(c) for c in curves])
+
+
+def _parse_float(text):
+    return float(text) if text not in ('', None) else np.nan
+
+
+def _from_records(header, records):
+    """由表头与按行的字符串记录构建 BrandLibrary。"""
+    col = {name: j for j, name in enumerate(header)}
+    residual_cols = sorted(
+        (j for name, j in col.items() if name.startswith(RESIDUAL_PREFIX) and name != RESIDUAL_PREFIX),
+        key=lambda j: int(header[j][len(RESIDUAL_PREFIX):])
+    )
+    names, power, numeric, residual, residual_len = [], [], [], [], []
+    for rec in records:
+        names.append(rec[col['品牌']])
+        power.append(rec[col['动力']])
+        numeric.append([_parse_float(rec[col[c]]) for c in NUMERIC_COLUMNS])
+        curve = [_parse_float(rec[j]) for j in residual_cols]
+        n = len(curve)
+        while n > 0 and np.isnan(curve[n - 1]):
+            n -= 1
+        residual.append(curve)
+        residual_len.append(n)
+    return BrandLibrary(
+        names, power,
+        np.array(numeric, dtype=float).reshape(len(names), len(NUMERIC_COLUMNS)),
+        np.array(residual, dtype=float).reshape(len(names), len(residual_cols)),
+        residual_len
+    )
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return _from_records(header, [r for r in reader if r])
+
+
+def _read_parquet(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("读取 Parquet 品牌库需要安装 pyarrow") from None
+    table = pq.read_table(path)
+    header = table.column_names
+    columns = [table.column(c).to_pylist() for c in header]
+    records = [['' if v is None else str(v) for v in row] for row in zip(*columns)]
+    return _from_records(header, records)
+
+
+_cache = {}
+
+
+def load_brand_library(path=None):
+    """加载品牌库（CSV 或 Parquet），同一文件未修改时直接返回缓存对象。"""
+    path = os.path.abspath(path or DEFAULT_PATH)
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    lib = _cache.get(key)
+    if lib is None:
+        lib = _read_parquet(path) if path.endswith('.parquet') else _read_csv(path)
+        _cache[key] = lib
+    return lib
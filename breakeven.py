@@ -0,0 +1,117 @@
+"""
+盈亏平衡年里程求解模块
+利用模型的分段线性结构（残值率按整万公里取整分档、二手成交价曲线按里程分段插值），
+精确求出两辆车 NPV 相等时的年里程，而不是在网格上找最接近的点。
+
+车辆用 cm.VehicleSpec 或字典描述，键与 calc_cashflow 的参数同名：
+    {'brand': ..., 'new_price': ..., 'start_year': ..., 'end_year': ...,
+     'is_ev': ..., 'oil_purchase_mileage': ...}
+通用参数 params 可传 cm.Scenario，缺省时取 inputs。
+"""
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+
+
+def mileage_breakpoints(vehicle, lo, hi, years=None):
+    """
+    返回 (lo, hi) 内该车 NPV 关于年里程的全部分段点。
+    在相邻分段点之间，车辆价值（购入价、保险、卖车）不变或线性变化，NPV 为年里程的线性函数。
+    """
+    v = bm.vehicle_args(vehicle)
+    if v['is_ev']:
+        return np.empty(0)
+
+    table = bm.brand_table()
+    row = table.index[v['brand']]
+    n_rates = table.residual_len[row]
+    Y = cm.YEARS if years is None else int(years)
+    start, end = v['start_year'], min(v['end_year'], Y)
+    pm = v['oil_purchase_mileage']
+    points = []
+
+    if np.isnan(pm):
+        # 车辆价值按 int(车龄 * 年里程 / 10000) 分档
+        ages = set(range(max(start, 1) - 1, end))
+        for age in ages:
+            if age > 0:
+                points.append(10000 * np.arange(1, n_rates) / age)
+    else:
+        # 车辆价值按 int((购入里程 + 持有年数 * 年里程) / 10000) 分档
+        curve = cm.market_curves().get(v['brand'])
+        if curve is not None:
+            knots = curve.xs
+        else:
+            knots = 10000 * np.arange(1, n_rates)
+        for k in range(1, end - start + 1):
+            points.append((knots - pm) / k)
+
+    if not points:
+        return np.empty(0)
+    points = np.unique(np.concatenate(points))
+    return points[(points > lo) & (points < hi)]
+
+
+def npv_gap(vehicle_a, vehicle_b, mileages, params=None):
+    """在一组年里程上批量计算 NPV(车辆 a) - NPV(车辆 b)。"""
+    mileages = np.asarray(mileages, dtype=float)
+    a, b = bm.vehicle_args(vehicle_a), bm.vehicle_args(vehicle_b)
+    n = len(mileages)
+    res = bm.calc_cashflow_batch(
+        [a['brand']] * n + [b['brand']] * n,
+        [a['new_price']] * n + [b['new_price']] * n,
+        [a['start_year']] * n + [b['start_year']] * n,
+        [a['end_year']] * n + [b['end_year']] * n,
+        [a['is_ev']] * n + [b['is_ev']] * n,
+        override_annual_mileage=np.concatenate([mileages, mileages]),
+        oil_purchase_mileage=[a['oil_purchase_mileage']] * n + [b['oil_purchase_mileage']] * n,
+        params=params
+    )
+    npv = bm.batch_npv(res)
+    return npv[:n] - npv[n:]
+
+
+def breakeven_mileages(vehicle_a, vehicle_b, lo=0.0, hi=100000.0, params=None):
+    """
+    求 [lo, hi) 内 NPV(车辆 a) = NPV(车辆 b) 的全部年里程，按从小到大返回。
+
+    在每个线性分段内取两个内点确定直线并解出零点；
+    若两侧差值在分段点处跳变换号（车辆价值换档造成），则把该分段点记为一个平衡点。
+    只需一次批量计算（每个分段 2 个点 × 2 辆车）。
+    """
+    breaks = np.union1d(
+        mileage_breakpoints(vehicle_a, lo, hi),
+        mileage_breakpoints(vehicle_b, lo, hi)
+    )
+    edges = np.concatenate([[lo], breaks, [hi]])
+    left, right = edges[:-1], edges[1:]
+    t1 = left + (right - left) / 3
+    t2 = left + (right - left) * 2 / 3
+    f = npv_gap(vehicle_a, vehicle_b, np.concatenate([t1, t2]), params)
+    f1, f2 = f[:len(t1)], f[len(t1):]
+
+    slope = (f2 - f1) / (t2 - t1)
+    f_left = f1 - slope * (t1 - left)
+    f_right = f2 + slope * (right - t2)
+    scale = np.maximum(np.abs(f1), np.abs(f2)).max() if len(f) else 1.0
+    tol = 1e-9 * max(scale, 1.0)
+
+    roots = []
+    for i in range(len(left)):
+        if abs(slope[i]) * (right[i] - left[i]) <= tol:
+            if abs(f1[i]) <= tol:
+                roots.append(left[i])
+        else:
+            m = t1[i] - f1[i] / slope[i]
+            if left[i] - 1e-9 <= m < right[i]:
+                roots.append(max(m, left[i]))
+        # 分段点处的跳变换号
+        if i + 1 < len(left) and f_right[i] * f_left[i + 1] < 0:
+            roots.append(right[i])
+
+    if not roots:
+        return np.empty(0)
+    roots = np.unique(np.round(roots, 6))
+    return roots
@@ -0,0 +1,173 @@
+"""
+全品牌最低成本方案搜索
+对给定的驾驶画像（Scenario），在品牌库中所有车型 × 起始年 × 持有年限 × 购入里程上
+按 NPV 排名，返回前 k 个方案。
+
+剪枝：先为每个候选方案算一个 NPV 上界（即成本下界）：
+    购车款取可能的最低价（新车价 × 最低残值率，新车则为新车价）
+    + 能源/保养/过路费/停车/油牌/罚款（与车辆价值无关，可精确算出）
+    + 保险记为 0
+    + 卖车款取可能的最高残值
+按上界从高到低分块精确计算，一旦第 k 名的精确 NPV 不低于剩余候选的最高上界即停止，
+大部分候选无需完整计算。
+"""
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+
+# 与车辆价值无关的分项
+RUNNING_PARTS = ('能源', '保养', '过路费', '停车费', '油牌通胀', '罚款')
+
+
+def _candidates(lib, rows, start_years, hold_years, purchase_mileages, horizon=cm.YEARS):
+    """
+    枚举 (品牌行号, 起始年, 结束年, 购入里程) 候选，结束年超过 horizon 的组合不计；
+    购入里程只对二手油车有意义，其余为 NaN。
+    """
+    starts = np.asarray(list(start_years), dtype=np.int64)
+    holds = np.asarray(list(hold_years), dtype=np.int64)
+    pms = np.array([np.nan if m is None else float(m) for m in purchase_mileages])
+
+    out_b, out_s, out_e, out_pm = [], [], [], []
+    S, H = np.meshgrid(starts, holds, indexing='ij')
+    S, E = S.ravel(), (S + H - 1).ravel()
+    S, E = S[E <= horizon], E[E <= horizon]
+    for row in rows:
+        if lib.is_ev[row]:
+            options = [np.nan]
+        else:
+            options = pms
+        for pm in options:
+            used = S > 1 if not np.isnan(pm) else np.ones_like(S, dtype=bool)
+            out_b.append(np.full(used.sum(), row))
+            out_s.append(S[used])
+            out_e.append(E[used])
+            out_pm.append(np.full(used.sum(), pm))
+    return (np.concatenate(out_b), np.concatenate(out_s),
+            np.concatenate(out_e), np.concatenate(out_pm))
+
+
+def _value_bounds(lib, rows, new_price):
+    """每个品牌车辆价值的 (最低, 最高) 可能值：残值率或二手成交价曲线的取值范围。"""
+    curve_rows = bm.market_curve_rows(lib)
+    lo = np.empty(len(rows))
+    hi = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        rates = lib.residual[row, :lib.residual_len[row]]
+        lo[i] = new_price[i] * max(rates.min(), 0.0)
+        hi[i] = new_price[i] * max(rates.max(), 1.0)
+        curve = curve_rows.get(row)
+        if curve is not None:
+            # 右侧线性外推时价格没有下界，这类候选的上界为 +inf，总会被精确计算
+            lo[i] = min(lo[i], curve.ys.min() if curve.right == 'flat' else -np.inf)
+            hi[i] = max(hi[i], curve.ys.max(), float(curve.price(0.0)))
+    return lo, hi
+
+
+def search_cheapest(scenario=None, k=10, start_years=range(1, cm.YEARS + 1),
+                    hold_years=range(1, cm.YEARS + 1), purchase_mileages=(None,),
+                    prices=None, brands=None, per_year=False, horizon=cm.YEARS,
+                    block_size=512):
+    """
+    返回 NPV 最高（成本最低）的前 k 个方案（DataFrame，按排名排序）。
+
+    scenario: 驾驶画像（cm.Scenario），缺省取 inputs
+    purchase_mileages: 二手油车的候选购入里程，None 表示按车龄与年里程估算
+    prices: {品牌: 新车价}，未给出的车型按动力取 inputs 中的油车/电车新车价
+    brands: 只在这些车型中搜索，缺省为整个品牌库
+    per_year: 为真时按每持有年的 NPV 排名（持有年限不同的方案更可比）
+    horizon: 模型年限，卖车年份不超过该年
+    结果的 attrs 中记录候选总数与实际精确计算的数量。
+    """
+    import pandas as pd
+
+    scenario = cm.Scenario() if scenario is None else scenario
+    lib = cm.brand_library()
+    rows = lib.rows(brands) if brands is not None else np.arange(len(lib))
+    prices = prices or {}
+    price_of = np.array([
+        float(prices.get(lib.names[r], cm.inputs['电车新车价'] if lib.is_ev[r] else cm.inputs['油车新车价']))
+        for r in rows
+    ])
+
+    b, s, e, pm = _candidates(lib, rows, start_years, hold_years, purchase_mileages, horizon)
+    slot = np.searchsorted(rows, b, sorter=np.argsort(rows, kind='stable'))
+    slot = np.argsort(rows, kind='stable')[slot]
+
+    # ===== 每个品牌每年的固定运营成本（折现后累计），一次批量计算 =====
+    running = bm.calc_cashflow_batch(
+        [lib.names[r] for r in rows], price_of, 1, horizon,
+        lib.is_ev[rows], params=scenario, years=horizon
+    )
+    parts = [bm.COMPONENT_INDEX[p] for p in RUNNING_PARTS]
+    discount = (1 + scenario['折现率']) ** np.arange(horizon)
+    per_year_cost = running[:, :, parts].sum(axis=-1) / discount
+    cum = np.concatenate([np.zeros((len(rows), 1)), np.cumsum(per_year_cost, axis=1)], axis=1)
+
+    # ===== NPV 上界 =====
+    value_lo, value_hi = _value_bounds(lib, rows, price_of)
+    purchase_lb = np.where(s == 1, price_of[slot], value_lo[slot])
+    bound = (
+        -purchase_lb / discount[s - 1]
+        + (cum[slot, e] - cum[slot, s - 1])
+        + value_hi[slot] / discount[e - 1]
+    )
+    hold = (e - s + 1).astype(float)
+    if per_year:
+        bound = bound / hold
+
+    # ===== 按上界分块精确计算 =====
+    order = np.argsort(-bound, kind='stable')
+    best_idx = np.empty(0, dtype=np.int64)
+    best_val = np.empty(0)
+    evaluated = 0
+    for start in range(0, len(order), block_size):
+        if len(best_val) >= k and best_val.min() >= bound[order[start]]:
+            break
+        idx = order[start:start + block_size]
+        cf = bm.calc_cashflow_batch(
+            [lib.names[r] for r in b[idx]], price_of[slot[idx]], s[idx], e[idx],
+            lib.is_ev[b[idx]], oil_purchase_mileage=pm[idx],
+            params=scenario, years=horizon
+        )
+        val = bm.batch_npv(cf)
+        if per_year:
+            val = val / hold[idx]
+        evaluated += len(idx)
+        best_idx = np.concatenate([best_idx, idx])
+        best_val = np.concatenate([best_val, val])
+        if len(best_val) > k:
+            keep = np.argsort(-best_val, kind='stable')[:k]
+            best_idx, best_val = best_idx[keep], best_val[keep]
+
+    rank = np.argsort(-best_val, kind='stable')
+    best_idx, best_val = best_idx[rank], best_val[rank]
+    npv = best_val * hold[best_idx] if per_year else best_val
+    df = pd.DataFrame({
+        '品牌': [lib.names[r] for r in b[best_idx]],
+        '动力': [lib.power[r] for r in b[best_idx]],
+        '新车价': price_of[slot[best_idx]],
+        '起始年': s[best_idx],
+        '持有年限': hold[best_idx].astype(int),
+        '购入里程': pm[best_idx],
+        'NPV': npv,
+    })
+    if per_year:
+        df['每年NPV'] = best_val
+    df.attrs['候选数'] = len(order)
+    df.attrs['精确计算数'] = evaluated
+    return df
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    pd.set_option('display.float_format', '{:,.0f}'.format)
+    top = search_cheapest(
+        cm.Scenario.from_dict(cm.inputs), k=10,
+        purchase_mileages=(None, 30000, 60000, 90000), per_year=True
+    )
+    print(top.to_string(index=False))
+    print(f"\n候选 {top.attrs['候选数']:,} 个，精确计算 {top.attrs['精确计算数']:,} 个")
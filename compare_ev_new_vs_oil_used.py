@@ -1,42 +1,39 @@
 import matplotlib.pyplot as plt
-import numpy as np
+import pandas as pd
 
-from cost_model import calc_cashflow, inputs
+from cost_model import Scenario, inputs
+from pairwise import compare_all_pairs
+from plot_style import use_chinese_font
+from result_store import default_store
+
+use_chinese_font()
+
+scenario = Scenario.from_dict(inputs)
 
 hold_years = [2, 3, 4, 5, 6]
 oil_start_years = range(1, 9)
 
-results = {h: [] for h in hold_years}
-
-for h in hold_years:
-    ev_cf = calc_cashflow(
-        inputs['电车品牌'],
-        inputs['电车新车价'],
-        1,
-        h,
-        True
-    )
-    ev_cost = -ev_cf['折现现金流'].sum()
-
-    for sy in oil_start_years:
-        oil_cf = calc_cashflow(
-            inputs['油车品牌'],
-            inputs['油车新车价'],
-            sy,
-            sy + h - 1,
-            False
-        )
-        oil_cost = -oil_cf['折现现金流'].sum()
-        results[h].append(oil_cost - ev_cost)
+# 品牌库中全部油车 × 电车：每辆车的成本曲线只算一次，再组合成两两差值；
+# 已算过的组合直接从持久化结果库读出，重跑脚本时只计算新增的组合
+comparison = compare_all_pairs(scenario, oil_start_years, hold_years, store=default_store())
+
+# 行：油车购入年份，列：持有年限；值为 油车成本 - 电车成本
+results = comparison.pair(inputs['油车品牌'], inputs['电车品牌'])
 
 plt.figure(figsize=(10, 6))
-for h, diff in results.items():
+for h, diff in zip(hold_years, results.T):
     plt.plot(oil_start_years, diff, marker='o', label=f'持有 {h} 年')
 
 plt.axhline(0, linestyle='--')
 plt.xlabel('油车购入年份')
 plt.ylabel('油车成本 - 电车成本（元）')
-plt.title('新电车 vs 不同年限油车（同持有年限）')
+plt.title(f"新电车 vs 不同年限油车（同持有年限）：{inputs['电车品牌']} vs {inputs['油车品牌']}")
 plt.legend()
 plt.grid(True)
+
+pd.set_option('display.width', 200)
+report = comparison.report()
+print(f"========== 新电车 vs 二手油车：{len(comparison.oil_brands)} 款油车 × {len(comparison.ev_brands)} 款电车 ==========")
+print(report.drop(columns='电车起始年').to_string(index=False, float_format='{:,.0f}'.format))
+
 plt.show()
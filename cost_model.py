@@ -1,58 +1,55 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-# 设置中文字体
-matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
+"""
+计算核心：品牌库、残值逻辑与 calc_cashflow。
+品牌库（numpy）与 pandas 都在首次用到时才导入；
+绘图相关配置见 plot_style.py（按需导入）。
+"""
+
+import time
+
+import instrument
 
 # ===================== 品牌库 =====================
-brands = pd.DataFrame([
-    ['丰田 凯美瑞', '油', 8.2, 6.4, None, None, 0.025, 2000,
-     [0.92, 0.87, 0.82, 0.78, 0.74, 0.70, 0.66, 0.63, 0.60, 0.57]],
-    ['特斯拉 Model 3', '电', None, None, 14, 17, 0.032, 300,
-     [0.85, 0.75, 0.65, 0.58, 0.52, 0.47, 0.42, 0.38, 0.34, 0.31]],
-    ['本田 雅阁', '油', 8.0, 6.2, None, None, 0.025, 2000,
-     [0.91, 0.86, 0.81, 0.77, 0.73, 0.69, 0.65, 0.62, 0.59, 0.56]],
-
-    ['大众 帕萨特', '油', 8.5, 6.6, None, None, 0.026, 2200,
-     [0.90, 0.85, 0.80, 0.76, 0.72, 0.68, 0.64, 0.61, 0.58, 0.55]],
-
-    ['比亚迪 秦PLUS DM-i', '油', 4.5, 4.0, None, None, 0.024, 1800,
-     [0.85, 0.78, 0.72, 0.66, 0.62, 0.58, 0.55, 0.52, 0.49, 0.46]],
-
-    ['丰田 RAV4', '油', 9.0, 7.0, None, None, 0.027, 2300,
-     [0.91, 0.86, 0.81, 0.77, 0.73, 0.69, 0.66, 0.63, 0.60, 0.57]],
-
-    ['比亚迪 海豹', '电', None, None, 13.5, 16.5, 0.030, 300,
-     [0.82, 0.72, 0.62, 0.55, 0.49, 0.44, 0.39, 0.35, 0.32, 0.29]],
-
-    ['小鹏 P7', '电', None, None, 14.5, 18.0, 0.033, 350,
-     [0.81, 0.71, 0.61, 0.53, 0.47, 0.42, 0.37, 0.33, 0.30, 0.27]],
-
-    ['蔚来 ET5', '电', None, None, 15.5, 19.0, 0.035, 400,
-     [0.79, 0.69, 0.59, 0.51, 0.45, 0.40, 0.35, 0.31, 0.28, 0.25]],
-
-    ['理想 L7', '电', None, None, 18.0, 21.0, 0.034, 450,
-     [0.82, 0.72, 0.62, 0.55, 0.49, 0.44, 0.39, 0.35, 0.32, 0.29]],
-
-    # 新增车型：奥迪、宝马、奔驰、极氪（数据来源于懂车帝及行业公开参数）
-    ['奥迪 A4L', '油', 8.5, 6.3, None, None, 0.025, 2300,
-     [0.88, 0.82, 0.77, 0.73, 0.69, 0.65, 0.61, 0.58, 0.55, 0.52]],
-    ['奥迪 A4 Avant', '油', 8.8, 6.6, None, None, 0.025, 2300,
-     [0.92, 0.86, 0.82, 0.78, 0.75, 0.71, 0.69, 0.67, 0.65, 0.63]],
-    ['宝马 330i', '油', 8.2, 6.0, None, None, 0.025, 2400,
-     [0.88, 0.82, 0.77, 0.72, 0.68, 0.64, 0.60, 0.57, 0.54, 0.51]],
-    ['奔驰 C260L', '油', 9.0, 6.8, None, None, 0.026, 2400,
-     [0.87, 0.80, 0.75, 0.71, 0.67, 0.63, 0.60, 0.57, 0.54, 0.51]],
-    ['极氪 007 GT', '电', None, None, 17.5, 20.5, 0.033, 450,
-     [0.82, 0.72, 0.62, 0.55, 0.49, 0.44, 0.39, 0.35, 0.32, 0.29]]
-], columns=[
-    "品牌", "动力", "城区油耗", "高速油耗",
-    "城区电耗", "高速电耗",
-    "首年保险率", "年保养费", "残值率"
-])
-brands.set_index('品牌', inplace=True)
+# 品牌库数据在 brands.csv 中，由 brand_library 模块加载为列式数组
+_library = None
+
+
+def brand_library():
+    """当前使用的品牌库（brand_library.BrandLibrary），首次调用时从 brands.csv 加载。"""
+    global _library
+    if _library is None:
+        from brand_library import load_brand_library
+        _library = load_brand_library()
+    return _library
+
+
+def set_brand_library(library):
+    """替换品牌库：可传入 BrandLibrary、CSV/Parquet 文件路径或旧版格式的 brands DataFrame。"""
+    global _library
+    from brand_library import BrandLibrary, load_brand_library
+    if isinstance(library, str):
+        library = load_brand_library(library)
+    elif not isinstance(library, BrandLibrary):
+        library = BrandLibrary.from_frame(library)
+    _library = library
+    globals().pop('brands', None)
+    if _schedule_cache is not None:
+        _schedule_cache.clear()
+
+
+def get_brands():
+    """品牌库的 DataFrame 视图（以 '品牌' 为索引，'残值率' 列为列表），首次调用时构建。"""
+    df = globals().get('brands')
+    if df is None:
+        df = brand_library().to_frame()
+        globals()['brands'] = df
+    return df
+
+
+def __getattr__(name):
+    # cm.brands / from cost_model import brands 时再构建品牌库
+    if name == 'brands':
+        return get_brands()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ===================== 输入参数 =====================
 inputs = {
@@ -92,6 +89,156 @@ inputs = {
 
 YEARS = 10
 
+# 计算逻辑变化时递增，使 result_store 中持久化的旧结果失效
+MODEL_VERSION = 1
+
+# calc_cashflow 用到的数值型通用参数（不含车辆相关字段）
+SCENARIO_FIELDS = (
+    '油价', '家充电价', '公共充电价', '家充比例',
+    '工作日通勤天数', '工作日单日里程', '周末单日里程',
+    '工作日高速比例', '周末高速比例',
+    '电车膨胀系数', '电车膨胀开关',
+    '过路费单价', '停车费', '上海油牌通胀', '罚款',
+    '折现率'
+)
+
+
+class Scenario:
+    """
+    一组不可变、可哈希的通用参数（字段同 SCENARIO_FIELDS）。
+    未给出的字段取构造时 inputs 中的值；可像字典一样按字段名取值，
+    因此可直接作为 calc_cashflow 的 scenario 参数或批量计算的 params。
+    """
+    __slots__ = SCENARIO_FIELDS
+
+    def __init__(self, **values):
+        unknown = set(values) - set(SCENARIO_FIELDS)
+        if unknown:
+            raise KeyError(f"未知参数: {', '.join(sorted(unknown))}")
+        for name in SCENARIO_FIELDS:
+            object.__setattr__(self, name, values[name] if name in values else inputs[name])
+
+    @classmethod
+    def from_dict(cls, d):
+        """从 inputs 风格的字典构造，忽略车辆相关等非通用字段。"""
+        return cls(**{k: d[k] for k in SCENARIO_FIELDS if k in d})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Scenario 不可修改，请使用 replace() 生成新对象")
+
+    def __delattr__(self, name):
+        raise AttributeError("Scenario 不可修改")
+
+    def replace(self, **changes):
+        """返回修改了部分字段的新 Scenario。"""
+        return Scenario(**{**self.as_dict(), **changes})
+
+    def key(self):
+        return tuple(getattr(self, name) for name in SCENARIO_FIELDS)
+
+    def as_dict(self):
+        return dict(zip(SCENARIO_FIELDS, self.key()))
+
+    def keys(self):
+        return SCENARIO_FIELDS
+
+    def values(self):
+        return self.key()
+
+    def items(self):
+        return zip(SCENARIO_FIELDS, self.key())
+
+    def __getitem__(self, name):
+        if name not in SCENARIO_FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        return getattr(self, name) if name in SCENARIO_FIELDS else default
+
+    def __eq__(self, other):
+        return isinstance(other, Scenario) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __reduce__(self):
+        return (Scenario.from_dict, (self.as_dict(),))
+
+    def __repr__(self):
+        return f"Scenario({', '.join(f'{k}={v!r}' for k, v in self.items())})"
+
+
+VEHICLE_FIELDS = ('brand', 'new_price', 'start_year', 'end_year', 'is_ev', 'oil_purchase_mileage')
+
+
+class VehicleSpec:
+    """
+    一辆车的不可变描述，字段与 calc_cashflow 的参数同名。
+    is_ev 为 None 时按品牌库的 '动力' 列判断；可像字典一样取值。
+    """
+    __slots__ = VEHICLE_FIELDS
+
+    def __init__(self, brand, new_price, start_year=1, end_year=YEARS, is_ev=None, oil_purchase_mileage=None):
+        if is_ev is None:
+            lib = brand_library()
+            is_ev = lib.is_ev[lib.row(brand)]
+        object.__setattr__(self, 'brand', brand)
+        object.__setattr__(self, 'new_price', float(new_price))
+        object.__setattr__(self, 'start_year', int(start_year))
+        object.__setattr__(self, 'end_year', int(end_year))
+        object.__setattr__(self, 'is_ev', bool(is_ev))
+        object.__setattr__(
+            self, 'oil_purchase_mileage',
+            None if oil_purchase_mileage is None else float(oil_purchase_mileage)
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("VehicleSpec 不可修改，请使用 replace() 生成新对象")
+
+    def __delattr__(self, name):
+        raise AttributeError("VehicleSpec 不可修改")
+
+    def replace(self, **changes):
+        return VehicleSpec(**{**dict(self.items()), **changes})
+
+    def key(self):
+        return tuple(getattr(self, name) for name in VEHICLE_FIELDS)
+
+    def keys(self):
+        return VEHICLE_FIELDS
+
+    def items(self):
+        return zip(VEHICLE_FIELDS, self.key())
+
+    def __getitem__(self, name):
+        if name not in VEHICLE_FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        return getattr(self, name) if name in VEHICLE_FIELDS else default
+
+    def __eq__(self, other):
+        return isinstance(other, VehicleSpec) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __reduce__(self):
+        return (VehicleSpec, self.key())
+
+    def __repr__(self):
+        return f"VehicleSpec({', '.join(f'{k}={v!r}' for k, v in self.items())})"
+
+
+def default_vehicles(d=None):
+    """按 inputs 风格字典中的油车/电车字段生成 (油车, 电车) 两个 VehicleSpec。"""
+    d = inputs if d is None else d
+    oil = VehicleSpec(d['油车品牌'], d['油车新车价'], d['油车起始年'], d['油车结束年'], False)
+    ev = VehicleSpec(d['电车品牌'], d['电车新车价'], d['电车起始年'], d['电车结束年'], True)
+    return oil, ev
+
 
 def get_residual_rate(brand_info, age_years, is_ev, annual_mileage):
     """返回残值率：电车按年份，油车按每万公里数修正。"""
@@ -107,50 +254,222 @@ def get_residual_rate(brand_info, age_years, is_ev, annual_mileage):
     return rates[idx]
 
 
+# ===================== 二手成交价曲线 =====================
+# 各车型的 里程→成交价 点在 market_prices.csv 中，由 market_price 模块加载
+_market_curves = None
+
+
+def market_curves():
+    """当前使用的成交价曲线 {品牌: MarketCurve}，首次调用时从 market_prices.csv 加载。"""
+    global _market_curves
+    if _market_curves is None:
+        from market_price import load_market_curves
+        _market_curves = load_market_curves()
+    return _market_curves
+
+
+def set_market_curves(curves, left='flat', right='linear'):
+    """替换成交价曲线：可传入 {品牌: MarketCurve} 或 CSV 文件路径（此时按 left/right 设定外推方式）。"""
+    global _market_curves
+    if isinstance(curves, str):
+        from market_price import load_market_curves
+        curves = load_market_curves(curves, left, right)
+    _market_curves = dict(curves)
+    if _schedule_cache is not None:
+        _schedule_cache.clear()
+
+
+def get_market_price(brand, mileage):
+    """按里程插值得到某车型的实际二手成交价；mileage 可为数组。"""
+    price = market_curves()[brand].price(mileage)
+    return float(price) if price.ndim == 0 else price
+
+
 def get_a4avant_market_price(mileage):
     """按里程插值得到 A4 Avant 的实际二手成交价。"""
-    points = [
-        (40000, 170000),
-        (46000, 168000),
-        (50000, 150000),
-        (60000, 138000),
-        (73000, 134000)
-    ]
-    if mileage <= points[0][0]:
-        return points[0][1]
-    for i in range(len(points) - 1):
-        x0, y0 = points[i]
-        x1, y1 = points[i + 1]
-        if mileage <= x1:
-            return y0 + (y1 - y0) * (mileage - x0) / (x1 - x0)
-    x0, y0 = points[-2]
-    x1, y1 = points[-1]
-    slope = (y1 - y0) / (x1 - x0)
-    return y1 + slope * (mileage - x1)
+    return get_market_price('奥迪 A4 Avant', mileage)
+
+
+# ===================== 残值与保险表 =====================
+# 同一车型、新车价、起始年、购入里程与年里程下，购入价与各年车辆价值、保险都是固定的；
+# 扫油价、电价、折现率等参数时直接复用，不再逐年重算残值
+_schedule_cache = None
+
+
+def schedule_cache():
+    """残值与保险表的 LRU 缓存（result_cache.LRUCache，在 instrument 中登记为 'depreciation'）。"""
+    global _schedule_cache
+    if _schedule_cache is None:
+        from result_cache import LRUCache
+        _schedule_cache = LRUCache(maxsize=1024, name='depreciation')
+    return _schedule_cache
+
+
+def depreciation_schedule(brand, new_price, start_year, is_ev, annual_mileage, oil_purchase_mileage=None,
+                          years=YEARS):
+    """
+    返回 (购入价, 各年车辆价值, 各年保险)，后两者为长度 years 的元组，
+    起始年之前为 None，卖车年之后的值不会被使用。
+    结果按真实输入缓存；电车的车辆价值只与车龄有关，缓存键中不含年里程。
+    """
+    key = (brand, new_price, start_year, bool(is_ev),
+           None if is_ev else annual_mileage, None if is_ev else oil_purchase_mileage, years)
+    return schedule_cache().get_or_compute(key, lambda: _build_schedule(
+        brand, new_price, start_year, is_ev, annual_mileage, oil_purchase_mileage, years
+    ))
+
+
+def _build_schedule(brand, new_price, start_year, is_ev, actual_annual_mileage, oil_purchase_mileage, years):
+    brand_info = brand_library().info(brand)
+
+    # 有二手成交价曲线的油车：购入价与各年车辆价值按累计里程查曲线（一次向量化求出各年价值）
+    curve = None
+    if not is_ev and oil_purchase_mileage is not None:
+        curve = market_curves().get(brand)
+    if curve is not None:
+        market_values = curve.price([
+            oil_purchase_mileage + (year - start_year) * actual_annual_mileage
+            for year in range(1, years + 1)
+        ])
+
+    # ===== 实际购入价格 =====
+    if start_year == 1:
+        purchase_price = new_price
+    else:
+        if curve is not None:
+            # 使用实际二手成交里程-价格曲线估算购入价，独立于新车价
+            purchase_price = float(curve.price(oil_purchase_mileage))
+        elif not is_ev and oil_purchase_mileage is not None:
+            # 油车：根据购入时的实际里程数计算残值率
+            mileage_units = int(oil_purchase_mileage / 10000)
+            purchase_price = new_price * brand_info['残值率'][min(mileage_units, len(brand_info['残值率']) - 1)]
+        else:
+            # 电车或其他情况：沿用之前的年份估算
+            purchase_price = new_price * get_residual_rate(
+                brand_info,
+                start_year - 1,
+                is_ev,
+                actual_annual_mileage
+            )
+
+    # ===== 各年车辆价值与保险（每年出险一次，第三年后稳定）=====
+    # 起始年之前的年份不会被用到（累计里程为负），记为 None
+    car_values = [None] * (start_year - 1)
+    insurances = [None] * (start_year - 1)
+    for year in range(start_year, years + 1):
+        if curve is not None:
+            # 按累计里程的市场成交价估算当年车辆价值
+            car_value = float(market_values[year - 1])
+        elif not is_ev and oil_purchase_mileage is not None:
+            # 其他油车：根据累积里程计算残值率
+            cumulative_mileage = oil_purchase_mileage + (year - start_year) * actual_annual_mileage
+            mileage_units = int(cumulative_mileage / 10000)
+            car_value = new_price * brand_info['残值率'][min(mileage_units, len(brand_info['残值率']) - 1)]
+        else:
+            # 电车或其他情况：沿用年份估算
+            age_years = year - 1
+            car_value = new_price * get_residual_rate(
+                brand_info,
+                age_years,
+                is_ev,
+                actual_annual_mileage
+            )
+
+        if year == 1:
+            factor = 1.0
+        elif year == 2:
+            factor = 0.90
+        else:
+            factor = 0.85
+
+        car_values.append(car_value)
+        insurances.append(-car_value * brand_info['首年保险率'] * factor)
+    return purchase_price, tuple(car_values), tuple(insurances)
+
 
 # ===================== 现金流计算函数 =====================
-def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual_mileage=None, oil_purchase_mileage=None):
+# calc_cashflow 逐年计算的列（之后再加 累计现金流、折现现金流 两列）
+ROW_COLUMNS = (
+    '年', '购车', '能源', '保险', '保养',
+    '过路费', '停车费', '油牌通胀', '罚款',
+    '卖车', '净现金流'
+)
+
+
+def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual_mileage=None, oil_purchase_mileage=None,
+                  scenario=None, years=None, steps_per_year=1):
     """
     计算现金流
     override_annual_mileage: 如果提供，将覆盖默认的年里程（用于敏感性分析）
     oil_purchase_mileage: 油车购入时的里程数（公里），用于估算购入价及后续折旧价
+    scenario: 通用参数（Scenario 或 inputs 风格的字典），默认使用全局 inputs
+    years: 计算年数，默认 YEARS
+    steps_per_year: 每年的期数，12 为按月，返回的 DataFrame 多一列 '月'（或 '期'）
+    按年与按期都走 batch_model 的数组时间轴（单个场景），耗时不随年数增长；各分项列统一为 float。
+    """
+    import batch_model as bm
+
+    prof = instrument.active()
+    if prof is not None:
+        prof.count('calc_cashflow 调用')
+    cf = _batch_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual_mileage,
+                         oil_purchase_mileage, scenario, years, steps_per_year)
+    if prof is not None:
+        t = time.perf_counter()
+    df = bm.batch_to_frame(cf, 0, steps_per_year)
+    if prof is not None:
+        prof.lap('DataFrame 构建', t)
+    return df
+
+
+def _batch_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual_mileage,
+                    oil_purchase_mileage, scenario, years, steps_per_year):
+    """单个场景走 batch_model，返回形状 (1, 期数, len(COMPONENTS)) 的数组。"""
+    import batch_model as bm
+    params = inputs if scenario is None else scenario
+    return bm.calc_cashflow_batch(
+        brand, new_price, start_year, end_year, is_ev,
+        override_annual_mileage=override_annual_mileage,
+        oil_purchase_mileage=oil_purchase_mileage,
+        params={k: params[k] for k in SCENARIO_FIELDS},
+        years=years, steps_per_year=steps_per_year
+    )
+
+
+def _cashflow_rows(brand, new_price, start_year, end_year, is_ev, override_annual_mileage,
+                   oil_purchase_mileage, scenario, years):
+    """
+    逐年计算各分项，返回 ([[年, 购车, ..., 净现金流], ...], 折现率)。
+    calc_summary 用它：单个场景时，缓存的残值表加逐年循环比数组计算的固定开销小得多；
+    也是 calc_cashflow_batch 逐位对照的参考实现（tests/test_batch_model.py）。
     """
-    brand_info = brands.loc[brand]
-    brand_info = brands.loc[brand]
+    horizon = YEARS if years is None else int(years)
+
+    # 埋点：未开启时 prof 为 None，只多一次判断
+    prof = instrument.active()
+    if prof is not None:
+        prof.count('calc_summary 调用')
+        prof.count('场景数')
+        t = time.perf_counter()
+
+    brand_info = brand_library().info(brand)
+    params = inputs if scenario is None else scenario
+    if prof is not None:
+        t = prof.lap('品牌查找', t)
 
     # ===== 每次调用时根据当前 inputs 重新计算年里程与城市/高速拆分 =====
-    weekday_km = inputs['工作日通勤天数'] * inputs['工作日单日里程'] * 52
-    weekend_km = 2 * inputs['周末单日里程'] * 52
+    weekday_km = params['工作日通勤天数'] * params['工作日单日里程'] * 52
+    weekend_km = 2 * params['周末单日里程'] * 52
     annual_mileage = weekday_km + weekend_km
 
-    if inputs['电车膨胀开关'] == 1:
-        ev_annual_mileage = annual_mileage * inputs['电车膨胀系数']
+    if params['电车膨胀开关'] == 1:
+        ev_annual_mileage = annual_mileage * params['电车膨胀系数']
     else:
         ev_annual_mileage = annual_mileage
 
     highway_km = (
-        weekday_km * inputs['工作日高速比例'] +
-        weekend_km * inputs['周末高速比例']
+        weekday_km * params['工作日高速比例'] +
+        weekend_km * params['周末高速比例']
     )
     city_km = annual_mileage - highway_km
 
@@ -167,37 +486,26 @@ def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual
 
         actual_city_km = (original_annual_mileage - highway_km) * scale
         actual_highway_km = highway_km * scale
-        actual_ev_annual_mileage = actual_annual_mileage * inputs['电车膨胀系数'] if inputs['电车膨胀开关'] == 1 else actual_annual_mileage
+        actual_ev_annual_mileage = actual_annual_mileage * params['电车膨胀系数'] if params['电车膨胀开关'] == 1 else actual_annual_mileage
     else:
         # 使用刚计算得到的里程变量
         actual_annual_mileage = annual_mileage
         actual_city_km = city_km
         actual_highway_km = highway_km
         actual_ev_annual_mileage = ev_annual_mileage
+    if prof is not None:
+        t = prof.lap('里程拆分', t)
 
-    # ===== 实际购入价格 =====
-    if start_year == 1:
-        purchase_price = new_price
-    else:
-        if not is_ev and oil_purchase_mileage is not None and brand == '奥迪 A4 Avant':
-            # A4 Avant：使用实际二手成交里程-价格曲线估算购入价，独立于新车价
-            purchase_price = get_a4avant_market_price(oil_purchase_mileage)
-        elif not is_ev and oil_purchase_mileage is not None:
-            # 油车：根据购入时的实际里程数计算残值率
-            mileage_units = int(oil_purchase_mileage / 10000)
-            purchase_price = new_price * brand_info['残值率'][min(mileage_units, len(brand_info['残值率']) - 1)]
-        else:
-            # 电车或其他情况：沿用之前的年份估算
-            purchase_price = new_price * get_residual_rate(
-                brand_info,
-                start_year - 1,
-                is_ev,
-                actual_annual_mileage
-            )
+    # ===== 购入价与各年车辆价值、保险（与油价、电价、折现率等无关，按真实输入缓存）=====
+    purchase_price, car_values, insurances = depreciation_schedule(
+        brand, new_price, start_year, is_ev, actual_annual_mileage, oil_purchase_mileage, horizon
+    )
+    if prof is not None:
+        t = prof.lap('残值与保险', t)
 
     rows = []
 
-    for year in range(1, YEARS + 1):
+    for year in range(1, horizon + 1):
         in_use = start_year <= year <= end_year
 
         # ---- 购车 ----
@@ -207,8 +515,8 @@ def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual
         if in_use:
             if is_ev:
                 unit_price = (
-                    inputs['家充电价'] * inputs['家充比例'] +
-                    inputs['公共充电价'] * (1 - inputs['家充比例'])
+                    params['家充电价'] * params['家充比例'] +
+                    params['公共充电价'] * (1 - params['家充比例'])
                 )
                 energy = -(
                     actual_city_km / 100 * brand_info['城区电耗'] +
@@ -218,39 +526,14 @@ def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual
                 energy = -(
                     actual_city_km / 100 * brand_info['城区油耗'] +
                     actual_highway_km / 100 * brand_info['高速油耗']
-                ) * inputs['油价']
+                ) * params['油价']
         else:
             energy = 0
 
-        # ---- 保险（每年出险一次，第三年后稳定）----
+        # ---- 保险 ----
         if in_use:
-            if not is_ev and oil_purchase_mileage is not None and brand == '奥迪 A4 Avant':
-                # A4 Avant：按累计里程的市场成交价估算当年车辆价值
-                cumulative_mileage = oil_purchase_mileage + (year - start_year) * actual_annual_mileage
-                car_value = get_a4avant_market_price(cumulative_mileage)
-            elif not is_ev and oil_purchase_mileage is not None:
-                # 其他油车：根据累积里程计算残值率
-                cumulative_mileage = oil_purchase_mileage + (year - start_year) * actual_annual_mileage
-                mileage_units = int(cumulative_mileage / 10000)
-                car_value = new_price * brand_info['残值率'][min(mileage_units, len(brand_info['残值率']) - 1)]
-            else:
-                # 电车或其他情况：沿用年份估算
-                age_years = year - 1
-                car_value = new_price * get_residual_rate(
-                    brand_info,
-                    age_years,
-                    is_ev,
-                    actual_annual_mileage
-                )
-
-            if year == 1:
-                factor = 1.0
-            elif year == 2:
-                factor = 0.90
-            else:
-                factor = 0.85
-
-            insurance = -car_value * brand_info['首年保险率'] * factor
+            car_value = car_values[year - 1]
+            insurance = insurances[year - 1]
         else:
             insurance = 0
 
@@ -258,12 +541,12 @@ def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual
         maintenance = -brand_info['年保养费'] if in_use else 0
 
         # ---- 过路费 ----
-        toll = -actual_highway_km * inputs['过路费单价'] if in_use else 0
+        toll = -actual_highway_km * params['过路费单价'] if in_use else 0
 
         # ---- 其他固定成本 ----
-        parking = -inputs['停车费'] if in_use else 0
-        plate = -inputs['上海油牌通胀'] if (in_use and not is_ev) else 0
-        fine = -inputs['罚款'] if in_use else 0
+        parking = -params['停车费'] if in_use else 0
+        plate = -params['上海油牌通胀'] if (in_use and not is_ev) else 0
+        fine = -params['罚款'] if in_use else 0
 
         # ---- 卖车 ----
         if year == end_year and in_use:
@@ -280,37 +563,119 @@ def calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual
             year, buy, energy, insurance, maintenance,
             toll, parking, plate, fine, sell, net_cf
         ])
+    if prof is not None:
+        prof.lap('逐年行构建', t)
+    return rows, params['折现率']
 
-    df = pd.DataFrame(rows, columns=[
-        '年', '购车', '能源', '保险', '保养',
-        '过路费', '停车费', '油牌通胀', '罚款',
-        '卖车', '净现金流'
-    ])
 
-    df['累计现金流'] = df['净现金流'].cumsum()
-    df['折现现金流'] = df['净现金流'] / ((1 + inputs['折现率']) ** (df['年'] - 1))
-    return df
+class CashflowSummary:
+    """
+    calc_summary 的结果：只含汇总值，完整表格在首次访问 frame 时才构建。
+        npv         折现现金流之和
+        net_total   净现金流之和（未折现，负数为总成本）
+        components  {分项: 合计}，分项为 购车 ... 卖车
+    """
+    __slots__ = ('npv', 'net_total', 'components', '_build', '_frame')
 
+    def __init__(self, npv, net_total, components, build):
+        self.npv = npv
+        self.net_total = net_total
+        self.components = components
+        self._build = build
+        self._frame = None
 
-if __name__ == '__main__':
-    # ===================== 计算（仅在作为脚本运行时） =====================
-    oil_cf = calc_cashflow(
-        inputs['油车品牌'],
-        inputs['油车新车价'],
-        inputs['油车起始年'],
-        inputs['油车结束年'],
-        False
+    @property
+    def frame(self):
+        """与 calc_cashflow 相同的 DataFrame，第一次访问时构建。"""
+        if self._frame is None:
+            self._frame = self._build()
+            self._build = None
+        return self._frame
+
+    def __repr__(self):
+        return f"CashflowSummary(npv={self.npv:,.2f}, net_total={self.net_total:,.2f})"
+
+
+def calc_summary(brand, new_price, start_year, end_year, is_ev, override_annual_mileage=None,
+                 oil_purchase_mileage=None, scenario=None, years=None, steps_per_year=1):
+    """
+    与 calc_cashflow 参数相同，但只返回汇总值（CashflowSummary），不构建 DataFrame；
+    npv 与 calc_cashflow(...)['折现现金流'].sum() 逐位相同。扫参数只需要 NPV 时用它。
+    """
+    import numpy as np
+
+    if steps_per_year != 1:
+        import batch_model as bm
+        cf = _batch_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual_mileage,
+                             oil_purchase_mileage, scenario, years, steps_per_year)
+        # 逐列连续后求和，与 DataFrame 列求和的顺序相同
+        totals = np.ascontiguousarray(cf[0].T).sum(axis=1)
+        return CashflowSummary(
+            float(totals[bm.COMPONENT_INDEX['折现现金流']]),
+            float(totals[bm.COMPONENT_INDEX['净现金流']]),
+            {name: float(totals[bm.COMPONENT_INDEX[name]]) for name in ROW_COLUMNS[1:-1]},
+            lambda: bm.batch_to_frame(cf, 0, steps_per_year)
+        )
+
+    rows, rate = _cashflow_rows(brand, new_price, start_year, end_year, is_ev, override_annual_mileage,
+                                oil_purchase_mileage, scenario, years)
+    # 与 calc_cashflow 的 DataFrame 列求和顺序相同（逐列连续），保证结果逐位一致
+    columns = np.array(rows, dtype=float).T.copy()
+    net = columns[-1]
+    year = np.arange(1, len(rows) + 1)
+    totals = columns.sum(axis=1)
+    return CashflowSummary(
+        float((net / ((1 + rate) ** (year - 1))).sum()),
+        float(totals[-1]),
+        {name: float(totals[i]) for i, name in enumerate(ROW_COLUMNS[1:-1], start=1)},
+        lambda: calc_cashflow(brand, new_price, start_year, end_year, is_ev, override_annual_mileage,
+                              oil_purchase_mileage, scenario, years)
+    )
+
+
+
+def calc_vehicle_cashflow(vehicle, scenario=None, override_annual_mileage=None, years=None, steps_per_year=1):
+    """按 VehicleSpec 计算现金流，等价于把各字段传给 calc_cashflow。"""
+    return calc_cashflow(
+        vehicle.brand,
+        vehicle.new_price,
+        vehicle.start_year,
+        vehicle.end_year,
+        vehicle.is_ev,
+        override_annual_mileage=override_annual_mileage,
+        oil_purchase_mileage=vehicle.oil_purchase_mileage,
+        scenario=scenario,
+        years=years,
+        steps_per_year=steps_per_year
     )
 
-    ev_cf = calc_cashflow(
-        inputs['电车品牌'],
-        inputs['电车新车价'],
-        inputs['电车起始年'],
-        inputs['电车结束年'],
-        True
+
+def calc_vehicle_summary(vehicle, scenario=None, override_annual_mileage=None, years=None, steps_per_year=1):
+    """按 VehicleSpec 计算汇总值，等价于把各字段传给 calc_summary。"""
+    return calc_summary(
+        vehicle.brand,
+        vehicle.new_price,
+        vehicle.start_year,
+        vehicle.end_year,
+        vehicle.is_ev,
+        override_annual_mileage=override_annual_mileage,
+        oil_purchase_mileage=vehicle.oil_purchase_mileage,
+        scenario=scenario,
+        years=years,
+        steps_per_year=steps_per_year
     )
 
+
+if __name__ == '__main__':
+    # ===================== 计算（仅在作为脚本运行时） =====================
+    scenario = Scenario.from_dict(inputs)
+    oil_car, ev_car = default_vehicles(inputs)
+
+    oil_cf = calc_vehicle_cashflow(oil_car, scenario)
+    ev_cf = calc_vehicle_cashflow(ev_car, scenario)
+
     # ===================== 对齐打印 =====================
+    import pandas as pd
     pd.set_option('display.float_format', '{:,.0f}'.format)
 
     print("\n======== 油车现金流（元） ========")
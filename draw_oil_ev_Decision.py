@@ -1,87 +1,84 @@
 """
 油电车选择决策热力图绘制模块
-需要从 cost_model.py 导入必要的数据
+对每个 (购车起始年, 持有年限) 组合分别重新模拟油车与电车（含二手购入价），
+一次批量计算得到选择矩阵与差值矩阵。
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
 
-# 设置中文字体
-matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
+import batch_model as bm
+from cost_model import Scenario, inputs
 
-# 从 cost_model 导入必要的数据
-from cost_model import oil_cf, ev_cf, inputs
 
-
-def calc_total_cost(
-    car_type: str,        # "ICE" 或 "EV"
-    buy_year: int,        # 第 x 年买
-    hold_years: int       # 持有 y 年
-) -> float:
+def decision_grid(
+    oil_car: dict,        # 车辆字典：brand / new_price，可选 oil_purchase_mileage
+    ev_car: dict,
+    start_years=range(1, 11),
+    hold_years=range(1, 11),
+    threshold: float = 2000,
+    params=None          # cm.Scenario 或字典，缺省取 inputs
+):
     """
-    返回：从 buy_year 开始，持有 hold_years 年的总成本（现金流折现或不折现，按你现有逻辑）
-    注意：
-    - buy_year != 1 时，购车价必须是【折旧后的价格】（你已经修过这一点）
-    - 不要重复计算第 0 / 第 1 年
+    返回 (choice_matrix, diff_matrix)，形状均为 (len(start_years), len(hold_years))。
+    - 每个格子都按 start_year = x、end_year = x + y - 1 重新计算现金流，
+      x > 1 时购车价按模型的二手价（残值率或购入里程）计算
+    - 计算年数自动延长到最晚的结束年，不截断持有期
+    - diff = 油车成本 - 电车成本（成本 = -NPV），正数表示电车更便宜
+    - choice: -1 选油车，0 差值在 threshold 内，+1 选电车
     """
-    if car_type == "ICE":
-        cf_data = oil_cf
-        start_year_input = inputs['油车起始年']
-        end_year_input = inputs['油车结束年']
-    else:  # EV
-        cf_data = ev_cf
-        start_year_input = inputs['电车起始年']
-        end_year_input = inputs['电车结束年']
-    
-    # 计算在指定年份范围内的成本
-    total_cost = 0
-    for year in range(buy_year, buy_year + hold_years):
-        if year <= len(cf_data):
-            total_cost += cf_data['折现现金流'].iloc[year - 1]
-    
-    return abs(total_cost)
+    oil = bm.vehicle_args(dict(oil_car, start_year=1, end_year=1, is_ev=False))
+    ev = bm.vehicle_args(dict(ev_car, start_year=1, end_year=1, is_ev=True))
+
+    S, H = np.meshgrid(np.asarray(start_years), np.asarray(hold_years), indexing='ij')
+    starts = S.ravel()
+    ends = starts + H.ravel() - 1
+    n = starts.size
+
+    cf = bm.calc_cashflow_batch(
+        [oil['brand']] * n + [ev['brand']] * n,
+        [oil['new_price']] * n + [ev['new_price']] * n,
+        np.concatenate([starts, starts]),
+        np.concatenate([ends, ends]),
+        [False] * n + [True] * n,
+        oil_purchase_mileage=[oil['oil_purchase_mileage']] * n + [np.nan] * n,
+        params=params,
+        years=max(int(ends.max()), 1)
+    )
+    npv = bm.batch_npv(cf)
+
+    diff_matrix = (npv[n:] - npv[:n]).reshape(S.shape)
+    choice_matrix = np.where(
+        np.abs(diff_matrix) < threshold, 0,
+        np.where(diff_matrix > 0, 1, -1)
+    )
+    return choice_matrix, diff_matrix
 
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from plot_style import use_chinese_font
+
+    # 设置中文字体
+    use_chinese_font()
+
     START_YEARS = range(1, 11)   # x ∈ [1,10]
     HOLD_YEARS  = range(1, 11)   # y ∈ [1,10]
 
+    THRESHOLD = 2000  # 成本差 < 2000 认为"差不多"
+
     # 结果矩阵
     # -1: 选油车
     #  0: 两者接近（差值在阈值内）
     # +1: 选电车
-    choice_matrix = np.zeros((len(START_YEARS), len(HOLD_YEARS)))
-
-    # 记录差值，方便你之后 debug / 标注
-    diff_matrix = np.zeros_like(choice_matrix, dtype=float)
-
-    THRESHOLD = 2000  # 成本差 < 2000 认为"差不多"
-
-    for i, buy_year in enumerate(START_YEARS):
-        for j, hold_year in enumerate(HOLD_YEARS):
-            cost_ice = calc_total_cost(
-                car_type="ICE",
-                buy_year=buy_year,
-                hold_years=hold_year
-            )
-
-            cost_ev = calc_total_cost(
-                car_type="EV",
-                buy_year=buy_year,
-                hold_years=hold_year
-            )
-
-            diff = cost_ice - cost_ev
-            diff_matrix[i, j] = diff
-
-            if abs(diff) < THRESHOLD:
-                choice_matrix[i, j] = 0
-            elif diff > 0:
-                choice_matrix[i, j] = 1   # 电车更便宜
-            else:
-                choice_matrix[i, j] = -1  # 油车更便宜
+    # 差值矩阵方便之后 debug / 标注
+    choice_matrix, diff_matrix = decision_grid(
+        {'brand': inputs['油车品牌'], 'new_price': inputs['油车新车价']},
+        {'brand': inputs['电车品牌'], 'new_price': inputs['电车新车价']},
+        START_YEARS,
+        HOLD_YEARS,
+        THRESHOLD,
+        Scenario.from_dict(inputs)
+    )
 
     # ===================== 绘制热力图 =====================
     plt.figure(figsize=(10, 8))
@@ -0,0 +1,269 @@
+"""
+车队批量评估
+从（可能很大的）CSV 中分块读取司机画像，在进程池中批量计算每位司机各候选车型的 NPV，
+结果边算边写入 Parquet 或 CSV，内存占用只与分块大小有关。每写完一块更新检查点，
+中断后重新运行同一命令即从检查点继续。
+
+画像 CSV：
+    司机          司机编号（列名可用 --id-column 指定）
+    <场景字段>     cm.SCENARIO_FIELDS 中的任意列，如 工作日单日里程、周末单日里程、
+                  工作日高速比例、周末高速比例、家充比例；缺失的列或空值取 inputs
+    候选车型       可选，分号分隔，如 "比亚迪 海豹;宝马 330i:300000"（冒号后为新车价），
+                  缺省用 --candidates
+
+输出为长表，每行一位司机的一个候选车型：司机、车型、动力、新车价、NPV、排名、推荐。
+    .csv      单个文件，逐块追加
+    .parquet  一个目录，每块一个 part-NNNNN.parquet 文件（需 pyarrow）
+
+用法：
+    python fleet_eval.py drivers.csv fleet.parquet --hold 5 --workers 8
+    python fleet_eval.py drivers.csv fleet.csv --candidates "比亚迪 海豹" "宝马 330i:300000"
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cost_model as cm
+import batch_model as bm
+
+CANDIDATE_COLUMN = '候选车型'
+
+
+def parse_candidate(text):
+    """'品牌' 或 '品牌:新车价' -> (品牌, 新车价)；未给出价格时按动力取 inputs 中的新车价。"""
+    brand, sep, price = text.strip().rpartition(':')
+    if sep:
+        return brand.strip(), float(price)
+    brand = price.strip()
+    is_ev = bool(cm.brand_library().is_ev[cm.brand_library().row(brand)])
+    return brand, float(cm.inputs['电车新车价'] if is_ev else cm.inputs['油车新车价'])
+
+
+def _evaluate(job):
+    """计算一块司机画像，返回 (司机数, 长表 DataFrame)。"""
+    chunk, id_column, default_candidates, start_year, end_year = job
+    lib = cm.brand_library()
+
+    if CANDIDATE_COLUMN in chunk:
+        per_driver = [
+            [parse_candidate(c) for c in str(cell).split(';') if c.strip()]
+            if isinstance(cell, str) and cell.strip() else default_candidates
+            for cell in chunk[CANDIDATE_COLUMN]
+        ]
+    else:
+        per_driver = [default_candidates] * len(chunk)
+    counts = np.array([len(c) for c in per_driver])
+    driver = np.repeat(np.arange(len(chunk)), counts)
+    brands = [b for cands in per_driver for b, _ in cands]
+    prices = np.array([p for cands in per_driver for _, p in cands], dtype=float)
+
+    params = {}
+    for key in cm.SCENARIO_FIELDS:
+        if key in chunk:
+            values = pd.to_numeric(chunk[key], errors='coerce').to_numpy(dtype=float)
+            values = np.where(np.isnan(values), cm.inputs[key], values)
+            params[key] = values[driver]
+
+    cf = bm.calc_cashflow_batch(brands, prices, start_year, end_year, params=params)
+    out = pd.DataFrame({
+        '司机': chunk[id_column].to_numpy()[driver],
+        '车型': brands,
+        '动力': [lib.power[lib.row(b)] for b in brands],
+        '新车价': prices,
+        'NPV': bm.batch_npv(cf),
+    })
+    out['排名'] = out.groupby(driver)['NPV'].rank(method='first', ascending=False).astype(int)
+    out['推荐'] = out['排名'] == 1
+    return len(chunk), out
+
+
+# ===================== 输出与检查点 =====================
+class _CsvSink:
+    """单个 CSV 文件，逐块追加；位置为已提交的字节数，续算时截断到该位置。"""
+
+    def __init__(self, path, position):
+        mode = 'r+b' if position and os.path.exists(path) else 'wb'
+        self.f = open(path, mode)
+        self.f.truncate(position)
+        self.f.seek(position)
+
+    def write(self, index, df):
+        df.to_csv(self.f, header=self.f.tell() == 0, index=False, encoding='utf-8')
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetSink:
+    """Parquet 目录，每块一个文件；从头开始时清空目录中已有的分块，续算时编号更大的残留文件会被覆盖。"""
+
+    def __init__(self, path, position):
+        # 在开始计算前检查，避免算完第一块才发现无法写出
+        if not any(importlib.util.find_spec(m) for m in ('pyarrow', 'fastparquet')):
+            raise ImportError("写 Parquet 需要安装 pyarrow（或 fastparquet）")
+        os.makedirs(path, exist_ok=True)
+        if position == 0:
+            # 上一次运行（--restart 或不同的分块大小）留下的分块会与本次结果混在一起
+            for stale in glob.glob(os.path.join(path, 'part-*.parquet')) + glob.glob(os.path.join(path, '*.tmp')):
+                os.remove(stale)
+        self.path = path
+
+    def write(self, index, df):
+        final = os.path.join(self.path, f'part-{index:05d}.parquet')
+        tmp = final + '.tmp'
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, final)
+        return index + 1
+
+    def close(self):
+        pass
+
+
+def _checkpoint_path(output):
+    return output.rstrip('/\\') + '.checkpoint.json'
+
+
+def _load_checkpoint(path, job):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state['job'] != job:
+        raise ValueError(f"检查点 {path} 对应的任务参数与本次不同，请加 --restart 重新开始")
+    return state
+
+
+def _save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_profiles(profiles, chunk_size, skip=0):
+    """分块读取画像 CSV；续算时由解析器直接跳过已处理的 skip 行，不再逐块解析后丢弃。"""
+    if not skip:
+        return pd.read_csv(profiles, chunksize=chunk_size, encoding='utf-8-sig')
+    columns = pd.read_csv(profiles, nrows=0, encoding='utf-8-sig').columns
+    return pd.read_csv(profiles, chunksize=chunk_size, encoding='utf-8-sig',
+                       skiprows=skip + 1, header=None, names=columns)
+
+
+def evaluate_fleet(profiles, output, candidates=None, start_year=1, hold_years=5,
+                   chunk_size=5000, workers=None, id_column='司机', restart=False, progress=True):
+    """
+    分块评估 profiles（CSV 路径）中的全部司机，结果写入 output（.csv 文件或 .parquet 目录）。
+
+    candidates: 默认候选车型（'品牌' 或 '品牌:新车价'），缺省为 inputs 中的油车与电车
+    workers: 进程数，None 为 CPU 核数，1 表示在当前进程内计算
+    restart: 忽略已有检查点，从头开始
+    返回已处理的司机数。
+    """
+    if candidates is None:
+        candidates = [cm.inputs['油车品牌'], cm.inputs['电车品牌']]
+    default_candidates = [parse_candidate(c) for c in candidates]
+    end_year = start_year + hold_years - 1
+    fmt = 'parquet' if output.rstrip('/\\').endswith('.parquet') else 'csv'
+
+    job = {
+        'profiles': os.path.abspath(profiles),
+        'chunk_size': chunk_size,
+        'candidates': [list(c) for c in default_candidates],
+        'start_year': start_year,
+        'end_year': end_year,
+        'id_column': id_column,
+    }
+    ckpt_path = _checkpoint_path(output)
+    state = None if restart else _load_checkpoint(ckpt_path, job)
+    if state is None:
+        state = {'job': job, 'chunks': 0, 'drivers': 0, 'position': 0, 'finished': False}
+    if state['finished']:
+        if progress:
+            print(f"{output} 已完成（{state['drivers']:,} 名司机），如需重算请加 --restart", file=sys.stderr)
+        return state['drivers']
+
+    sink = (_ParquetSink if fmt == 'parquet' else _CsvSink)(output, state['position'])
+    reader = _read_profiles(profiles, chunk_size, skip=state['chunks'] * chunk_size)
+    # 检查点恰在文件末尾时，跳过全部行后解析器仍会给出一个空块
+    jobs = ((chunk, id_column, default_candidates, start_year, end_year) for chunk in reader if len(chunk))
+
+    pool = None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+    in_flight = deque()
+    limit = 2 * (workers or os.cpu_count() or 1)
+    t0 = time.perf_counter()
+    done = 0
+
+    def commit(result):
+        nonlocal done
+        n, df = result
+        state['position'] = sink.write(state['chunks'], df)
+        state['chunks'] += 1
+        state['drivers'] += n
+        done += n
+        _save_checkpoint(ckpt_path, state)
+        if progress:
+            rate = done / (time.perf_counter() - t0)
+            print(f"\r已完成 {state['chunks']:,} 块，{state['drivers']:,} 名司机（{rate:,.0f} 名/秒）",
+                  end='', file=sys.stderr, flush=True)
+
+    try:
+        # 结果按块序写出，检查点中的块数即为输入中已处理的块数
+        for j in jobs:
+            if pool is None:
+                commit(_evaluate(j))
+                continue
+            in_flight.append(pool.submit(_evaluate, j))
+            if len(in_flight) >= limit:
+                commit(in_flight.popleft().result())
+        while in_flight:
+            commit(in_flight.popleft().result())
+    finally:
+        for fut in in_flight:
+            fut.cancel()
+        if pool is not None:
+            pool.shutdown()
+        sink.close()
+
+    state['finished'] = True
+    _save_checkpoint(ckpt_path, state)
+    if progress:
+        print(file=sys.stderr)
+    return state['drivers']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='车队司机画像批量评估')
+    parser.add_argument('profiles', help='司机画像 CSV')
+    parser.add_argument('output', help='输出路径：.csv 文件或 .parquet 目录')
+    parser.add_argument('--candidates', nargs='*', help="默认候选车型，'品牌' 或 '品牌:新车价'")
+    parser.add_argument('--start', type=int, default=1, help='起始年')
+    parser.add_argument('--hold', type=int, default=5, help='持有年限')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='每块司机数')
+    parser.add_argument('--workers', type=int, help='进程数，默认 CPU 核数')
+    parser.add_argument('--id-column', default='司机', help='司机编号列名')
+    parser.add_argument('--restart', action='store_true', help='忽略检查点，从头开始')
+    args = parser.parse_args(argv)
+
+    evaluate_fleet(
+        args.profiles, args.output, candidates=args.candidates,
+        start_year=args.start, hold_years=args.hold, chunk_size=args.chunk_size,
+        workers=args.workers, id_column=args.id_column, restart=args.restart
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+导入耗时预算检查
+在全新子进程中先导入该模块的依赖（不计时），再计时导入计算核心模块，只统计模块自身增加的耗时；
+预算按同一台机器上单独 `import numpy` 的耗时的倍数给出，机器快慢不影响结果。
+取多次运行的中位数与预算比较，并检查不应在导入时加载的依赖（matplotlib、pandas 等）。
+超出预算时以非零状态退出；tests/test_import_budget.py 在 pytest 中运行同样的检查。
+
+用法：python import_budget.py
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+# 作为基准的导入（单独计时）
+REFERENCE = 'numpy'
+
+# 模块: (预算，相对基准导入耗时的倍数, 预先导入且不计时的依赖, 导入时不应加载的模块)
+BUDGETS = {
+    'cost_model': (0.5, (), ('matplotlib', 'pandas', 'numpy')),
+    'batch_model': (0.75, ('numpy',), ('matplotlib', 'pandas')),
+    'breakeven': (0.75, ('numpy',), ('matplotlib', 'pandas')),
+}
+RUNS = 5
+
+PROBE = """
+import json, sys, time
+{preload}
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, forbidden=(), preload=()):
+    """返回 (导入 module 增加的耗时中位数, 导入时加载了的禁止模块)；preload 中的模块先导入、不计时。"""
+    times, loaded = [], set()
+    code = PROBE.format(module=module, forbidden=tuple(forbidden),
+                        preload='\n'.join(f'import {m}' for m in preload))
+    for _ in range(RUNS):
+        out = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result['elapsed'])
+        loaded.update(result['loaded'])
+    return statistics.median(times), sorted(loaded)
+
+
+def check():
+    """逐个模块检查，返回 [(模块, 耗时, 预算, 加载了的禁止模块), ...]，耗时与预算单位为秒。"""
+    reference, _ = measure(REFERENCE)
+    results = []
+    for module, (ratio, preload, forbidden) in BUDGETS.items():
+        elapsed, loaded = measure(module, forbidden, preload)
+        results.append((module, elapsed, ratio * reference, loaded))
+    return reference, results
+
+
+def main():
+    reference, results = check()
+    failed = False
+    print(f"基准 import {REFERENCE}: {reference * 1000:.1f} ms")
+    print(f"{'模块':<14}{'增量(ms)':>10}{'预算(ms)':>10}  结果")
+    for module, elapsed, budget, loaded in results:
+        ok = elapsed <= budget and not loaded
+        failed |= not ok
+        note = '通过' if ok else '超出预算' if not loaded else f"导入了 {', '.join(loaded)}"
+        print(f"{module:<14}{elapsed * 1000:>10.1f}{budget * 1000:>10.1f}  {note}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
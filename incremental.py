@@ -0,0 +1,176 @@
+"""
+增量重算模块
+按参数依赖图组织单辆车的现金流计算：每个节点（里程拆分、车辆价值、各分项、汇总列）
+记录自己依赖的场景参数与上游节点。参数变化后只重算受影响的节点及其下游；
+节点重算后结果与之前相同时（如只改了电车膨胀系数，年里程不变），下游不再重算。
+
+    model = IncrementalCashflow(cm.VehicleSpec('丰田 凯美瑞', 200000, 1, 5))
+    model.update(油价=8.5)          # 只重算 能源 → 净现金流 → 累计/折现
+    model.to_frame()
+    model.last_recomputed           # ('能源', '净现金流', '累计现金流', '折现现金流')
+
+结果与 cost_model.calc_cashflow 逐项一致。
+"""
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+import instrument
+
+# 覆盖年里程在依赖图中当作一个参数
+OVERRIDE = 'override_annual_mileage'
+
+PARTS = bm.COMPONENTS[:9]
+
+# 节点 -> (依赖的场景参数, 依赖的上游节点)；按拓扑顺序排列
+NODES = {
+    '里程拆分': (('工作日通勤天数', '工作日单日里程', '周末单日里程', '工作日高速比例',
+                 '周末高速比例', '电车膨胀系数', '电车膨胀开关', OVERRIDE), ()),
+    '年里程': ((), ('里程拆分',)),
+    '车辆价值': ((), ('年里程',)),
+    '购车': ((), ('车辆价值',)),
+    '能源': (('油价', '家充电价', '公共充电价', '家充比例'), ('里程拆分',)),
+    '保险': ((), ('车辆价值',)),
+    '保养': ((), ()),
+    '过路费': (('过路费单价',), ('里程拆分',)),
+    '停车费': (('停车费',), ()),
+    '油牌通胀': (('上海油牌通胀',), ()),
+    '罚款': (('罚款',), ()),
+    '卖车': ((), ('车辆价值',)),
+    '净现金流': ((), PARTS),
+    '累计现金流': ((), ('净现金流',)),
+    '折现现金流': (('折现率',), ('净现金流',)),
+}
+
+
+def _same(a, b):
+    if isinstance(a, tuple):
+        return all(np.array_equal(x, y) for x, y in zip(a, b))
+    return np.array_equal(a, b)
+
+
+class IncrementalCashflow:
+    """单辆车在可变场景下的现金流，参数变化时只重算受影响的节点。"""
+
+    def __init__(self, vehicle, scenario=None, override_annual_mileage=None, years=None):
+        self.vehicle = vehicle
+        v = bm.vehicle_args(vehicle)
+        self.table = bm.brand_table()
+        self.b = self.table.rows([v['brand']])
+        self.ev = np.array([v['is_ev']])
+        self.new_price = np.array([v['new_price']])
+        self.start = np.array([v['start_year']])
+        self.end = np.array([v['end_year']])
+        self.purchase_km = np.array([v['oil_purchase_mileage']])
+        self.years = cm.YEARS if years is None else int(years)
+
+        year = np.arange(1, self.years + 1)[None, :]
+        self._year = year
+        self._in_use = (self.start[:, None] <= year) & (year <= self.end[:, None])
+
+        self.scenario = cm.Scenario() if scenario is None else scenario
+        self._params = {k: np.array([float(v)], dtype=float) for k, v in self.scenario.items()}
+        self._params[OVERRIDE] = np.array([np.nan if override_annual_mileage is None
+                                           else float(override_annual_mileage)])
+        self._values = {}
+        self.last_recomputed = self._recompute(set(NODES))
+
+    # ===================== 节点计算 =====================
+    def _compute(self, node):
+        p, v = self._params, self._values
+        in_use, year = self._in_use, self._year
+        if node == '里程拆分':
+            return bm.split_mileage(p, p[OVERRIDE])
+        if node == '年里程':
+            return v['里程拆分'][0]
+        if node == '车辆价值':
+            return bm.vehicle_values(self.table, self.b, self.ev, self.new_price, self.start,
+                                     self.purchase_km, v['年里程'], self.years)
+        if node == '购车':
+            return np.where(year == self.start[:, None], -v['车辆价值'][0][:, None], 0.0)
+        if node == '能源':
+            amount = bm.energy_per_year(self.table, self.b, self.ev, p, *v['里程拆分'])
+            return np.where(in_use, amount[:, None], 0.0)
+        if node == '保险':
+            factor = np.where(year == 1, 1.0, np.where(year == 2, 0.90, 0.85))
+            rate = self.table.insurance_rate[self.b][:, None]
+            return np.where(in_use, -v['车辆价值'][1] * rate * factor, 0.0)
+        if node == '保养':
+            return np.where(in_use, -self.table.maintenance[self.b][:, None], 0.0)
+        if node == '过路费':
+            return np.where(in_use, (-v['里程拆分'][2] * p['过路费单价'])[:, None], 0.0)
+        if node == '停车费':
+            return np.where(in_use, -p['停车费'][:, None], 0.0)
+        if node == '油牌通胀':
+            return np.where(in_use & ~self.ev[:, None], -p['上海油牌通胀'][:, None], 0.0)
+        if node == '罚款':
+            return np.where(in_use, -p['罚款'][:, None], 0.0)
+        if node == '卖车':
+            return np.where(in_use & (year == self.end[:, None]), v['车辆价值'][1], 0.0)
+        if node == '净现金流':
+            # 与 calc_cashflow 相同的求和顺序，保证逐位一致
+            net = v[PARTS[0]]
+            for part in PARTS[1:]:
+                net = net + v[part]
+            return net
+        if node == '累计现金流':
+            return np.cumsum(v['净现金流'], axis=1)
+        if node == '折现现金流':
+            return v['净现金流'] / ((1 + p['折现率'][:, None]) ** (year - 1))
+        raise KeyError(node)
+
+    def _recompute(self, dirty):
+        """按拓扑顺序重算 dirty 中的节点；结果未变的节点不向下游传播。返回实际重算的节点。"""
+        recomputed = []
+        for node, (_, deps) in NODES.items():
+            if node not in dirty and not any(d in dirty for d in deps):
+                continue
+            value = self._compute(node)
+            old = self._values.get(node)
+            self._values[node] = value
+            recomputed.append(node)
+            if old is None or not _same(old, value):
+                dirty.add(node)
+            else:
+                dirty.discard(node)
+        return tuple(recomputed)
+
+    # ===================== 对外接口 =====================
+    def update(self, scenario=None, override_annual_mileage=None, **changes):
+        """
+        修改场景参数并增量重算。可传入新的 cm.Scenario，或以关键字给出个别字段；
+        override_annual_mileage 传入时同时修改覆盖年里程（NaN 表示取消覆盖）。返回 self。
+        """
+        new = self.scenario if scenario is None else scenario
+        if changes:
+            new = new.replace(**changes)
+        values = dict(new.items())
+        if override_annual_mileage is not None:
+            values[OVERRIDE] = override_annual_mileage
+        changed = {k for k, x in values.items() if self._params[k][0] != x and
+                   not (np.isnan(self._params[k][0]) and np.isnan(x))}
+        self.scenario = new
+        for k in changed:
+            self._params[k] = np.array([float(values[k])], dtype=float)
+
+        dirty = {node for node, (params, _) in NODES.items() if changed.intersection(params)}
+        self.last_recomputed = self._recompute(dirty)
+
+        prof = instrument.active()
+        if prof is not None:
+            prof.count('增量更新')
+            prof.count('增量重算节点', len(self.last_recomputed))
+        return self
+
+    @property
+    def result(self):
+        """形状为 (年数, len(COMPONENTS)) 的数组，列顺序同 batch_model.COMPONENTS。"""
+        return np.stack([self._values[c][0] for c in bm.COMPONENTS], axis=-1)
+
+    def npv(self):
+        return float(self._values['折现现金流'].sum())
+
+    def to_frame(self):
+        """与 calc_cashflow 返回格式相同的 DataFrame。"""
+        return bm.batch_to_frame(self.result[None], 0)
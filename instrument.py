@@ -0,0 +1,153 @@
+"""
+计算热点的可选埋点
+打开后记录 calc_cashflow / 批量计算各阶段的耗时与调用次数、已计算的场景数以及各缓存的命中率；
+关闭时（默认）被埋点的代码只多一次 `active()` 判断，开销可忽略。
+
+用法：
+    import instrument
+    with instrument.profile() as prof:
+        ...                      # 运行任意脚本逻辑
+    print(prof.report())
+    prof.export('profile.json')  # 或 .csv
+
+    @instrument.profiled()       # 装饰器形式：函数返回后打印报告，结果挂在 func.last_profile 上
+    def main(): ...
+
+当前 Profile 记在 contextvars 中，按线程（及 asyncio 任务）隔离：同时打开的多个 profile()
+（如多个 Streamlit 会话）互不计入、可按任意顺序退出；线程池中的工作线程不继承调用方的 Profile。
+缓存命中也按 Profile 计数（缓存每次查找时调用 cache_event），不取进程级计数器的差值，
+因此其它会话的查找不会计入本次报告，缓存被 clear() 也不会出现负数。
+"""
+
+import contextvars
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_active = contextvars.ContextVar('instrument_profile', default=None)
+_caches = {}
+
+
+def active():
+    """当前上下文中正在收集的 Profile；未开启时返回 None。"""
+    return _active.get()
+
+
+def register_cache(name, cache):
+    """登记一个缓存，报告中总会列出它（本次没有查找时计为 0）；命中数由缓存调用 cache_event 计入。"""
+    _caches[name] = cache
+
+
+def cache_event(name, hit):
+    """缓存 name 的一次查找（hit 为是否命中），计入当前上下文的 Profile；未开启时只多一次判断。"""
+    prof = _active.get()
+    if prof is not None:
+        counts = prof._cache_counts.setdefault(name, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+class Profile:
+    """一次收集的结果：阶段耗时、计数器与缓存命中变化。"""
+
+    def __init__(self):
+        self.stage_time = {}
+        self.stage_calls = {}
+        self.counters = {}
+        self.cache_stats = {}
+        self.wall_time = 0.0
+        self._cache_counts = {}     # 缓存名 -> [命中, 未命中]，由 cache_event 累加
+
+    def lap(self, stage, t0):
+        """把 t0 到现在的耗时记到 stage 上，返回当前时间作为下一阶段的起点。"""
+        now = time.perf_counter()
+        self.stage_time[stage] = self.stage_time.get(stage, 0.0) + (now - t0)
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+        return now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _finish(self, wall_time):
+        self.wall_time = wall_time
+        for name in {**_caches, **self._cache_counts}:
+            hits, misses = self._cache_counts.get(name, (0, 0))
+            total = hits + misses
+            self.cache_stats[name] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / total if total else 0.0,
+            }
+
+    def to_dict(self):
+        return {
+            'wall_time_s': self.wall_time,
+            'stages': {
+                stage: {'calls': self.stage_calls[stage], 'total_s': t}
+                for stage, t in self.stage_time.items()
+            },
+            'counters': dict(self.counters),
+            'caches': dict(self.cache_stats),
+        }
+
+    def to_frame(self):
+        """阶段耗时表（按总耗时降序）。"""
+        import pandas as pd
+        total = sum(self.stage_time.values()) or 1.0
+        rows = [
+            [stage, self.stage_calls[stage], t * 1000, t / self.stage_calls[stage] * 1e6, t / total]
+            for stage, t in self.stage_time.items()
+        ]
+        df = pd.DataFrame(rows, columns=['阶段', '次数', '总耗时(ms)', '平均(us)', '占比'])
+        return df.sort_values('总耗时(ms)', ascending=False, ignore_index=True)
+
+    def report(self):
+        """文本报告：阶段耗时、计数器与缓存命中率。"""
+        lines = [f"总耗时: {self.wall_time * 1000:,.1f} ms"]
+        total = sum(self.stage_time.values()) or 1.0
+        lines.append(f"{'阶段':<20}{'次数':>10}{'总耗时(ms)':>14}{'平均(us)':>12}{'占比':>8}")
+        for stage, t in sorted(self.stage_time.items(), key=lambda kv: -kv[1]):
+            calls = self.stage_calls[stage]
+            lines.append(f"{stage:<20}{calls:>10,}{t * 1000:>14,.2f}{t / calls * 1e6:>12,.1f}{t / total:>8.1%}")
+        for name, n in self.counters.items():
+            lines.append(f"{name}: {n:,}")
+        for name, s in self.cache_stats.items():
+            lines.append(f"缓存 {name}: 命中 {s['hits']:,} / 未命中 {s['misses']:,}（命中率 {s['hit_rate']:.1%}）")
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """按扩展名导出为 JSON 或 CSV（CSV 只含阶段耗时表）。"""
+        if path.endswith('.csv'):
+            self.to_frame().to_csv(path, index=False)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+@contextmanager
+def profile():
+    """在 with 块内开启埋点，产出 Profile；退出时恢复本上下文之前的状态。"""
+    prof = Profile()
+    token = _active.set(prof)
+    t0 = time.perf_counter()
+    try:
+        yield prof
+    finally:
+        prof._finish(time.perf_counter() - t0)
+        _active.reset(token)
+
+
+def profiled(report=True):
+    """装饰器：对整个函数调用收集 Profile，挂在 wrapper.last_profile 上，report 为真时打印报告。"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile() as prof:
+                result = func(*args, **kwargs)
+            wrapper.last_profile = prof
+            if report:
+                print(prof.report())
+            return result
+        wrapper.last_profile = None
+        return wrapper
+    return decorator
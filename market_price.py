@@ -0,0 +1,80 @@
+"""
+二手市场成交价曲线模块
+从数据文件读取各车型的 里程→成交价 点，按二分查找做分段线性插值，
+可一次对整个里程数组求价格。首点以下、末点以上的外推方式可配置：
+    'flat'   取端点价格
+    'linear' 沿端点所在线段的斜率外推
+默认与原先 A4 Avant 的规则一致：首点以下 'flat'，末点以上 'linear'。
+
+文件格式（CSV，每行一个点，同一车型的点按里程排序或乱序均可）：
+    品牌,里程,成交价
+"""
+
+import csv
+import os
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_prices.csv')
+
+EXTRAPOLATIONS = ('flat', 'linear')
+
+
+class MarketCurve:
+    """单个车型的 里程→成交价 曲线。"""
+    __slots__ = ('xs', 'ys', 'left', 'right')
+
+    def __init__(self, xs, ys, left='flat', right='linear'):
+        if left not in EXTRAPOLATIONS or right not in EXTRAPOLATIONS:
+            raise ValueError(f"外推方式只能是 {EXTRAPOLATIONS}")
+        order = np.argsort(xs, kind='stable')
+        self.xs = np.asarray(xs, dtype=float)[order]
+        self.ys = np.asarray(ys, dtype=float)[order]
+        if len(self.xs) < 2:
+            raise ValueError("成交价曲线至少需要两个点")
+        self.left, self.right = left, right
+        self.xs.setflags(write=False)
+        self.ys.setflags(write=False)
+
+    def price(self, mileage):
+        """按里程求成交价，mileage 可为标量或任意形状的数组。"""
+        xs, ys = self.xs, self.ys
+        m = np.asarray(mileage, dtype=float)
+        # 第一个满足 mileage <= x[i+1] 的线段 i；超出末点时用最后一段
+        seg = np.minimum(np.searchsorted(xs[1:], m, side='left'), len(xs) - 2)
+        x0, y0 = xs[seg], ys[seg]
+        x1, y1 = xs[seg + 1], ys[seg + 1]
+        inner = y0 + (y1 - y0) * (m - x0) / (x1 - x0)
+
+        if self.left == 'flat':
+            below = ys[0]
+        else:
+            below = ys[0] + (ys[1] - ys[0]) / (xs[1] - xs[0]) * (m - xs[0])
+        if self.right == 'flat':
+            above = ys[-1]
+        else:
+            above = ys[-1] + (ys[-1] - ys[-2]) / (xs[-1] - xs[-2]) * (m - xs[-1])
+
+        return np.where(m <= xs[0], below, np.where(m <= xs[-1], inner, above))
+
+
+_cache = {}
+
+
+def load_market_curves(path=None, left='flat', right='linear'):
+    """读取成交价曲线文件，返回 {品牌: MarketCurve}；同一文件未修改时返回缓存结果。"""
+    path = os.path.abspath(path or DEFAULT_PATH)
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size, left, right)
+    curves = _cache.get(key)
+    if curves is None:
+        points = {}
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                points.setdefault(row['品牌'], []).append((float(row['里程']), float(row['成交价'])))
+        curves = {
+            brand: MarketCurve([p[0] for p in pts], [p[1] for p in pts], left, right)
+            for brand, pts in points.items()
+        }
+        _cache[key] = curves
+    return curves
@@ -2,39 +2,40 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-from cost_model import calc_cashflow, inputs
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
+from cost_model import Scenario, VehicleSpec, inputs
+from breakeven import breakeven_mileages, npv_gap
+import batch_model as bm
+from result_set import CashflowSet
+from plot_style import use_chinese_font
+
+use_chinese_font()
 
 # 年里程范围：5k ~ 40k
 mileages = np.arange(5000, 40001, 2500)
 
-oil_costs = []
-ev_costs = []
-cost_diff = []  # 油车成本 - 电车成本（正数表示电车更便宜）
-
-for m in mileages:
-    # 无需修改 inputs，直接传入年里程参数
-    oil_cf = calc_cashflow(
-        inputs['油车品牌'],
-        inputs['油车新车价'],
-        1, 5, False,
-        override_annual_mileage=m
-    )
-    ev_cf = calc_cashflow(
-        inputs['电车品牌'],
-        inputs['电车新车价'],
-        1, 5, True,
-        override_annual_mileage=m
-    )
-
-    oil_total = -oil_cf['折现现金流'].sum()
-    ev_total = -ev_cf['折现现金流'].sum()
-    
-    oil_costs.append(oil_total)
-    ev_costs.append(ev_total)
-    cost_diff.append(oil_total - ev_total)  # 正数 = 电车更便宜
+scenario = Scenario.from_dict(inputs)
+oil_car = VehicleSpec(inputs['油车品牌'], inputs['油车新车价'], 1, 5, False)
+ev_car = VehicleSpec(inputs['电车品牌'], inputs['电车新车价'], 1, 5, True)
+
+# 一次批量计算全部里程点（前半为油车，后半为电车）
+n = len(mileages)
+cf = bm.calc_cashflow_batch(
+    [oil_car.brand] * n + [ev_car.brand] * n,
+    [oil_car.new_price] * n + [ev_car.new_price] * n,
+    1, 5,
+    [False] * n + [True] * n,
+    override_annual_mileage=np.concatenate([mileages, mileages]),
+    params=scenario
+)
+results = CashflowSet(cf, labels={
+    '动力': np.repeat(['油', '电'], n),
+    '年里程': np.concatenate([mileages, mileages]),
+})
+npv = results.npv
+
+oil_costs = -npv[:n]
+ev_costs = -npv[n:]
+cost_diff = oil_costs - ev_costs  # 油车成本 - 电车成本（正数表示电车更便宜）
 
 # ===================== 创建可视化 =====================
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
@@ -82,15 +83,16 @@ print(f"分析周期：5 年（起始年=1，结束年=5）\n")
 
 result_df = pd.DataFrame({
     '年里程(km)': mileages,
-    '油车成本(元)': [int(x) for x in oil_costs],
-    '电车成本(元)': [int(x) for x in ev_costs],
-    '成本差(元)': [int(x) for x in cost_diff],
-    '电车优势': ['电车更便宜' if d > 0 else '油车更便宜' for d in cost_diff]
+    '油车成本(元)': oil_costs.astype(int),
+    '电车成本(元)': ev_costs.astype(int),
+    '成本差(元)': cost_diff.astype(int),
+    '电车优势': np.where(cost_diff > 0, '电车更便宜', '油车更便宜')
 })
 
 print(result_df.to_string(index=False))
 
-# 找出盈亏平衡点
-breakeven_idx = np.argmin(np.abs(cost_diff))
-print(f"\n盈亏平衡点（近似）：年里程约 {int(mileages[breakeven_idx])} km，差异为 {int(cost_diff[breakeven_idx])} 元")
+# 精确求解盈亏平衡点（可能不止一个）
+for m in breakeven_mileages(oil_car, ev_car, lo=0, hi=100000, params=scenario):
+    diff = -npv_gap(oil_car, ev_car, [m], scenario)[0]  # 与上表一致：油车成本 - 电车成本
+    print(f"\n盈亏平衡点：年里程 {m:,.0f} km，差异为 {int(diff)} 元（残值换档处差异可能跳变）")
 print(f"里程越高，电车优势越明显（能源成本占比高）")
@@ -0,0 +1,244 @@
+"""
+蒙特卡洛不确定性分析模块
+按用户给定的分布抽取油价、电价、通勤里程、高速比例、折现率及残值率系数，
+分块批量计算两辆车的 NPV，在进程池中并行（同时在途的块数有上限），并以流式直方图汇总：
+内存占用只与分块大小和进程数有关，与路径总数无关。直方图的范围由第一块确定，
+之后出现范围外的取值时按 2 倍合并相邻格子扩大范围，不会堆在溢出格里。
+
+可复现性：第 i 块的随机数由 SeedSequence(seed, spawn_key=(i,)) 生成，
+结果按块序合并，因此同一 seed、同一 chunk_size 下结果与进程数无关。
+
+分布写法（键为 cm.inputs 中的字段名，或 '残值率' 表示残值曲线的乘性系数）：
+    {'油价': ('normal', 7.0, 0.8),
+     '家充电价': ('uniform', 0.3, 0.8),
+     '工作日单日里程': ('triangular', 30, 60, 120),
+     '折现率': ('lognormal', 0.06, 0.3),
+     '残值率': ('normal', 1.0, 0.08)}
+'残值率' 系数乘在残值率曲线上；有二手成交价曲线的车型（给出购入里程时）乘在成交价上。
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cost_model as cm
+import batch_model as bm
+
+# 分项（不含净现金流等汇总列）
+PARTS = bm.COMPONENTS[:9]
+
+# 比例类参数抽样后截断到 [0, 1]，其余参数截断到非负
+RATIO_KEYS = ('家充比例', '工作日高速比例', '周末高速比例')
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def draw(rng, spec, size):
+    """按分布描述抽样。"""
+    kind, *args = spec
+    if kind == 'normal':
+        return rng.normal(args[0], args[1], size)
+    if kind == 'uniform':
+        return rng.uniform(args[0], args[1], size)
+    if kind == 'triangular':
+        return rng.triangular(args[0], args[1], args[2], size)
+    if kind == 'lognormal':
+        # args: (中位数, 对数标准差)
+        return args[0] * np.exp(rng.normal(0.0, args[1], size))
+    if kind == 'fixed':
+        return np.full(size, float(args[0]))
+    raise ValueError(f"未知分布类型: {kind}")
+
+
+def _sample(distributions, base, rng, size):
+    """抽取一块路径的参数，返回 (params, residual_scale)。"""
+    params = {k: base[k] for k in bm.PARAM_KEYS}
+    residual_scale = None
+    for key, spec in distributions.items():
+        values = draw(rng, spec, size)
+        if key == '残值率':
+            residual_scale = np.maximum(values, 0.0)
+        elif key in RATIO_KEYS:
+            params[key] = np.clip(values, 0.0, 1.0)
+        elif key in bm.PARAM_KEYS:
+            params[key] = np.maximum(values, 0.0)
+        else:
+            raise KeyError(f"不支持抽样的参数: {key}")
+    return params, residual_scale
+
+
+def _simulate(job):
+    """计算一块路径，返回每条路径的统计量矩阵 (路径数, 3 + 2 × 分项数)。"""
+    vehicle_a, vehicle_b, distributions, base, seed, index, size = job
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+    params, residual_scale = _sample(distributions, base, rng, size)
+
+    values = []
+    npv = []
+    for v in (vehicle_a, vehicle_b):
+        cf = bm.calc_cashflow_batch(
+            v['brand'], v['new_price'], v['start_year'], v['end_year'], v['is_ev'],
+            oil_purchase_mileage=v['oil_purchase_mileage'],
+            params=params,
+            residual_scale=residual_scale
+        )
+        year = np.arange(cf.shape[1])
+        discount = (1 + np.asarray(params['折现率'], dtype=float).reshape(-1, 1)) ** year
+        parts = (cf[..., :len(PARTS)] / discount[..., None]).sum(axis=1)
+        npv.append(parts.sum(axis=1))
+        values.append(parts)
+    return np.column_stack([npv[0], npv[1], npv[0] - npv[1], values[0], values[1]])
+
+
+class _Histogram:
+    """
+    定宽直方图 + 累计和，用于流式求分位数与均值。每列的范围为 [lo, lo + bins × width)，
+    新数据超出范围时把相邻两格合并、宽度加倍，向超出的一侧扩大范围，直到容纳全部取值。
+    """
+
+    def __init__(self, pilot, bins):
+        if bins % 2:
+            raise ValueError(f"bins 必须为偶数，实际为 {bins}")
+        lo, hi = pilot.min(axis=0), pilot.max(axis=0)
+        pad = np.maximum((hi - lo) * 0.5, np.maximum(np.abs(hi) * 1e-9, 1.0))
+        self.lo = lo - pad
+        self.width = (hi - lo + 2 * pad) / bins
+        self.bins = bins
+        self.counts = np.zeros((pilot.shape[1], bins), dtype=np.int64)
+        self.total = np.zeros(pilot.shape[1])
+        self.n = 0
+
+    @property
+    def hi(self):
+        return self.lo + self.bins * self.width
+
+    def _grow(self, j, downward):
+        """第 j 列宽度加倍：相邻两格合并，原范围落在新范围的上半（向下扩）或下半（向上扩）。"""
+        half = self.bins // 2
+        merged = self.counts[j].reshape(half, 2).sum(axis=1)
+        self.counts[j] = 0
+        if downward:
+            self.counts[j, half:] = merged
+            self.lo[j] -= self.bins * self.width[j]
+        else:
+            self.counts[j, :half] = merged
+        self.width[j] *= 2
+
+    def add(self, values):
+        for j in range(values.shape[1]):
+            while values[:, j].min() < self.lo[j]:
+                self._grow(j, downward=True)
+            while values[:, j].max() >= self.hi[j]:
+                self._grow(j, downward=False)
+        idx = np.floor((values - self.lo) / self.width).astype(np.int64)
+        idx = np.clip(idx, 0, self.bins - 1)
+        for j in range(values.shape[1]):
+            self.counts[j] += np.bincount(idx[:, j], minlength=self.bins)
+        self.total += values.sum(axis=0)
+        self.n += len(values)
+
+    def quantile(self, q):
+        """按直方图线性插值求分位数。"""
+        out = np.empty(len(self.total))
+        for j in range(len(out)):
+            edges = self.lo[j] + self.width[j] * np.arange(self.bins + 1)
+            cdf = np.concatenate([[0], np.cumsum(self.counts[j])]) / self.n
+            out[j] = np.interp(q, cdf, edges)
+        return out
+
+    def mean(self):
+        return self.total / self.n
+
+
+def run_monte_carlo(vehicle_a, vehicle_b, distributions, n_paths=1_000_000, seed=0,
+                    workers=None, chunk_size=20_000, bins=4096, quantiles=DEFAULT_QUANTILES,
+                    scenario=None):
+    """
+    蒙特卡洛模拟两辆车（车辆字典同 batch_model.vehicle_args）的 NPV 分布。
+
+    workers: 进程数，None 为 CPU 核数，1 表示在当前进程内计算
+    scenario: 未抽样参数的取值（cm.Scenario），默认取当前 inputs
+    返回字典：
+        'paths': 路径数
+        'p_b_cheaper': 车辆 b 成本更低（NPV 更高）的概率
+        'npv': NPV 分位数与均值（列：车辆a / 车辆b / 差值(a-b)）
+        'components': 各分项折现合计的分位数与均值（多级列：车辆、分项）
+    分位数精度约为 直方图范围 / bins；范围由第一块确定（取值范围 × 2），之后按需加倍。
+    """
+    a, b = bm.vehicle_args(vehicle_a), bm.vehicle_args(vehicle_b)
+    base = (cm.Scenario() if scenario is None else scenario).as_dict()
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    jobs = ((a, b, distributions, base, seed, i, size) for i, size in enumerate(sizes))
+
+    # 第 0 块同时用来确定直方图的初始范围
+    pilot = _simulate(next(jobs))
+    hist = _Histogram(pilot, bins)
+    b_cheaper = 0
+
+    def reduce(values):
+        nonlocal b_cheaper
+        hist.add(values)
+        b_cheaper += int(np.count_nonzero(values[:, 2] < 0))
+
+    reduce(pilot)
+    pool = None if workers == 1 or len(sizes) == 1 else ProcessPoolExecutor(max_workers=workers)
+    in_flight = deque()
+    limit = 2 * (workers or os.cpu_count() or 1)
+    try:
+        # 按块序合并，并限制在途的块数：汇总慢于计算时，已完成的结果不会越积越多
+        for job in jobs:
+            if pool is None:
+                reduce(_simulate(job))
+                continue
+            in_flight.append(pool.submit(_simulate, job))
+            if len(in_flight) >= limit:
+                reduce(in_flight.popleft().result())
+        while in_flight:
+            reduce(in_flight.popleft().result())
+    finally:
+        for fut in in_flight:
+            fut.cancel()
+        if pool is not None:
+            pool.shutdown()
+
+    index = [f'P{int(q * 100)}' for q in quantiles] + ['均值']
+    table = np.vstack([hist.quantile(q) for q in quantiles] + [hist.mean()])
+
+    npv = pd.DataFrame(table[:, :3], index=index, columns=['车辆a', '车辆b', '差值(a-b)'])
+    columns = pd.MultiIndex.from_product([['车辆a', '车辆b'], PARTS])
+    components = pd.DataFrame(table[:, 3:], index=index, columns=columns)
+
+    return {
+        'paths': hist.n,
+        'p_b_cheaper': b_cheaper / hist.n,
+        'npv': npv,
+        'components': components,
+    }
+
+
+if __name__ == '__main__':
+    oil_car, ev_car = cm.default_vehicles()
+    distributions = {
+        '油价': ('normal', cm.inputs['油价'], 0.8),
+        '家充电价': ('uniform', 0.3, 0.8),
+        '公共充电价': ('uniform', 1.0, 2.0),
+        '工作日单日里程': ('triangular', 30, cm.inputs['工作日单日里程'], 120),
+        '周末单日里程': ('triangular', 40, cm.inputs['周末单日里程'], 200),
+        '工作日高速比例': ('uniform', 0.2, 0.8),
+        '周末高速比例': ('uniform', 0.2, 0.8),
+        '折现率': ('lognormal', cm.inputs['折现率'], 0.3),
+        '残值率': ('normal', 1.0, 0.08),
+    }
+    summary = run_monte_carlo(oil_car, ev_car, distributions, n_paths=200_000, seed=42,
+                              scenario=cm.Scenario.from_dict(cm.inputs))
+
+    pd.set_option('display.float_format', '{:,.0f}'.format)
+    print(f"\n路径数: {summary['paths']:,}")
+    print(f"电车更便宜的概率: {summary['p_b_cheaper']:.1%}")
+    print("\n======== NPV 分布（元） ========")
+    print(summary['npv'])
+    print("\n======== 分项折现合计（元） ========")
+    print(summary['components'].T)
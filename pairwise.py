@@ -0,0 +1,174 @@
+"""
+全品牌两两对比
+对品牌库中每一款油车 × 每一款电车，在所有起始年与持有年限上比较成本：
+先对每辆车、每个 (起始年, 持有年限) 只算一次成本曲线（一次批量计算），
+再用广播组合成完整的差值张量，不再为每一对车型重复计算。
+
+    cmp = compare_all_pairs(scenario, oil_start_years=range(1, 9), hold_years=range(2, 7))
+    cmp.gap                  # (油车, 电车, 油车起始年, 电车起始年, 持有年限)，油车成本 − 电车成本
+    cmp.report()             # 每对车型、每个持有年限下电车更便宜的油车购入年份
+
+油车起始年 > 1 表示买入二手油车（购车价按模型的二手价计算），电车默认第 1 年买新车。
+计算年数自动延长到最晚的结束年，不截断持有期。
+"""
+
+import numpy as np
+import pandas as pd
+
+import cost_model as cm
+import batch_model as bm
+
+
+def _default_price(lib, brand):
+    return float(cm.inputs['电车新车价'] if lib.is_ev[lib.row(brand)] else cm.inputs['油车新车价'])
+
+
+def vehicle_costs(brands, start_years, hold_years, scenario=None, prices=None, oil_purchase_mileage=None,
+                  store=None):
+    """
+    每个车型在每个 (起始年, 持有年限) 下的成本（−NPV），形状 (品牌数, 起始年数, 持有年限数)。
+    所有组合合并为一次批量计算。prices 为 {品牌: 新车价}，缺省按动力取 inputs 中的新车价。
+    store 为 result_store.ResultStore 时先从结果库读取，只批量计算未命中的组合并写回。
+    """
+    lib = cm.brand_library()
+    prices = prices or {}
+    starts = np.asarray(list(start_years), dtype=np.int64)
+    holds = np.asarray(list(hold_years), dtype=np.int64)
+    B, S, H = np.meshgrid(np.arange(len(brands)), starts, holds, indexing='ij')
+    B, S, E = B.ravel(), S.ravel(), (S + H - 1).ravel()
+    names = np.asarray(brands, dtype=object)[B]
+    new_price = np.array([prices.get(b, _default_price(lib, b)) for b in brands])[B]
+    is_ev = lib.is_ev[lib.rows(brands)][B]
+    pm = np.where(is_ev | (S == 1), np.nan,
+                  np.nan if oil_purchase_mileage is None else float(oil_purchase_mileage))
+
+    years = max(int(E.max()), 1)
+    shape = (len(brands), len(starts), len(holds))
+    if store is None:
+        cf = bm.calc_cashflow_batch(
+            names, new_price, S, E, is_ev, oil_purchase_mileage=pm, params=scenario, years=years
+        )
+        return -bm.batch_npv(cf).reshape(shape)
+
+    vehicles = [
+        {'brand': names[i], 'new_price': new_price[i], 'start_year': S[i], 'end_year': E[i],
+         'is_ev': is_ev[i], 'oil_purchase_mileage': pm[i]}
+        for i in range(len(names))
+    ]
+    npv = np.empty(len(vehicles))
+    missing = []
+    for i, vehicle in enumerate(vehicles):
+        hit = store.get(vehicle, scenario, years=years)
+        if hit is None:
+            missing.append(i)
+        else:
+            npv[i] = hit[1]
+    if missing:
+        m = np.asarray(missing)
+        cf = bm.calc_cashflow_batch(
+            names[m], new_price[m], S[m], E[m], is_ev[m],
+            oil_purchase_mileage=pm[m], params=scenario, years=years
+        )
+        npv[m] = bm.batch_npv(cf)
+        for i, values in zip(missing, cf):
+            store.put(vehicles[i], scenario, values, years=years)
+    return -npv.reshape(shape)
+
+
+class PairwiseComparison:
+    """油车 × 电车的成本与差值张量。"""
+
+    def __init__(self, oil_brands, ev_brands, oil_start_years, ev_start_years, hold_years,
+                 oil_cost, ev_cost):
+        self.oil_brands = list(oil_brands)
+        self.ev_brands = list(ev_brands)
+        self.oil_start_years = list(oil_start_years)
+        self.ev_start_years = list(ev_start_years)
+        self.hold_years = list(hold_years)
+        self.oil_cost = oil_cost    # (油车, 油车起始年, 持有年限)
+        self.ev_cost = ev_cost      # (电车, 电车起始年, 持有年限)
+
+    @property
+    def gap(self):
+        """油车成本 − 电车成本（正数表示电车更便宜），形状 (油车, 电车, 油车起始年, 电车起始年, 持有年限)。"""
+        return self.oil_cost[:, None, :, None, :] - self.ev_cost[None, :, None, :, :]
+
+    def pair(self, oil_brand, ev_brand, ev_start_year=None):
+        """一对车型的差值矩阵，形状 (油车起始年, 持有年限)。"""
+        i = self.oil_brands.index(oil_brand)
+        j = self.ev_brands.index(ev_brand)
+        k = 0 if ev_start_year is None else self.ev_start_years.index(ev_start_year)
+        return self.oil_cost[i] - self.ev_cost[j, k][None, :]
+
+    def to_frame(self):
+        """长表：油车、电车、油车起始年、电车起始年、持有年限、油车成本、电车成本、差值。"""
+        gap = self.gap
+        idx = np.indices(gap.shape).reshape(5, -1)
+        return pd.DataFrame({
+            '油车': np.asarray(self.oil_brands, dtype=object)[idx[0]],
+            '电车': np.asarray(self.ev_brands, dtype=object)[idx[1]],
+            '油车起始年': np.asarray(self.oil_start_years)[idx[2]],
+            '电车起始年': np.asarray(self.ev_start_years)[idx[3]],
+            '持有年限': np.asarray(self.hold_years)[idx[4]],
+            '油车成本': self.oil_cost[idx[0], idx[2], idx[4]],
+            '电车成本': self.ev_cost[idx[1], idx[3], idx[4]],
+            '差值': gap.ravel(),
+        })
+
+    def report(self, threshold=0.0):
+        """
+        每对车型、每个电车起始年与持有年限一行：电车比油车便宜超过 threshold 元的油车购入年份、
+        这样的年份数，以及差值的最小/最大值。
+        """
+        gap = self.gap
+        O, E, _, Se, H = gap.shape
+        years = np.asarray(self.oil_start_years)
+        rows = []
+        for i in range(O):
+            for j in range(E):
+                for k in range(Se):
+                    for h in range(H):
+                        g = gap[i, j, :, k, h]
+                        wins = years[g > threshold]
+                        rows.append((
+                            self.oil_brands[i], self.ev_brands[j], self.ev_start_years[k],
+                            self.hold_years[h], _ranges(wins), len(wins), g.min(), g.max()
+                        ))
+        return pd.DataFrame(rows, columns=[
+            '油车', '电车', '电车起始年', '持有年限', '电车更便宜的油车购入年份', '年份数', '最小差值', '最大差值'
+        ])
+
+
+def _ranges(values):
+    """[1, 2, 3, 5] -> '1-3, 5'。"""
+    if len(values) == 0:
+        return '无'
+    parts = []
+    start = prev = int(values[0])
+    for v in map(int, values[1:]):
+        if v == prev + 1:
+            prev = v
+            continue
+        parts.append(f'{start}-{prev}' if prev > start else f'{start}')
+        start = prev = v
+    parts.append(f'{start}-{prev}' if prev > start else f'{start}')
+    return ', '.join(parts)
+
+
+def compare_all_pairs(scenario=None, oil_start_years=range(1, cm.YEARS + 1), hold_years=range(1, cm.YEARS + 1),
+                      ev_start_years=(1,), oil_brands=None, ev_brands=None, prices=None,
+                      oil_purchase_mileage=None, store=None):
+    """
+    对 oil_brands × ev_brands（缺省为品牌库中全部油车与电车）的所有组合做成本比较。
+    每个车型的成本曲线只算一次（油车、电车各一次批量计算），返回 PairwiseComparison。
+    store 见 vehicle_costs。
+    """
+    lib = cm.brand_library()
+    if oil_brands is None:
+        oil_brands = [b for b, ev in zip(lib.names, lib.is_ev) if not ev]
+    if ev_brands is None:
+        ev_brands = [b for b, ev in zip(lib.names, lib.is_ev) if ev]
+    oil_cost = vehicle_costs(oil_brands, oil_start_years, hold_years, scenario, prices, oil_purchase_mileage, store)
+    ev_cost = vehicle_costs(ev_brands, ev_start_years, hold_years, scenario, prices, store=store)
+    return PairwiseComparison(oil_brands, ev_brands, oil_start_years, ev_start_years, hold_years,
+                              oil_cost, ev_cost)
@@ -0,0 +1,14 @@
+"""
+绘图配置（按需导入）
+计算核心 cost_model 不再导入 matplotlib；需要画图的脚本自行调用 use_chinese_font()。
+"""
+
+import matplotlib
+
+FONTS = ['SimHei', 'DejaVu Sans']
+
+
+def use_chinese_font():
+    """设置中文字体，并让负号正常显示。"""
+    matplotlib.rcParams['font.sans-serif'] = FONTS
+    matplotlib.rcParams['axes.unicode_minus'] = False
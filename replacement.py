@@ -0,0 +1,170 @@
+"""
+换车周期优化
+在 horizon 年内每年都要有一辆车，可以在任意年末卖掉当前的车、换成品牌库中的另一款（新车或二手），
+求总 NPV 最高（成本最低）的换车方案，例如“先开 3 年二手凯美瑞，再换新的 Model 3”。
+
+分段动态规划：
+    一段持有 = (车型, 购入车龄, 持有年限[, 购入里程])，即一次“买入—持有—卖出”。模型中的各项费用
+    只取决于车龄，与所处的日历年无关，因此每段的 NPV（折现到购入当年）只需算一次，
+    全部分段合并为一次批量计算（记忆化的分段成本）。
+    f(t) = max_段 [ 段NPV × 折现(t) + f(t + 持有年限) ]，f(horizon + 1) = 0
+DP 的状态只有年份 t（此时手上没有车、要买下一辆）；当前车型与车龄隐含在所选分段里：
+“继续开”就是选持有年限更长的分段，不产生交易费用。持有年限默认可到剩余的全部年数，
+因此不会被迫卖车；max_hold 只在需要限定每辆车最长持有年限时使用。
+换车即按期末车辆价值卖出当前车辆；最后一段在第 horizon 年末卖出。
+计算量为 年数 × 分段数，30 年 × 全品牌库也只需几十毫秒。
+
+    plan = optimize_replacement(scenario, horizon=20)
+    plan.attrs['总NPV']
+"""
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+
+
+def segment_values(scenario=None, brands=None, purchase_ages=range(0, 6), max_hold=10,
+                   purchase_mileages=(None,), prices=None, transaction_cost=0.0, used_markup=0.0):
+    """
+    每个分段折现到购入当年的 NPV，一次批量计算。
+    transaction_cost: 每次购车的固定交易费用（过户、上牌等，元）
+    used_markup: 二手车购入价相对模型估值的加价比例（车商差价），模型本身按同一估值买卖
+    返回 (分段表 dict：品牌行号、车龄、购入里程、新车价，各为长度 m 的数组；
+          NPV 数组，形状 (m, max_hold)，第 h-1 列为持有 h 年)。
+    车龄 0 为新车；购入里程只用于车龄 ≥ 1 的二手油车，None 表示按车龄与年里程估算。
+    卖车按持有期末（车龄 a + h）的车辆价值计，并折现到持有期末。
+    """
+    scenario = cm.Scenario() if scenario is None else scenario
+    lib = cm.brand_library()
+    rows = lib.rows(brands) if brands is not None else np.arange(len(lib))
+    prices = prices or {}
+
+    seg_b, seg_age, seg_pm = [], [], []
+    for row in rows:
+        for age in purchase_ages:
+            options = [None] if age == 0 or lib.is_ev[row] else purchase_mileages
+            for pm in options:
+                seg_b.append(row)
+                seg_age.append(age)
+                seg_pm.append(np.nan if pm is None else float(pm))
+    seg = {
+        'row': np.array(seg_b, dtype=np.int64),
+        'age': np.array(seg_age, dtype=np.int64),
+        'purchase_mileage': np.array(seg_pm),
+    }
+    seg['new_price'] = np.array([
+        float(prices.get(lib.names[r], cm.inputs['电车新车价'] if lib.is_ev[r] else cm.inputs['油车新车价']))
+        for r in seg['row']
+    ])
+
+    # 车龄 a 购入、持有 h 年，即模型中的 start_year = a + 1、end_year = a + h
+    m = len(seg['row'])
+    holds = np.arange(1, max_hold + 1)
+    idx = np.repeat(np.arange(m), max_hold)
+    start = seg['age'][idx] + 1
+    end = seg['age'][idx] + np.tile(holds, m)
+    cf = bm.calc_cashflow_batch(
+        [lib.names[r] for r in seg['row'][idx]], seg['new_price'][idx], start, end,
+        lib.is_ev[seg['row'][idx]], oil_purchase_mileage=seg['purchase_mileage'][idx],
+        params=scenario, years=int(end.max())
+    )
+    # calc_cashflow 卖车按卖车当年年初的车辆价值、与购车同一期折现（持有 1 年等于原价卖出、
+    # 不占用资金）；这里改为持有期末、车龄 a + h 时的价值（第 end + 1 年的车辆价值），
+    # 并折现到期末，即下一段购车的时点
+    n = len(idx)
+    p = {k: np.full(n, float(scenario[k])) for k in cm.SCENARIO_FIELDS}
+    annual = bm.split_mileage(p, np.full(n, np.nan))[0]
+    _, car_value = bm.vehicle_values(
+        bm.brand_table(), seg['row'][idx], lib.is_ev[seg['row'][idx]], seg['new_price'][idx], start,
+        seg['purchase_mileage'][idx], annual, int(end.max()) + 1
+    )
+    rate = 1 + scenario['折现率']
+    sold = cf[np.arange(n), end - 1, bm.COMPONENT_INDEX['卖车']]
+    resale = car_value[np.arange(n), end]
+    # 模型把现金流折现到第 1 年（车龄 0），换算成折现到购入当年
+    npv = (bm.batch_npv(cf) - sold / rate ** (end - 1) + resale / rate ** end) * rate ** (start - 1)
+    # 交易摩擦都发生在购入当年：购车款为负数，加价按其比例计
+    purchase = cf[np.arange(n), start - 1, bm.COMPONENT_INDEX['购车']]
+    npv = npv - transaction_cost + np.where(start > 1, used_markup * purchase, 0.0)
+    return seg, npv.reshape(m, max_hold)
+
+
+def optimize_replacement(scenario=None, horizon=20, brands=None, purchase_ages=range(0, 6),
+                         max_hold=None, purchase_mileages=(None,), prices=None,
+                         transaction_cost=0.0, used_markup=0.0):
+    """
+    求 horizon 年内总 NPV 最高的换车方案。
+    brands: 可选车型（缺省为整个品牌库）；purchase_ages: 可购入的车龄（0 为新车）
+    max_hold: 单段最长持有年限，缺省为 horizon（一辆车可一直开到期末）；给出更小的值即要求
+              每辆车至多开 max_hold 年，horizon 更长时必然换车
+    purchase_mileages / prices 同 cheapest_search.search_cheapest
+    transaction_cost / used_markup: 每次购车的交易摩擦，见 segment_values
+    返回每段一行的 DataFrame：购入年、卖出年、品牌、动力、购入车龄、购入里程、持有年限、新车价、段NPV
+    （段NPV 折现到第 1 年，各段相加即总 NPV）；attrs 中记录 总NPV 与分段数。
+    """
+    import pandas as pd
+
+    scenario = cm.Scenario() if scenario is None else scenario
+    lib = cm.brand_library()
+    max_hold = horizon if max_hold is None else min(max_hold, horizon)
+    seg, value = segment_values(scenario, brands, purchase_ages, max_hold, purchase_mileages, prices,
+                                transaction_cost, used_markup)
+    discount = (1 + scenario['折现率']) ** -np.arange(horizon)
+
+    # f[t]：从第 t+1 年到 horizon 年的最优 NPV（0 起下标）；choice[t] = (分段, 持有年限)
+    f = np.full(horizon + 1, -np.inf)
+    f[horizon] = 0.0
+    choice = np.zeros((horizon, 2), dtype=np.int64)
+    for t in range(horizon - 1, -1, -1):
+        h = min(max_hold, horizon - t)
+        # 持有年限从长到短排列：NPV 相同时取持有更久（换车更少）的方案
+        total = value[:, h - 1::-1] * discount[t] + f[t + h:t:-1][None, :]
+        best = np.unravel_index(np.argmax(total), total.shape)
+        f[t] = total[best]
+        choice[t] = best[0], h - best[1]
+
+    rows = []
+    t = 0
+    while t < horizon:
+        s, h = choice[t]
+        r = seg['row'][s]
+        pm = seg['purchase_mileage'][s]
+        rows.append({
+            '购入年': t + 1,
+            '卖出年': t + h,
+            '品牌': lib.names[r],
+            '动力': lib.power[r],
+            '购入车龄': int(seg['age'][s]),
+            '购入里程': None if np.isnan(pm) else pm,
+            '持有年限': int(h),
+            '新车价': seg['new_price'][s],
+            '段NPV': value[s, h - 1] * discount[t],
+        })
+        t += h
+    plan = pd.DataFrame(rows)
+    plan.attrs['总NPV'] = float(f[0])
+    plan.attrs['分段数'] = int(value.size)
+    return plan
+
+
+if __name__ == '__main__':
+    import time
+
+    import pandas as pd
+
+    pd.set_option('display.float_format', '{:,.0f}'.format)
+    pd.set_option('display.width', 200)
+    scenario = cm.Scenario.from_dict(cm.inputs)
+    # 模型中没有随车龄上升的费用，不限持有年限时一辆车开到期末最省；
+    # 再给出“每辆车最多开 max_hold 年”时的方案，剩余年数不足一个完整持有期时最后一段会换成更适合短期持有的车型
+    for horizon, max_hold in ((15, None), (25, None), (25, 10), (25, 8)):
+        t = time.perf_counter()
+        # 每次购车 5000 元交易费用，二手车较模型估值加价 10%
+        plan = optimize_replacement(scenario, horizon=horizon, max_hold=max_hold,
+                                    transaction_cost=5000, used_markup=0.10)
+        elapsed = time.perf_counter() - t
+        limit = '' if max_hold is None else f'，每辆车最多 {max_hold} 年'
+        print(f"\n========== {horizon} 年最优换车方案{limit}（{plan.attrs['分段数']:,} 个分段，{elapsed * 1000:,.0f} ms）==========")
+        print(plan.to_string(index=False))
+        print(f"总 NPV: {plan.attrs['总NPV']:,.0f} 元")
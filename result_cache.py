@@ -0,0 +1,118 @@
+"""
+结果缓存模块
+线程安全、容量有界的 LRU 缓存，以及按 (VehicleSpec, Scenario) 缓存的现金流计算
+（进程内 LRU 在前，持久化结果库 result_store 在后）。
+缓存放在模块级，Streamlit 每次重跑 app.py 时仍可复用；容量有上限，长期运行内存保持平稳。
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+import cost_model as cm
+import instrument
+
+
+class LRUCache:
+    """容量有界的 LRU 缓存，记录命中/未命中次数；给出 name 时登记到 instrument 以统计命中率。"""
+
+    def __init__(self, maxsize=128, name=None):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.name = name
+        if name is not None:
+            instrument.register_cache(name, self)
+
+    def _lookup(self, key):
+        """(是否命中, 值)；同时更新本缓存的计数与当前 Profile 的计数。"""
+        with self._lock:
+            hit = key in self._data
+            if hit:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = self._data[key]
+            else:
+                self.misses += 1
+                value = None
+        if self.name is not None:
+            instrument.cache_event(self.name, hit)
+        return hit, value
+
+    def get(self, key, default=None):
+        hit, value = self._lookup(key)
+        return value if hit else default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, func):
+        """命中则直接返回，否则调用 func() 计算并写入缓存。"""
+        hit, value = self._lookup(key)
+        if hit:
+            return value
+        value = func()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+_cashflow_cache = LRUCache(maxsize=256, name='cashflow')
+
+
+def cached_cashflow(vehicle, scenario, compute=None, store=None):
+    """
+    按 (VehicleSpec, Scenario) 缓存的现金流数组，形状 (年数, len(COMPONENTS))，只读。
+    先查进程内 LRU，再查持久化结果库 store（缺省为 result_store.default_store()，传 False 不用）；
+    都未命中时调用 compute()（缺省为 calc_cashflow_batch）计算，并写回两层缓存。
+    """
+    def load():
+        import batch_model as bm
+        from result_store import default_store
+
+        backing = default_store() if store is None else (None if store is False else store)
+        hit = backing.get(vehicle, scenario) if backing is not None else None
+        if hit is not None:
+            values = hit[0]
+        else:
+            if compute is not None:
+                values = compute()
+            else:
+                v = bm.vehicle_args(vehicle)
+                values = bm.calc_cashflow_batch(**v, params=scenario)[0]
+            if backing is not None:
+                backing.put(vehicle, scenario, values)
+        values = values.copy()
+        values.flags.writeable = False
+        return values
+
+    return _cashflow_cache.get_or_compute((vehicle, scenario), load)
+
+
+cached_cashflow.cache = _cashflow_cache
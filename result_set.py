@@ -0,0 +1,188 @@
+"""
+列式结果集
+把多个场景的现金流保存为一个连续的 float64 数组（场景数, 期数, len(COMPONENTS)），
+再加上每个场景的标签列（品牌、年里程等）。只在需要时才导出：
+
+    rs = CashflowSet(bm.calc_cashflow_batch(...), labels={'品牌': brands, '年里程': mileages})
+    rs.npv                      # 每个场景的 NPV（数组）
+    rs.frame(0)                 # 单个场景，与 calc_cashflow 格式相同的 DataFrame
+    rs.to_pandas()              # 长表：标签列 + 年 + 各分项，分项列不复制
+    rs.write('sweep.parquet')   # 按后缀写 .parquet / .arrow / .csv（前两种需 pyarrow）
+    CashflowSet.read('sweep.parquet')
+
+Parquet / Arrow 直接由数组构造，不经过文本格式化；读回后数组与写入前逐位相同。
+"""
+
+import numpy as np
+
+import batch_model as bm
+
+SCENARIO_COLUMN = '场景'
+
+
+class CashflowSet:
+    """多个场景的现金流（连续数组）及其标签列。"""
+
+    def __init__(self, values, labels=None, steps_per_year=1):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        if values.ndim == 2:
+            values = values[None]
+        if values.ndim != 3 or values.shape[2] != len(bm.COMPONENTS):
+            raise ValueError(f"values 形状应为 (场景数, 期数, {len(bm.COMPONENTS)})，实际为 {values.shape}")
+        # 只读视图：to_pandas() 与本结果集共享内存，避免经由 DataFrame 改动结果
+        self.values = values.view()
+        self.values.flags.writeable = False
+        self.steps_per_year = steps_per_year
+        self.labels = {}
+        for name, column in (labels or {}).items():
+            column = np.asarray(column)
+            if column.shape != (len(values),):
+                raise ValueError(f"标签列 {name} 的长度应为 {len(values)}")
+            self.labels[name] = column
+        self._exports = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def npv(self):
+        return bm.batch_npv(self.values)
+
+    def component(self, name):
+        """某一分项，形状 (场景数, 期数) 的视图。"""
+        return self.values[..., bm.COMPONENT_INDEX[name]]
+
+    def select(self, index):
+        """按下标或布尔掩码取出部分场景，返回新的 CashflowSet。"""
+        return CashflowSet(self.values[index], {k: v[index] for k, v in self.labels.items()},
+                           self.steps_per_year)
+
+    # ===================== 交给 pandas =====================
+    def _step_columns(self, n):
+        step = np.arange(self.values.shape[1])
+        columns = {'年': np.tile(step // self.steps_per_year + 1, n)}
+        if self.steps_per_year != 1:
+            columns['月' if self.steps_per_year == 12 else '期'] = np.tile(step % self.steps_per_year + 1, n)
+        return columns
+
+    def frame(self, i):
+        """第 i 个场景，与 calc_cashflow 格式相同的（可修改的）DataFrame。"""
+        return bm.batch_to_frame(self.values, i, self.steps_per_year)
+
+    def to_pandas(self):
+        """
+        长表：场景、标签列、年（按期时加 月/期）与各分项。
+        分项列直接引用本结果集的（只读）数组，不复制；需要修改时先 .copy()。
+        """
+        import pandas as pd
+
+        n, steps, _ = self.values.shape
+        df = pd.DataFrame(self.values.reshape(n * steps, -1), columns=list(bm.COMPONENTS), copy=False)
+        head = {SCENARIO_COLUMN: np.repeat(np.arange(n), steps)}
+        head.update({name: np.repeat(column, steps) for name, column in self.labels.items()})
+        head.update(self._step_columns(n))
+        for pos, (name, column) in enumerate(head.items()):
+            df.insert(pos, name, column)
+        return df
+
+    def summary(self):
+        """每个场景一行：标签列、NPV 与各分项合计（不含累计列）。"""
+        import pandas as pd
+
+        df = pd.DataFrame(self.labels)
+        df['NPV'] = self.npv
+        totals = np.nansum(self.values, axis=1)
+        for name in bm.COMPONENTS:
+            if name != '累计现金流':
+                df[name] = totals[:, bm.COMPONENT_INDEX[name]]
+        return df
+
+    # ===================== 导出 =====================
+    def to_arrow(self):
+        """长表 pyarrow.Table，直接由数组构造；steps_per_year 记在表的元数据中。"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("导出 Arrow / Parquet 需要安装 pyarrow") from None
+        n, steps, _ = self.values.shape
+        columns = {SCENARIO_COLUMN: np.repeat(np.arange(n), steps)}
+        columns.update({name: np.repeat(column, steps) for name, column in self.labels.items()})
+        columns.update(self._step_columns(n))
+        flat = self.values.reshape(n * steps, -1)
+        for j, name in enumerate(bm.COMPONENTS):
+            columns[name] = flat[:, j]
+        table = pa.table(columns)
+        return table.replace_schema_metadata({
+            b'steps_per_year': str(self.steps_per_year).encode(),
+            b'labels': ','.join(self.labels).encode('utf-8'),
+        })
+
+    def to_bytes(self, fmt='csv'):
+        """导出为 'csv' / 'parquet' / 'arrow' 字节串，同一格式只导出一次。"""
+        if fmt not in self._exports:
+            import io
+
+            buf = io.BytesIO()
+            self._write(buf, fmt)
+            self._exports[fmt] = buf.getvalue()
+        return self._exports[fmt]
+
+    def write(self, path):
+        """按后缀写入 .parquet / .arrow（.feather）/ .csv 文件。"""
+        self._write(path, _format(path))
+
+    def _write(self, target, fmt):
+        if fmt == 'csv':
+            self.to_pandas().to_csv(target, index=False, encoding='utf-8')
+        elif fmt == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(self.to_arrow(), target)
+        elif fmt == 'arrow':
+            import pyarrow.feather as feather
+            feather.write_feather(self.to_arrow(), target, compression='uncompressed')
+        else:
+            raise ValueError(f"不支持的格式: {fmt}，可选 csv / parquet / arrow")
+
+    @classmethod
+    def read(cls, path, steps_per_year=None):
+        """读回 write() 写出的文件；CSV 没有元数据，按是否有 '月'/'期' 列推断 steps_per_year。"""
+        fmt = _format(path)
+        if fmt == 'csv':
+            import pandas as pd
+            df = pd.read_csv(path, encoding='utf-8', float_precision='round_trip')
+            return cls.from_pandas(df, steps_per_year)
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            table = pq.read_table(path)
+        else:
+            import pyarrow.feather as feather
+            table = feather.read_table(path)
+        meta = table.schema.metadata or {}
+        if steps_per_year is None and b'steps_per_year' in meta:
+            steps_per_year = int(meta[b'steps_per_year'])
+        n = int(table.column(SCENARIO_COLUMN)[-1].as_py()) + 1 if table.num_rows else 0
+        steps = table.num_rows // max(n, 1)
+        values = np.empty((n, steps, len(bm.COMPONENTS)))
+        for j, name in enumerate(bm.COMPONENTS):
+            values[..., j] = table.column(name).to_numpy().reshape(n, steps)
+        names = meta.get(b'labels', b'').decode('utf-8')
+        labels = {name: table.column(name).to_numpy(zero_copy_only=False)[::steps]
+                  for name in names.split(',') if name}
+        return cls(values, labels, steps_per_year or 1)
+
+    @classmethod
+    def from_pandas(cls, df, steps_per_year=None):
+        """由 to_pandas() 格式的长表构造；场景列以外、期与分项以外的列视为标签列。"""
+        n = int(df[SCENARIO_COLUMN].iloc[-1]) + 1 if len(df) else 0
+        steps = len(df) // max(n, 1)
+        if steps_per_year is None:
+            steps_per_year = 12 if '月' in df else (int(df['期'].max()) if '期' in df else 1)
+        values = df[list(bm.COMPONENTS)].to_numpy(dtype=np.float64).reshape(n, steps, -1)
+        skip = {SCENARIO_COLUMN, '年', '月', '期', *bm.COMPONENTS}
+        labels = {c: df[c].to_numpy()[::steps] for c in df.columns if c not in skip}
+        return cls(values, labels, steps_per_year)
+
+
+def _format(path):
+    suffix = str(path).lower().rsplit('.', 1)[-1]
+    return {'parquet': 'parquet', 'arrow': 'arrow', 'feather': 'arrow', 'csv': 'csv'}.get(suffix, suffix)
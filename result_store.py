@@ -0,0 +1,269 @@
+"""
+持久化结果库
+把 (车辆, 场景, 计算选项) → 现金流数组与 NPV 存进本地 SQLite 文件，
+脚本重跑、Streamlit 重启或多个工作进程之间都能复用已算过的结果。
+
+    store = default_store()
+    df = store.cashflow(vehicle, scenario)      # 命中直接读出，未命中则计算并写入
+
+- 并发：WAL 模式 + busy_timeout，每个进程/线程使用自己的连接，多个进程可同时读写。
+- 失效：每条结果带有“模型指纹”（cm.MODEL_VERSION、品牌库内容、成交价曲线），只命中指纹相同的结果。
+  打开时不清除其它指纹的结果：共用一个库文件、但品牌库不同的多个进程互不删除对方的结果；
+  不再使用的旧结果不会被访问，按最近访问时间自然淘汰，也可用 purge_stale()（或 purge=True）立即清除。
+- 容量：条数与字节数由触发器记在 totals 表中，写入时只读这一行；超过 max_bytes 或
+  max_entries 时用一条 DELETE 按最近访问时间淘汰最旧的结果。
+
+默认路径为仓库下的 .cache/results.sqlite，可用环境变量 CAR_COST_STORE 指定。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+import instrument
+
+DEFAULT_PATH = os.environ.get(
+    'CAR_COST_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'results.sqlite')
+)
+
+_fingerprint = (None, None, None)
+
+
+def model_fingerprint():
+    """当前模型版本、品牌库与成交价曲线的摘要；品牌库或曲线对象不变时直接返回上次的结果。"""
+    global _fingerprint
+    lib, curves = cm.brand_library(), cm.market_curves()
+    if _fingerprint[0] is lib and _fingerprint[1] is curves:
+        return _fingerprint[2]
+    h = hashlib.sha1(f"model={cm.MODEL_VERSION};lib={lib.fingerprint()}".encode('utf-8'))
+    for brand in sorted(curves):
+        c = curves[brand]
+        h.update(f"{brand}:{c.left}:{c.right}".encode('utf-8'))
+        h.update(c.xs.tobytes())
+        h.update(c.ys.tobytes())
+    _fingerprint = (lib, curves, h.hexdigest())
+    return _fingerprint[2]
+
+
+def result_key(vehicle, scenario=None, override_annual_mileage=None, years=None, steps_per_year=1):
+    """
+    (车辆, 场景, 选项) 的摘要，作为结果库的主键。
+    数值先统一为 float / int 再取 repr，1、1.0 与 np.float64(1.0) 得到同一个键。
+    """
+    v = bm.vehicle_args(vehicle)
+    scenario = cm.Scenario() if scenario is None else scenario
+    parts = (
+        tuple(v.items()), tuple(float(x) for x in scenario.key()),
+        None if override_annual_mileage is None else float(override_annual_mileage),
+        cm.YEARS if years is None else int(years), int(steps_per_year)
+    )
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """SQLite 结果库，hits/misses 为本进程内的统计；给出 name 时每次查找计入 instrument 的当前 Profile。"""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=256 * 1024 * 1024, max_entries=200_000,
+                 name='disk', purge=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.name = name
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    shape0 INTEGER NOT NULL,
+                    shape1 INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    npv REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL
+                )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            # 条数与字节数的累计值，由触发器维护，多个进程写同一个库时也保持一致
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS totals (
+                        id INTEGER PRIMARY KEY CHECK (id = 0),
+                        count INTEGER NOT NULL,
+                        bytes INTEGER NOT NULL
+                    )''')
+                conn.execute('''
+                    INSERT OR IGNORE INTO totals
+                    SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM results''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+                        UPDATE totals SET count = count + 1, bytes = bytes + new.size;
+                    END''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+                        UPDATE totals SET count = count - 1, bytes = bytes - old.size;
+                    END''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN
+                        UPDATE totals SET bytes = bytes + new.size - old.size;
+                    END''')
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        if purge:
+            self.purge_stale()
+        if name is not None:
+            instrument.register_cache(name, self)
+
+    def _connect(self):
+        """本线程（本进程）的连接；fork 之后重新连接。"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # ===================== 读写 =====================
+    def get(self, vehicle, scenario=None, **options):
+        """返回 (现金流数组, NPV)，未命中返回 None。数组形状同 calc_cashflow_batch 的单个场景。"""
+        key = result_key(vehicle, scenario, **options)
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT shape0, shape1, data, npv FROM results WHERE key = ? AND fingerprint = ?',
+            (key, model_fingerprint())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if self.name is not None:
+            instrument.cache_event(self.name, row is not None)
+        if row is None:
+            return None
+        # 访问时间只用于淘汰，精确到分钟即可，避免每次命中都写库
+        now = time.time()
+        conn.execute('UPDATE results SET accessed = ? WHERE key = ? AND accessed < ?', (now, key, now - 60))
+        values = np.frombuffer(row[2], dtype=np.float64).reshape(row[0], row[1])
+        return values, row[3]
+
+    def put(self, vehicle, scenario, values, **options):
+        """写入一条结果（values 为 (期数, len(COMPONENTS)) 数组），必要时淘汰旧结果。"""
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        npv = float(values[:, bm.COMPONENT_INDEX['折现现金流']].sum())
+        data = values.tobytes()
+        conn = self._connect()
+        # 用 UPSERT 而不是 INSERT OR REPLACE：后者删除旧行时不触发 DELETE 触发器，累计值会偏
+        conn.execute(
+            '''INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (key) DO UPDATE SET
+                   fingerprint = excluded.fingerprint, shape0 = excluded.shape0,
+                   shape1 = excluded.shape1, data = excluded.data, npv = excluded.npv,
+                   size = excluded.size, accessed = excluded.accessed''',
+            (result_key(vehicle, scenario, **options), model_fingerprint(),
+             values.shape[0], values.shape[1], data, npv, len(data), time.time())
+        )
+        self.evict()
+        return npv
+
+    def cashflow(self, vehicle, scenario=None, override_annual_mileage=None, years=None, steps_per_year=1):
+        """
+        与 cm.calc_vehicle_cashflow 数值相同的 DataFrame（各分项列统一为 float）；
+        命中时从结果库读出，否则计算并写入。
+        """
+        options = dict(override_annual_mileage=override_annual_mileage, years=years,
+                       steps_per_year=steps_per_year)
+        hit = self.get(vehicle, scenario, **options)
+        if hit is not None:
+            return bm.batch_to_frame(hit[0][None], 0, steps_per_year)
+        df = cm.calc_vehicle_cashflow(_vehicle_spec(vehicle), scenario, **options)
+        values = df[list(bm.COMPONENTS)].to_numpy(dtype=np.float64)
+        self.put(vehicle, scenario, values, **options)
+        return bm.batch_to_frame(values[None], 0, steps_per_year)
+
+    # ===================== 维护 =====================
+    def purge_stale(self):
+        """删除指纹与当前模型不符的结果（包括共用本库文件、品牌库不同的其它进程写入的结果）。"""
+        self._connect().execute('DELETE FROM results WHERE fingerprint != ?', (model_fingerprint(),))
+
+    def _totals(self):
+        """(条数, 字节数)，从 totals 表读出，不扫描结果表。"""
+        return self._connect().execute('SELECT count, bytes FROM totals').fetchone()
+
+    def evict(self):
+        """超出容量时按最近访问时间删除最旧的结果，直到降到上限的 90%，返回删除的条数。"""
+        conn = self._connect()
+        count, total = self._totals()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return 0
+        keep_count = int(self.max_entries * 0.9)
+        keep_bytes = int(self.max_bytes * 0.9)
+        removed = 0
+        while count > keep_count or total > keep_bytes:
+            # 字节数超限时按平均大小估算要删的条数；估少了再删一轮
+            n = max(count - keep_count, -(-(total - keep_bytes) * count // total) if total else 0, 1)
+            removed += conn.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)',
+                (n,)
+            ).rowcount
+            count, total = self._totals()
+            if count == 0:
+                break
+        return removed
+
+    def clear(self):
+        self._connect().execute('DELETE FROM results')
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        count, total = self._totals()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': count,
+            'bytes': total,
+            'maxsize': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+    def __len__(self):
+        return self.stats()['size']
+
+
+def _vehicle_spec(vehicle):
+    """车辆字典或 VehicleSpec → VehicleSpec（NaN 购入里程还原为 None）。"""
+    v = bm.vehicle_args(vehicle)
+    if np.isnan(v['oil_purchase_mileage']):
+        v['oil_purchase_mileage'] = None
+    return cm.VehicleSpec(**v)
+
+
+_default = None
+
+
+def default_store():
+    """进程内共享的默认结果库（DEFAULT_PATH）。"""
+    global _default
+    if _default is None:
+        _default = ResultStore()
+    return _default
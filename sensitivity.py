@@ -0,0 +1,254 @@
+"""
+多参数敏感性分析模块
+对任意一组参数做扰动，分析哪些输入决定两辆车的 NPV 差值（车辆a − 车辆b）：
+    tornado()        单因素：每个参数分别取低值/高值，其余取基准值（龙卷风图）
+    sobol_indices()  多因素：所有参数同时随机抽样，按 Saltelli/Jansen 估计一阶与总效应指数
+所有扰动后的场景拼成一次批量计算（batch_model.calc_cashflow_batch），不再逐点调用 calc_cashflow。
+
+参数名：
+    cm.SCENARIO_FIELDS 中的字段    两辆车共用，如 '油价'、'工作日单日里程'
+    '残值率'                       两辆车残值曲线的乘性系数（基准 1.0）
+    'a.<字段>' / 'b.<字段>'         单辆车的参数：new_price、start_year、end_year、oil_purchase_mileage
+单因素的范围写作 (低值, 高值)；多因素的分布写法同 monte_carlo，(低值, 高值) 视为均匀分布。
+"""
+
+import numpy as np
+import pandas as pd
+
+import cost_model as cm
+import batch_model as bm
+from monte_carlo import RATIO_KEYS, draw
+
+VEHICLE_KEYS = ('new_price', 'start_year', 'end_year', 'oil_purchase_mileage')
+
+
+def _split_key(key):
+    """'a.new_price' -> ('a', 'new_price')；通用参数返回 (None, key)。"""
+    if key[:2] in ('a.', 'b.'):
+        side, field = key.split('.', 1)
+        if field not in VEHICLE_KEYS:
+            raise KeyError(f"不支持的车辆参数: {field}，可选 {VEHICLE_KEYS}")
+        return side, field
+    if key != '残值率' and key not in bm.PARAM_KEYS:
+        raise KeyError(f"不支持的参数: {key}")
+    return None, key
+
+
+def evaluate_gap(vehicle_a, vehicle_b, samples, scenario=None):
+    """
+    一次批量计算若干组参数下两辆车的 NPV。
+    samples: {参数名: 数组}（长度均为 m），未给出的参数取 scenario/车辆的基准值
+    返回 (npv_a, npv_b, 差值 a − b)，均为长度 m 的数组。
+    """
+    m = len(next(iter(samples.values()))) if samples else 1
+    base = (cm.Scenario() if scenario is None else scenario).as_dict()
+    params = {k: np.full(m, float(base[k])) for k in bm.PARAM_KEYS}
+    residual_scale = np.ones(m)
+    vehicles = {'a': bm.vehicle_args(vehicle_a), 'b': bm.vehicle_args(vehicle_b)}
+    columns = {side: {f: np.full(m, float(v[f])) for f in VEHICLE_KEYS} for side, v in vehicles.items()}
+
+    for key, values in samples.items():
+        side, field = _split_key(key)
+        values = np.asarray(values, dtype=float)
+        if side is not None:
+            if field in ('start_year', 'end_year'):
+                values = np.rint(values)
+            columns[side][field] = values
+        elif field == '残值率':
+            residual_scale = np.maximum(values, 0.0)
+        elif field in RATIO_KEYS:
+            params[field] = np.clip(values, 0.0, 1.0)
+        else:
+            params[field] = np.maximum(values, 0.0)
+
+    # 起止年保持合法：start 在 [1, YEARS]，end 在 [start, YEARS]
+    for c in columns.values():
+        c['start_year'] = np.clip(c['start_year'], 1, cm.YEARS)
+        c['end_year'] = np.clip(c['end_year'], c['start_year'], cm.YEARS)
+
+    a, b = vehicles['a'], vehicles['b']
+    ca, cb = columns['a'], columns['b']
+    cf = bm.calc_cashflow_batch(
+        np.repeat([a['brand'], b['brand']], m),
+        np.concatenate([ca['new_price'], cb['new_price']]),
+        np.concatenate([ca['start_year'], cb['start_year']]).astype(np.int64),
+        np.concatenate([ca['end_year'], cb['end_year']]).astype(np.int64),
+        np.repeat([a['is_ev'], b['is_ev']], m),
+        oil_purchase_mileage=np.concatenate([ca['oil_purchase_mileage'], cb['oil_purchase_mileage']]),
+        params={k: np.concatenate([v, v]) for k, v in params.items()},
+        residual_scale=np.concatenate([residual_scale, residual_scale])
+    )
+    npv = bm.batch_npv(cf)
+    return npv[:m], npv[m:], npv[:m] - npv[m:]
+
+
+# ===================== 单因素（龙卷风图）=====================
+def tornado(vehicle_a, vehicle_b, ranges, scenario=None):
+    """
+    单因素敏感性：ranges 为 {参数名: (低值, 高值)}。
+    返回按摆幅降序排列的 DataFrame：参数、低值、高值、差值@低值、差值@高值、摆幅；
+    attrs['基准差值'] 为基准场景下的差值（车辆a NPV − 车辆b NPV）。
+    """
+    keys = list(ranges)
+    k = len(keys)
+    # 第 0 个场景为基准，之后依次为各参数的低值、高值
+    samples = {}
+    for i, key in enumerate(keys):
+        column = np.full(1 + 2 * k, np.nan)
+        column[1 + 2 * i] = ranges[key][0]
+        column[2 + 2 * i] = ranges[key][1]
+        samples[key] = column
+    base = _base_values(vehicle_a, vehicle_b, keys, scenario)
+    for key in keys:
+        samples[key] = np.where(np.isnan(samples[key]), base[key], samples[key])
+
+    _, _, gap = evaluate_gap(vehicle_a, vehicle_b, samples, scenario)
+    low, high = gap[1::2], gap[2::2]
+    df = pd.DataFrame({
+        '参数': keys,
+        '低值': [ranges[key][0] for key in keys],
+        '高值': [ranges[key][1] for key in keys],
+        '差值@低值': low,
+        '差值@高值': high,
+        '摆幅': np.abs(high - low),
+    })
+    df = df.sort_values('摆幅', ascending=False, ignore_index=True)
+    df.attrs['基准差值'] = float(gap[0])
+    return df
+
+
+def _base_values(vehicle_a, vehicle_b, keys, scenario):
+    """各参数的基准值（NaN 的购入里程保持 NaN，表示按车龄估算）。"""
+    base = (cm.Scenario() if scenario is None else scenario).as_dict()
+    vehicles = {'a': bm.vehicle_args(vehicle_a), 'b': bm.vehicle_args(vehicle_b)}
+    out = {}
+    for key in keys:
+        side, field = _split_key(key)
+        if side is not None:
+            out[key] = vehicles[side][field]
+        elif field == '残值率':
+            out[key] = 1.0
+        else:
+            out[key] = base[field]
+    return out
+
+
+def plot_tornado(table, ax=None, title='参数对 NPV 差值的影响'):
+    """按 tornado() 的结果画龙卷风图，返回 Axes。"""
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        _, ax = plt.subplots(figsize=(10, 0.5 * len(table) + 2))
+    base = table.attrs.get('基准差值', 0.0)
+    y = np.arange(len(table))[::-1]
+    ax.barh(y, table['差值@低值'] - base, left=base, color='#4ECDC4', label='低值')
+    ax.barh(y, table['差值@高值'] - base, left=base, color='#FF6B6B', label='高值')
+    ax.axvline(base, color='black', linewidth=1)
+    ax.set_yticks(y)
+    ax.set_yticklabels([f"{p} [{lo:g}, {hi:g}]" for p, lo, hi in
+                        zip(table['参数'], table['低值'], table['高值'])])
+    ax.set_xlabel('NPV 差值（车辆a − 车辆b，元）')
+    ax.set_title(title)
+    ax.legend()
+    ax.grid(True, axis='x', alpha=0.3)
+    return ax
+
+
+# ===================== 多因素（方差分解）=====================
+def _spec(value):
+    """(低值, 高值) 视为均匀分布，其余按 monte_carlo 的分布写法。"""
+    if isinstance(value[0], str):
+        return value
+    return ('uniform', value[0], value[1])
+
+
+def sobol_indices(vehicle_a, vehicle_b, distributions, n=4096, seed=0, scenario=None,
+                  n_boot=200, chunk_size=50_000):
+    """
+    方差分解敏感性（Saltelli 抽样）：一阶指数 S1 由 Saltelli (2010) 估计，总效应 ST 由 Jansen 估计，
+    共需 n × (参数数 + 2) 次两车计算，按 chunk_size 分块批量完成。
+    返回 DataFrame（按 ST 降序）：参数、S1、S1 置信区间半宽、ST、ST 置信区间半宽（bootstrap 95%）；
+    attrs 中记录差值的均值与方差。
+    """
+    keys = list(distributions)
+    k = len(keys)
+    rng = np.random.default_rng(seed)
+    A = np.column_stack([draw(rng, _spec(distributions[key]), n) for key in keys])
+    B = np.column_stack([draw(rng, _spec(distributions[key]), n) for key in keys])
+
+    # 依次为 A、B、AB_1..AB_k（AB_i：A 的第 i 列换成 B 的第 i 列）
+    blocks = [A, B]
+    for i in range(k):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append(AB)
+    X = np.vstack(blocks)
+
+    gap = np.empty(len(X))
+    for start in range(0, len(X), chunk_size):
+        part = X[start:start + chunk_size]
+        _, _, gap[start:start + chunk_size] = evaluate_gap(
+            vehicle_a, vehicle_b, {key: part[:, j] for j, key in enumerate(keys)}, scenario
+        )
+    fA, fB = gap[:n], gap[n:2 * n]
+    fAB = gap[2 * n:].reshape(k, n)
+
+    def estimate(idx):
+        a, b, ab = fA[idx], fB[idx], fAB[:, idx]
+        var = np.var(np.concatenate([a, b]))
+        if var == 0:
+            return np.zeros(k), np.zeros(k)
+        s1 = np.mean(b * (ab - a), axis=1) / var
+        st = 0.5 * np.mean((a - ab) ** 2, axis=1) / var
+        return s1, st
+
+    s1, st = estimate(np.arange(n))
+    boot_rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1,)))
+    boots = [estimate(boot_rng.integers(0, n, n)) for _ in range(n_boot)]
+    s1_ci = 1.96 * np.std([bs[0] for bs in boots], axis=0) if n_boot else np.full(k, np.nan)
+    st_ci = 1.96 * np.std([bs[1] for bs in boots], axis=0) if n_boot else np.full(k, np.nan)
+
+    df = pd.DataFrame({'参数': keys, 'S1': s1, 'S1±': s1_ci, 'ST': st, 'ST±': st_ci})
+    df = df.sort_values('ST', ascending=False, ignore_index=True)
+    df.attrs['差值均值'] = float(np.mean(np.concatenate([fA, fB])))
+    df.attrs['差值方差'] = float(np.var(np.concatenate([fA, fB])))
+    df.attrs['计算次数'] = len(X)
+    return df
+
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+    from plot_style import use_chinese_font
+
+    use_chinese_font()
+    scenario = cm.Scenario.from_dict(cm.inputs)
+    oil_car, ev_car = cm.default_vehicles()
+    ranges = {
+        '油价': (6.0, 10.0),
+        '家充电价': (0.3, 0.8),
+        '公共充电价': (1.0, 2.0),
+        '家充比例': (0.2, 1.0),
+        '工作日单日里程': (20, 120),
+        '周末单日里程': (20, 200),
+        '工作日高速比例': (0.1, 0.9),
+        '折现率': (0.0, 0.08),
+        '停车费': (0, 12000),
+        '残值率': (0.85, 1.15),
+        'a.new_price': (0.8 * oil_car.new_price, 1.2 * oil_car.new_price),
+        'b.new_price': (0.8 * ev_car.new_price, 1.2 * ev_car.new_price),
+        'a.end_year': (5, 10),
+        'b.end_year': (5, 10),
+    }
+
+    pd.set_option('display.float_format', '{:,.3f}'.format)
+    table = tornado(oil_car, ev_car, ranges, scenario)
+    print(f"基准差值（油车 NPV − 电车 NPV）: {table.attrs['基准差值']:,.0f} 元")
+    print(table.to_string(index=False))
+
+    indices = sobol_indices(oil_car, ev_car, ranges, n=8192, seed=0, scenario=scenario)
+    print(f"\n方差分解（{indices.attrs['计算次数']:,} 组参数，一次分块批量计算）")
+    print(indices.to_string(index=False))
+
+    plot_tornado(table, title='油车 − 电车 NPV 差值的单因素敏感性')
+    plt.tight_layout()
+    plt.show()
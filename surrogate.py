@@ -0,0 +1,278 @@
+"""
+预计算 NPV 查表（代理模型）
+离线对每个车型在常用输入的网格上批量计算 NPV，交互时用多线性插值直接给出结果：
+    油车   年里程 × 油价
+    电车   年里程 × 家充电价 × 家充比例
+    两者   起始年 × 持有年限（整数，直接索引）
+NPV 对新车价是仿射的（购入价、残值、保险都与新车价成正比），每个格点存截距与斜率两张表，
+任意新车价都可精确得到；能源费用对油价、电价、家充比例是（双）线性的，插值在这些方向上精确，
+误差主要来自年里程方向上残值档位的跳变。构建时在网格内随机抽点与精确模型比较，
+记录每个车型的最大误差与 95% 分位误差。
+
+输入超出网格、带购入里程的油车、或网格以外的参数与构建时不同，均回退到精确计算。
+
+    python surrogate.py                  # 构建并保存到 .cache/surrogate.npz，打印误差
+    table = load_surrogate()             # 文件不存在或模型已变化时返回 None
+    npv, exact = table.npv_or_exact(vehicle, scenario)
+"""
+
+import json
+import os
+
+import numpy as np
+
+import cost_model as cm
+import batch_model as bm
+from result_store import model_fingerprint
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'surrogate.npz')
+
+# 各动力类型的连续网格轴：参数名 -> 格点；'年里程' 为覆盖年里程。
+# 能源费用对油价、电价、家充比例是（双）线性的，这些轴只需两端格点；
+# 油车残值随累计里程分档，年里程方向需要细一些的格点
+OIL_AXES = {
+    '年里程': np.arange(0, 60001, 500.0),
+    '油价': np.array([4.0, 14.0]),
+}
+EV_AXES = {
+    '年里程': np.arange(0, 60001, 2000.0),
+    '家充电价': np.array([0.0, 2.0]),
+    '家充比例': np.array([0.0, 1.0]),
+}
+# 这些参数只通过年里程及城区/高速比例起作用，查表时改为检查高速比例
+MILEAGE_FIELDS = ('工作日通勤天数', '工作日单日里程', '周末单日里程', '工作日高速比例', '周末高速比例')
+
+
+def _annual_split(p):
+    """(年里程, 高速里程占比)。"""
+    weekday_km = p['工作日通勤天数'] * p['工作日单日里程'] * 52
+    weekend_km = 2 * p['周末单日里程'] * 52
+    annual = weekday_km + weekend_km
+    highway = weekday_km * p['工作日高速比例'] + weekend_km * p['周末高速比例']
+    return annual, (highway / annual if annual > 0 else 0.0)
+
+
+def _grid_points(axes):
+    """连续轴的全部格点组合，返回 {参数名: 展平数组} 与网格形状。"""
+    mesh = np.meshgrid(*axes.values(), indexing='ij')
+    return {k: m.ravel() for k, m in zip(axes, mesh)}, tuple(len(a) for a in axes.values())
+
+
+class Surrogate:
+    """按车型保存的 NPV 表：intercept/slope 形状为 (起始年, 持有年限, *连续轴)。"""
+
+    def __init__(self, base, years, brands, intercept, slope, errors, fingerprint):
+        self.base = cm.Scenario(**base)
+        self.years = years
+        self.brands = brands            # {品牌: is_ev}
+        self.intercept = intercept      # {品牌: 数组}
+        self.slope = slope
+        self.errors = errors            # {品牌: {'max': ..., 'p95': ...}}
+        self.fingerprint = fingerprint
+        self._base_highway = _annual_split(self.base)[1]
+
+    @staticmethod
+    def axes(is_ev):
+        return EV_AXES if is_ev else OIL_AXES
+
+    # ===================== 查表 =====================
+    def coordinates(self, vehicle, scenario=None, override_annual_mileage=None):
+        """查表所需的 (品牌, 起始年下标, 持有年限下标, 连续坐标)；不在表的适用范围内时返回 None。"""
+        v = bm.vehicle_args(vehicle)
+        scenario = cm.Scenario() if scenario is None else scenario
+        brand = v['brand']
+        if brand not in self.brands or self.brands[brand] != v['is_ev']:
+            return None
+        if not np.isnan(v['oil_purchase_mileage']):
+            return None
+        start, end = v['start_year'], v['end_year']
+        if not (1 <= start <= end <= self.years):
+            return None
+        for key in cm.SCENARIO_FIELDS:
+            # 另一动力类型的网格参数（如油车的家充电价）不影响结果
+            if key in MILEAGE_FIELDS or key in OIL_AXES or key in EV_AXES:
+                continue
+            if scenario[key] != self.base[key]:
+                return None
+        annual, highway = _annual_split(scenario)
+        if not np.isclose(highway, self._base_highway, rtol=1e-12, atol=1e-12):
+            return None
+        if override_annual_mileage is not None:
+            annual = override_annual_mileage
+        point = []
+        for key, grid in self.axes(v['is_ev']).items():
+            x = annual if key == '年里程' else scenario[key]
+            if not grid[0] <= x <= grid[-1]:
+                return None
+            point.append(x)
+        return brand, start - 1, end - start, point
+
+    def npv(self, vehicle, scenario=None, override_annual_mileage=None):
+        """查表得到的 NPV；不适用时返回 None。"""
+        coords = self.coordinates(vehicle, scenario, override_annual_mileage)
+        if coords is None:
+            return None
+        brand, si, hi, point = coords
+        grids = list(self.axes(self.brands[brand]).values())
+        a = self.intercept[brand][si, hi]
+        b = self.slope[brand][si, hi]
+        return float(_interpolate(a, grids, point) + _interpolate(b, grids, point) * vehicle['new_price'])
+
+    def npv_or_exact(self, vehicle, scenario=None, override_annual_mileage=None):
+        """返回 (NPV, 是否精确计算)：能查表则查表，否则回退到精确模型。"""
+        value = self.npv(vehicle, scenario, override_annual_mileage)
+        if value is not None:
+            return value, False
+        v = bm.vehicle_args(vehicle)
+        cf = bm.calc_cashflow_batch(
+            v['brand'], v['new_price'], v['start_year'], v['end_year'], v['is_ev'],
+            override_annual_mileage=np.nan if override_annual_mileage is None else override_annual_mileage,
+            oil_purchase_mileage=v['oil_purchase_mileage'],
+            params=cm.Scenario() if scenario is None else scenario
+        )
+        return float(bm.batch_npv(cf)[0]), True
+
+    def error_bound(self, brand):
+        """构建时抽样验证得到的该车型最大绝对误差（元）；这是经验上界，不是严格上界。"""
+        return self.errors[brand]['max']
+
+    # ===================== 保存与读取 =====================
+    def save(self, path=DEFAULT_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {
+            'base': self.base.as_dict(),
+            'years': self.years,
+            'brands': self.brands,
+            'errors': self.errors,
+            'fingerprint': self.fingerprint,
+        }
+        arrays = {'meta': np.array(json.dumps(meta, ensure_ascii=False))}
+        for i, brand in enumerate(self.brands):
+            arrays[f'intercept_{i}'] = self.intercept[brand]
+            arrays[f'slope_{i}'] = self.slope[brand]
+        np.savez_compressed(path, **arrays)
+
+
+def _interpolate(table, grids, point):
+    """在 table（形状与 grids 对应）上做多线性插值。"""
+    lo, w = [], []
+    for grid, x in zip(grids, point):
+        i = int(np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2))
+        lo.append(i)
+        w.append((x - grid[i]) / (grid[i + 1] - grid[i]))
+    cell = table[tuple(slice(i, i + 2) for i in lo)]
+    for wi in w:
+        # 逐轴收缩：cell[0] * (1 - w) + cell[1] * w
+        cell = cell[0] * (1 - wi) + cell[1] * wi
+    return cell
+
+
+def _npv_grid(brand, is_ev, prices, years, base, chunk_size):
+    """对一个车型算出 (起始年, 持有年限, *连续轴) 上各新车价的 NPV，返回 [数组, ...]。"""
+    points, shape = _grid_points(Surrogate.axes(is_ev))
+    m = len(next(iter(points.values())))
+    S, H = np.meshgrid(np.arange(1, years + 1), np.arange(years), indexing='ij')
+    starts, ends = S.ravel(), (S + H).ravel()
+    valid = ends <= years
+
+    out = [np.full((years * years, m), np.nan) for _ in prices]
+    params = {k: np.full(m, float(base[k])) for k in cm.SCENARIO_FIELDS}
+    for key, values in points.items():
+        if key != '年里程':
+            params[key] = values
+    for c in np.flatnonzero(valid):
+        for start in range(0, m, chunk_size):
+            sl = slice(start, start + chunk_size)
+            n = len(points['年里程'][sl])
+            cf = bm.calc_cashflow_batch(
+                brand, np.repeat(prices, n), starts[c], ends[c], is_ev,
+                override_annual_mileage=np.tile(points['年里程'][sl], len(prices)),
+                params={k: np.tile(v[sl], len(prices)) for k, v in params.items()},
+                years=years
+            )
+            npv = bm.batch_npv(cf).reshape(len(prices), n)
+            for j in range(len(prices)):
+                out[j][c, sl] = npv[j]
+    return [o.reshape((years, years) + shape) for o in out]
+
+
+def build_surrogate(brands=None, scenario=None, years=None, validation_points=256, seed=0,
+                    chunk_size=20_000, progress=False):
+    """
+    对品牌库（或指定的 brands）构建查表模型。网格以外的参数取 scenario（默认 inputs）。
+    每个车型额外在网格内随机抽 validation_points 个点与精确模型比较，记录误差。
+    """
+    lib = cm.brand_library()
+    base = cm.Scenario() if scenario is None else scenario
+    years = cm.YEARS if years is None else int(years)
+    names = list(lib.names) if brands is None else list(brands)
+    rng = np.random.default_rng(seed)
+
+    kinds, intercept, slope, errors = {}, {}, {}, {}
+    for brand in names:
+        is_ev = bool(lib.is_ev[lib.row(brand)])
+        p0 = float(cm.inputs['电车新车价'] if is_ev else cm.inputs['油车新车价'])
+        at_zero, at_p0 = _npv_grid(brand, is_ev, [0.0, p0], years, base, chunk_size)
+        kinds[brand] = is_ev
+        intercept[brand] = at_zero
+        slope[brand] = (at_p0 - at_zero) / p0
+        if progress:
+            print(f"已构建 {brand}")
+
+    table = Surrogate(base.as_dict(), years, kinds, intercept, slope, {}, model_fingerprint())
+
+    # ===== 抽样验证 =====
+    for brand in names:
+        is_ev = kinds[brand]
+        axes = Surrogate.axes(is_ev)
+        start = rng.integers(1, years + 1, validation_points)
+        end = np.array([rng.integers(s, years + 1) for s in start])
+        price = rng.uniform(0.5, 1.5, validation_points) * float(
+            cm.inputs['电车新车价'] if is_ev else cm.inputs['油车新车价'])
+        sample = {k: rng.uniform(g[0], g[-1], validation_points) for k, g in axes.items()}
+        params = {k: np.full(validation_points, float(base[k])) for k in cm.SCENARIO_FIELDS}
+        params.update({k: v for k, v in sample.items() if k != '年里程'})
+        exact = bm.batch_npv(bm.calc_cashflow_batch(
+            brand, price, start, end, is_ev,
+            override_annual_mileage=sample['年里程'], params=params, years=years
+        ))
+        approx = np.array([
+            table.npv({'brand': brand, 'new_price': price[i], 'start_year': start[i],
+                       'end_year': end[i], 'is_ev': is_ev},
+                      base.replace(**{k: float(v[i]) for k, v in sample.items() if k != '年里程'}),
+                      override_annual_mileage=sample['年里程'][i])
+            for i in range(validation_points)
+        ])
+        err = np.abs(approx - exact)
+        errors[brand] = {'max': float(err.max()), 'p95': float(np.percentile(err, 95))}
+    table.errors = errors
+    return table
+
+
+def load_surrogate(path=DEFAULT_PATH):
+    """读取查表模型；文件不存在或与当前模型/品牌库不一致时返回 None。"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['fingerprint'] != model_fingerprint():
+            return None
+        intercept, slope = {}, {}
+        for i, brand in enumerate(meta['brands']):
+            intercept[brand] = data[f'intercept_{i}']
+            slope[brand] = data[f'slope_{i}']
+    return Surrogate(meta['base'], meta['years'], meta['brands'], intercept, slope,
+                     meta['errors'], meta['fingerprint'])
+
+
+if __name__ == '__main__':
+    import time
+
+    t = time.perf_counter()
+    table = build_surrogate(scenario=cm.Scenario.from_dict(cm.inputs), progress=True)
+    table.save()
+    size = os.path.getsize(DEFAULT_PATH)
+    print(f"\n构建耗时 {time.perf_counter() - t:,.1f} s，文件 {DEFAULT_PATH}（{size / 1024:,.0f} KB）")
+    print(f"{'车型':<16}{'最大误差(元)':>14}{'P95误差(元)':>14}")
+    for brand, e in table.errors.items():
+        print(f"{brand:<16}{e['max']:>14,.1f}{e['p95']:>14,.1f}")
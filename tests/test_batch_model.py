@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import cost_model as cm
+import batch_model as bm
+
+# 起始年 × 结束年 × 购入里程（None 为按车龄估算）
+PERIODS = [(1, 1), (1, 5), (3, 7), (4, 8), (6, 10)]
+PURCHASE_MILEAGES = [None, 0, 50000, 150000]
+OVERRIDE_MILEAGES = [None, 8000, 30000]
+
+
+def _grid():
+    lib = cm.brand_library()
+    for brand, is_ev in zip(lib.names, lib.is_ev):
+        price = cm.inputs['电车新车价'] if is_ev else cm.inputs['油车新车价']
+        mileages = [None] if is_ev else PURCHASE_MILEAGES
+        for (start, end), purchase, annual in itertools.product(PERIODS, mileages, OVERRIDE_MILEAGES):
+            yield brand, float(price), start, end, bool(is_ev), annual, purchase
+
+
+CASES = list(_grid())
+
+
+def _reference(brand, price, start, end, is_ev, annual, purchase, years=None):
+    """逐年循环的参考实现（calc_summary 所用），加上累计与折现两列。"""
+    rows, rate = cm._cashflow_rows(brand, price, start, end, is_ev, annual, purchase, None, years)
+    table = np.array(rows, dtype=float)
+    net = table[:, -1]
+    return np.column_stack([table[:, 1:], net.cumsum(), net / ((1 + rate) ** (table[:, 0] - 1))])
+
+
+def _scalar(cases, **kwargs):
+    return np.array([_reference(*case, **kwargs) for case in cases])
+
+
+def _batch(cases, **kwargs):
+    brand, price, start, end, is_ev, annual, purchase = zip(*cases)
+    return bm.calc_cashflow_batch(
+        list(brand), price, start, end, is_ev,
+        override_annual_mileage=[np.nan if a is None else a for a in annual],
+        oil_purchase_mileage=[np.nan if p is None else p for p in purchase],
+        **kwargs
+    )
+
+
+def test_grid_covers_market_curve():
+    assert any(brand in cm.market_curves() for brand, *_ in CASES)
+
+
+def test_batch_matches_scalar():
+    scalar = _scalar(CASES)
+    batch = _batch(CASES)
+    assert batch.shape == scalar.shape
+    for i in np.flatnonzero(~np.all((batch == scalar) | (np.isnan(batch) & np.isnan(scalar)), axis=(1, 2))):
+        pytest.fail(f"场景 {CASES[i]} 批量结果与逐年参考实现不同：\n{batch[i] - scalar[i]}")
+
+
+def test_long_horizon_matches_scalar():
+    cases = [c for c in CASES if c[6] in (None, 50000)]
+    assert np.array_equal(_batch(cases, years=30), _scalar(cases, years=30), equal_nan=True)
+
+
+def test_calc_cashflow_uses_batch():
+    for years in (None, 30):
+        for case in CASES[::7]:
+            brand, price, start, end, is_ev, annual, purchase = case
+            df = cm.calc_cashflow(brand, price, start, end, is_ev, annual, purchase, years=years)
+            assert list(df.columns) == ['年'] + list(bm.COMPONENTS)
+            assert np.array_equal(df[list(bm.COMPONENTS)].to_numpy(), _batch([case], years=years)[0], equal_nan=True)
+
+
+def test_is_ev_defaults_to_brand_library():
+    assert np.array_equal(_batch(CASES), bm.calc_cashflow_batch(
+        [c[0] for c in CASES], [c[1] for c in CASES], [c[2] for c in CASES], [c[3] for c in CASES],
+        override_annual_mileage=[np.nan if c[5] is None else c[5] for c in CASES],
+        oil_purchase_mileage=[np.nan if c[6] is None else c[6] for c in CASES]
+    ), equal_nan=True)
+
+
+@pytest.mark.parametrize('steps_per_year', [0, -1, 1.5, True])
+def test_rejects_bad_steps_per_year(steps_per_year):
+    with pytest.raises(ValueError):
+        _batch(CASES[:1], steps_per_year=steps_per_year)
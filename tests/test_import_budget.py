@@ -0,0 +1,11 @@
+import import_budget
+
+
+def test_import_budget():
+    reference, results = import_budget.check()
+    for module, elapsed, budget, loaded in results:
+        assert not loaded, f"导入 {module} 时加载了 {', '.join(loaded)}"
+        assert elapsed <= budget, (
+            f"导入 {module} 增加 {elapsed * 1000:.1f} ms，超出预算 {budget * 1000:.1f} ms"
+            f"（基准 import {import_budget.REFERENCE} {reference * 1000:.1f} ms）"
+        )
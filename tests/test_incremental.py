@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import cost_model as cm
+import batch_model as bm
+from incremental import IncrementalCashflow
+
+VEHICLES = [
+    cm.VehicleSpec('丰田 凯美瑞', 200000, 1, 5, False),
+    cm.VehicleSpec('丰田 凯美瑞', 200000, 4, 8, False, oil_purchase_mileage=50000),
+    cm.VehicleSpec('本田 雅阁', 180000, 3, 9, False),
+    cm.VehicleSpec('奥迪 A4 Avant', 300000, 4, 8, False, oil_purchase_mileage=60000),
+    cm.VehicleSpec('特斯拉 Model 3', 250000, 1, 6, True),
+    cm.VehicleSpec('比亚迪 海豹', 240000, 2, 10, True),
+]
+
+# 每个场景字段的一个新取值（各节点的输入都至少改一次）
+EDITS = {
+    '油价': 9.3,
+    '家充电价': 0.55,
+    '公共充电价': 2.1,
+    '家充比例': 0.35,
+    '工作日通勤天数': 4,
+    '工作日单日里程': 95,
+    '周末单日里程': 12,
+    '工作日高速比例': 0.7,
+    '周末高速比例': 0.15,
+    '电车膨胀开关': 0,
+    '电车膨胀系数': 1.4,
+    '过路费单价': 0.6,
+    '停车费': 9000,
+    '上海油牌通胀': 3000,
+    '罚款': 800,
+    '折现率': 0.08,
+}
+
+
+def _expected(vehicle, scenario, override=None):
+    df = cm.calc_vehicle_cashflow(vehicle, scenario, override_annual_mileage=override)
+    return df[list(bm.COMPONENTS)].to_numpy(dtype=float)
+
+
+def test_edits_cover_every_field():
+    assert set(EDITS) == set(cm.SCENARIO_FIELDS)
+
+
+@pytest.mark.parametrize('vehicle', VEHICLES, ids=lambda v: f'{v.brand}-{v.start_year}')
+@pytest.mark.parametrize('field', list(EDITS))
+def test_single_edit_matches_full_recompute(vehicle, field):
+    model = IncrementalCashflow(vehicle, cm.Scenario())
+    assert np.array_equal(model.result, _expected(vehicle, cm.Scenario()), equal_nan=True)
+    scenario = cm.Scenario().replace(**{field: EDITS[field]})
+    model.update(scenario)
+    assert np.array_equal(model.result, _expected(vehicle, scenario), equal_nan=True)
+
+
+@pytest.mark.parametrize('vehicle', VEHICLES, ids=lambda v: f'{v.brand}-{v.start_year}')
+def test_chained_edits_and_override(vehicle):
+    model = IncrementalCashflow(vehicle, cm.Scenario())
+    scenario = cm.Scenario()
+    for field, value in EDITS.items():
+        scenario = scenario.replace(**{field: value})
+        model.update(**{field: value})
+        assert np.array_equal(model.result, _expected(vehicle, scenario), equal_nan=True), field
+    for override in (25000.0, 8000.0, np.nan):
+        model.update(override_annual_mileage=override)
+        expected = _expected(vehicle, scenario, None if np.isnan(override) else override)
+        assert np.array_equal(model.result, expected, equal_nan=True), override
+    assert model.npv() == cm.calc_vehicle_cashflow(vehicle, scenario)['折现现金流'].sum()
@@ -0,0 +1,36 @@
+import threading
+
+import instrument
+from result_cache import LRUCache
+
+
+def test_cache_counts_are_per_profile():
+    cache = LRUCache(8, name='test_per_profile')
+    cache.put('k', 1)
+    started, stats = threading.Barrier(2), {}
+
+    def session(name, lookups):
+        with instrument.profile() as prof:
+            started.wait()
+            for _ in range(lookups):
+                cache.get('k')
+            cache.get('missing')
+        stats[name] = prof.cache_stats['test_per_profile']
+
+    threads = [threading.Thread(target=session, args=(name, n)) for name, n in (('a', 3), ('b', 7))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stats['a'] == {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+    assert stats['b'] == {'hits': 7, 'misses': 1, 'hit_rate': 0.875}
+
+
+def test_clear_inside_profile_does_not_go_negative():
+    cache = LRUCache(8, name='test_clear')
+    cache.put('k', 1)
+    cache.get('k')
+    with instrument.profile() as prof:
+        cache.clear()
+        cache.get('k')
+    assert prof.cache_stats['test_clear'] == {'hits': 0, 'misses': 1, 'hit_rate': 0.0}
@@ -0,0 +1,26 @@
+import numpy as np
+
+import cost_model as cm
+import monte_carlo as mc
+
+
+def test_histogram_grows_to_cover_later_chunks():
+    rng = np.random.default_rng(0)
+    chunks = [rng.normal(0, 1, (5000, 2)), rng.normal(0, 30, (5000, 2))]
+    hist = mc._Histogram(chunks[0], 1024)
+    for values in chunks:
+        hist.add(values)
+    values = np.vstack(chunks)
+    assert (hist.lo <= values.min(axis=0)).all() and (hist.hi > values.max(axis=0)).all()
+    assert (hist.counts.sum(axis=1) == len(values)).all()
+    for q in (0.05, 0.5, 0.95):
+        assert np.allclose(hist.quantile(q), np.quantile(values, q, axis=0), atol=2 * hist.width.max())
+
+
+def test_residual_scale_applies_to_market_curve():
+    vehicle = cm.VehicleSpec('奥迪 A4 Avant', 300000, 4, 8, False, oil_purchase_mileage=50000)
+    dist = {'残值率': ('fixed', 0.9)}
+    scaled = mc.run_monte_carlo(vehicle, vehicle, dist, n_paths=10, workers=1)['components']
+    plain = mc.run_monte_carlo(vehicle, vehicle, {}, n_paths=10, workers=1)['components']
+    for part in ('购车', '卖车'):
+        assert np.isclose(scaled.loc['均值', ('车辆a', part)], 0.9 * plain.loc['均值', ('车辆a', part)])
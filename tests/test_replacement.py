@@ -0,0 +1,50 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import cost_model as cm
+import replacement
+
+BRANDS = ['丰田 凯美瑞', '比亚迪 海豹', '奥迪 A4 Avant']
+PURCHASE_AGES = (0, 2)
+
+
+def _compositions(n):
+    """把 n 年拆成若干段持有年限的全部方式。"""
+    if n == 0:
+        yield ()
+        return
+    for h in range(1, n + 1):
+        for rest in _compositions(n - h):
+            yield (h,) + rest
+
+
+def _brute_force(scenario, horizon, max_hold, **kwargs):
+    _, value = replacement.segment_values(scenario, BRANDS, PURCHASE_AGES, max_hold, **kwargs)
+    rate = 1 + scenario['折现率']
+    best = -np.inf
+    for holds in _compositions(horizon):
+        if max(holds) > max_hold:
+            continue
+        starts = np.cumsum((0,) + holds[:-1])
+        # 各段独立，逐段取最优车型即为该拆分下的最优
+        best = max(best, sum(value[:, h - 1].max() / rate ** t for t, h in zip(starts, holds)))
+    return best
+
+
+@pytest.mark.parametrize('horizon, max_hold', [(1, None), (4, None), (6, None), (6, 2), (7, 3)])
+@pytest.mark.parametrize('friction', [{}, {'transaction_cost': 5000, 'used_markup': 0.1}])
+def test_matches_brute_force(horizon, max_hold, friction):
+    scenario = cm.Scenario()
+    plan = replacement.optimize_replacement(scenario, horizon, BRANDS, PURCHASE_AGES, max_hold, **friction)
+    expected = _brute_force(scenario, horizon, horizon if max_hold is None else max_hold, **friction)
+    assert plan.attrs['总NPV'] == pytest.approx(expected, rel=1e-12)
+    assert plan['段NPV'].sum() == pytest.approx(plan.attrs['总NPV'], rel=1e-12)
+    assert plan['购入年'].iloc[0] == 1 and plan['卖出年'].iloc[-1] == horizon
+    assert (plan['购入年'].iloc[1:].to_numpy() == plan['卖出年'].iloc[:-1].to_numpy() + 1).all()
+
+
+def test_no_forced_sale_beyond_ten_years():
+    plan = replacement.optimize_replacement(cm.Scenario(), 15, ['比亚迪 海豹'], (0,), transaction_cost=5000)
+    assert len(plan) == 1 and plan['持有年限'].iloc[0] == 15
@@ -0,0 +1,34 @@
+import numpy as np
+
+import cost_model as cm
+import result_store as rs
+
+VEHICLE = cm.VehicleSpec('丰田 凯美瑞', 200000, 4, 8, False)
+
+
+def test_key_ignores_numeric_type():
+    scenario = cm.Scenario()
+    same = scenario.replace(工作日通勤天数=float(scenario['工作日通勤天数']), 油价=np.float64(scenario['油价']))
+    assert rs.result_key(VEHICLE, scenario) == rs.result_key(VEHICLE, same)
+    assert rs.result_key(VEHICLE, scenario, years=10, steps_per_year=np.int64(1)) == rs.result_key(VEHICLE, scenario)
+    assert rs.result_key(VEHICLE, scenario, override_annual_mileage=10000) == \
+        rs.result_key(VEHICLE, scenario, override_annual_mileage=10000.0)
+
+
+def test_open_keeps_other_fingerprints(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    store = rs.ResultStore(path, name=None)
+    store.cashflow(VEHICLE)
+    store._connect().execute("UPDATE results SET fingerprint = 'other-library'")
+    assert len(rs.ResultStore(path, name=None)) == 1
+    assert len(rs.ResultStore(path, name=None, purge=True)) == 0
+
+
+def test_totals_track_rows(tmp_path):
+    store = rs.ResultStore(str(tmp_path / 'results.sqlite'), max_entries=20, name=None)
+    for price in range(100000, 100050):
+        store.cashflow(VEHICLE.replace(new_price=price))
+    store.cashflow(VEHICLE.replace(new_price=100049), years=12)
+    count, total = store._connect().execute('SELECT COUNT(*), SUM(size) FROM results').fetchone()
+    assert store._totals() == (count, total)
+    assert count <= 20
@@ -0,0 +1,36 @@
+import pytest
+
+import cost_model as cm
+
+PARTS = list(cm.ROW_COLUMNS[1:-1])
+
+CASES = [
+    ('丰田 凯美瑞', 200000, 1, 5, False, None, None),
+    ('丰田 凯美瑞', 200000, 4, 8, False, None, 50000),
+    ('本田 雅阁', 180000, 3, 9, False, 25000, None),
+    ('奥迪 A4 Avant', 300000, 4, 8, False, None, 60000),
+    ('奥迪 A4 Avant', 300000, 1, 10, False, 8000, None),
+    ('特斯拉 Model 3', 250000, 1, 6, True, None, None),
+    ('比亚迪 海豹', 240000, 2, 10, True, 30000, None),
+]
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda c: f'{c[0]}-{c[2]}-{c[3]}')
+@pytest.mark.parametrize('years, steps_per_year', [(None, 1), (30, 1), (None, 12), (15, 4)])
+def test_summary_matches_cashflow_sums(case, years, steps_per_year):
+    brand, price, start, end, is_ev, annual, purchase = case
+    kwargs = dict(override_annual_mileage=annual, oil_purchase_mileage=purchase,
+                  scenario=cm.Scenario(), years=years, steps_per_year=steps_per_year)
+    df = cm.calc_cashflow(brand, price, start, end, is_ev, **kwargs)
+    summary = cm.calc_summary(brand, price, start, end, is_ev, **kwargs)
+    assert summary.npv == df['折现现金流'].sum()
+    assert summary.net_total == df['净现金流'].sum()
+    assert summary.components == {name: df[name].sum() for name in PARTS}
+    assert summary.frame.equals(df)
+
+
+def test_vehicle_summary():
+    vehicle = cm.VehicleSpec('丰田 凯美瑞', 200000, 4, 8, False, oil_purchase_mileage=50000)
+    for steps_per_year in (1, 12):
+        df = cm.calc_vehicle_cashflow(vehicle, steps_per_year=steps_per_year)
+        assert cm.calc_vehicle_summary(vehicle, steps_per_year=steps_per_year).npv == df['折现现金流'].sum()